@@ -0,0 +1,67 @@
+from analyzer import cache, dedupe, index, output, sections
+
+# Re-exported for library callers
+Section = sections.Section
+
+
+def iter_package(absolute_path: str, filenames: list[str] | None = None, recent_only: bool = False,
+                 max_file_size: int = 16*1024, remove_comments: bool = False, jobs: int = 1,
+                 use_cache: bool = True, tracked_only: bool = False, excludes=(), includes=(),
+                 recency=None, deduplicate: bool = False, outline: str | None = None):
+    """
+    Package a repository for a Python caller: yield its files as `Section` records.
+
+    This is what `output.content_output` renders, without the rendering: files
+    are selected the same way and read lazily, so callers can filter, stream or
+    stop early (closing the generator cancels the reads still queued). Content is
+    plain text, with no Markdown escaping.
+
+        from analyzer import api
+
+        for section in api.iter_package("/path/to/repo", includes=["*.py"]):
+            if not section.binary:
+                handle(section.rel_path, section.content)
+
+    Args:
+        absolute_path: Root directory of the repository.
+        filenames: Optional list of specific files to include.
+        recent_only: Whether to include only recently modified files.
+        max_file_size: Maximum number of bytes kept per file.
+        remove_comments: Whether to strip comments from code files.
+        jobs: Number of parallel workers for reading files.
+        use_cache: Whether to use the persistent cache of processed files.
+        tracked_only: List files from the git index instead of walking the directory.
+        excludes: Extra gitignore-style patterns to exclude.
+        includes: Gitignore-style patterns a file must match to be included (all files if empty).
+        recency: Optional `history.Recency`; implies `recent_only`, judged from git history.
+        deduplicate: Mark files whose content was already yielded with `duplicate_of`.
+        outline: "large" to yield the outline of files over `max_file_size` instead of a
+            truncated text, "all" to outline every file in a supported language.
+
+    Yields:
+        One `Section` per selected file, in package order.
+    """
+    recent_only = recent_only or bool(recency)
+    file_cache = cache.open_cache(absolute_path) if use_cache else None
+    try:
+        entries = output.build_entries(absolute_path, tracked_only, excludes, includes)
+        recent_paths = output.select_recent(absolute_path, recency, use_cache) if recency else None
+        file_paths = output.select_package_files(
+            absolute_path, filenames, recent_only, entries, recency, recent_paths
+        )
+        yield from sections.iter_sections(
+            absolute_path,
+            file_paths,
+            max_file_size,
+            remove_comments,
+            index.size_lookup(entries),
+            index.mtime_lookup(entries),
+            jobs,
+            file_cache,
+            deduper=dedupe.Deduplicator(absolute_path) if deduplicate else None,
+            outline=outline,
+            fresh_stats=not tracked_only
+        )
+    finally:
+        if file_cache is not None:
+            file_cache.close()
@@ -0,0 +1,243 @@
+import os
+import time
+import shutil
+import logging
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import NamedTuple
+
+from analyzer import cache, output, parallel
+
+# Repositories queued per worker process; bounds the results and temporary files held at once
+WINDOW_PER_WORKER = 2
+
+
+class BatchJob(NamedTuple):
+    """
+    One repository to package, as sent to a worker process.
+
+    Attributes:
+        root: Repository root directory.
+        output: File the package is written to.
+        use_cache: Whether to use the repository's persistent file cache.
+        options: Keyword arguments for `output.write_package`.
+    """
+    root: str
+    output: str
+    use_cache: bool
+    options: dict
+
+
+class RepoResult(NamedTuple):
+    """
+    Outcome of packaging one repository.
+
+    Attributes:
+        root: Repository root directory.
+        output: File the package was written to (None once appended to a combined package).
+        seconds: Wall time spent on the repository.
+        files: Number of files included.
+        lines: Number of lines included.
+        size: Size of the package in bytes.
+        error: Error message, or None on success.
+    """
+    root: str
+    output: str | None
+    seconds: float
+    files: int = 0
+    lines: int = 0
+    size: int = 0
+    error: str | None = None
+
+
+def read_manifest(path: str) -> list[str]:
+    """
+    Read repository roots from a manifest file.
+
+    One path per line; blank lines and lines starting with `#` are skipped.
+    Relative paths are resolved against the manifest's directory.
+
+    Args:
+        path: Path to the manifest.
+
+    Returns:
+        The repository roots, in file order.
+
+    Raises:
+        OSError: If the manifest can't be read.
+    """
+    base = os.path.dirname(os.path.abspath(path))
+    roots = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith("#"):
+                roots.append(os.path.normpath(os.path.join(base, os.path.expanduser(line))))
+    return roots
+
+
+def output_names(roots: list[str], suffix: str = ".md") -> list[str]:
+    """
+    Pick a distinct package file name for every repository, based on its directory name.
+
+    Args:
+        roots: Repository roots.
+        suffix: File extension(s) of the packages.
+
+    Returns:
+        File names (`<name>.md`, or `<name>-2.md` etc. when names repeat), in the same order.
+    """
+    used = set()
+    names = []
+    for root in roots:
+        stem = os.path.basename(os.path.normpath(root)) or "root"
+        name, n = f"{stem}{suffix}", 1
+        while name in used:
+            n += 1
+            name = f"{stem}-{n}{suffix}"
+        used.add(name)
+        names.append(name)
+    return names
+
+
+def package_repo(job: BatchJob) -> RepoResult:
+    """
+    Write the package of one repository to its output file (runs in a worker process).
+
+    Errors are caught and returned in the result, so one broken repository
+    doesn't stop the batch.
+
+    Args:
+        job: The repository and options.
+
+    Returns:
+        The repository's `RepoResult`.
+    """
+    start = time.perf_counter()
+    file_cache = None
+    try:
+        if not os.path.isdir(job.root):
+            raise NotADirectoryError(f"{job.root} is not a directory")
+        recency = job.options.get("recency")
+        recent_paths = output.select_recent(job.root, recency, job.use_cache) if recency else None
+        file_cache = cache.open_cache(job.root) if job.use_cache else None
+        with output.open_file(job.output) as out:
+            file_count, line_count = output.write_package(
+                out, job.root, file_cache=file_cache, recent_paths=recent_paths, **job.options
+            )
+        return RepoResult(
+            job.root, job.output, time.perf_counter() - start,
+            file_count, line_count, os.path.getsize(job.output)
+        )
+    except Exception as e:
+        logging.debug("Packaging %s failed", job.root, exc_info=True)
+        # Don't leave a partial package behind
+        try:
+            os.remove(job.output)
+        except OSError:
+            pass
+        return RepoResult(job.root, job.output, time.perf_counter() - start, error=str(e) or type(e).__name__)
+    finally:
+        if file_cache is not None:
+            file_cache.close()
+
+
+def run_batch(roots: list[str], options: dict, output_dir: str | None = None, combined: str | None = None,
+              workers: int = 1, use_cache: bool = True, compression: str | None = None) -> list[RepoResult]:
+    """
+    Package many repositories on a pool of worker processes.
+
+    - With `output_dir`, every repository gets its own package file there.
+    - Otherwise the packages are concatenated, in input order, into `combined`
+      (or stdout). Workers write to temporary files that are appended and
+      removed as soon as all earlier repositories are done.
+
+    Only a few repositories per worker are in flight at any time and every
+    package is streamed to disk, so memory stays bounded however long the batch is.
+
+    Args:
+        roots: Repository roots.
+        options: Keyword arguments for `output.write_package` (everything but the stream, root and cache).
+        output_dir: Directory receiving one package per repository.
+        combined: File receiving all packages when `output_dir` is None (stdout if None).
+        workers: Number of worker processes.
+        use_cache: Whether each repository's persistent file cache is used.
+        compression: "gzip" or "zstd" to compress the packages in `output_dir`
+            (a combined package is compressed according to its own file name).
+
+    Returns:
+        One `RepoResult` per repository, in input order.
+    """
+    suffix = ".jsonl" if options.get("output_format") == "jsonl" else ".md"
+    if output_dir is not None:
+        os.makedirs(output_dir, exist_ok=True)
+        work_dir = output_dir
+        suffix = output.compressed_name(suffix, compression)
+    else:
+        parent = os.path.dirname(os.path.abspath(combined)) if combined else None
+        work_dir = tempfile.mkdtemp(prefix="scan-repo-batch-", dir=parent)
+
+    jobs = [
+        BatchJob(os.path.abspath(root), os.path.join(work_dir, name), use_cache, options)
+        for root, name in zip(roots, output_names(roots, suffix))
+    ]
+    workers = max(1, min(workers, len(jobs)))
+    logging.info("Packaging %d repositories with %d worker processes", len(jobs), workers)
+
+    results = []
+    try:
+        with ProcessPoolExecutor(workers) as executor:
+            packaged = parallel.ordered_map(executor, package_repo, jobs, workers * WINDOW_PER_WORKER)
+            if output_dir is not None:
+                for result in packaged:
+                    log_result(result)
+                    results.append(result)
+            else:
+                with output.open_output(combined, banner=options.get("output_format") != "jsonl") as out:
+                    for result in packaged:
+                        log_result(result)
+                        results.append(append_package(out, result))
+    finally:
+        if output_dir is None:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    return results
+
+
+def append_package(out, result: RepoResult) -> RepoResult:
+    """Copy a finished package into the combined stream and delete its temporary file."""
+    if result.error is None:
+        with open(result.output, "r", encoding="utf-8", buffering=output.WRITE_BUFFER_BYTES) as f:
+            shutil.copyfileobj(f, out, output.WRITE_BUFFER_BYTES)
+    try:
+        os.remove(result.output)
+    except OSError:
+        pass
+    return result._replace(output=None)
+
+
+def log_result(result: RepoResult) -> None:
+    """Log a repository as soon as it's done."""
+    if result.error is None:
+        logging.info("Packaged %s in %.2fs (%d files)", result.root, result.seconds, result.files)
+    else:
+        logging.error("Failed to package %s: %s", result.root, result.error)
+
+
+def report(results: list[RepoResult], seconds: float, stream) -> None:
+    """
+    Print the per-repository timings and failures of a batch.
+
+    Args:
+        results: Results from `run_batch`.
+        seconds: Total wall time of the batch.
+        stream: Text stream to write to.
+    """
+    failed = sum(1 for r in results if r.error is not None)
+    stream.write(f"Batch: {len(results) - failed} packaged, {failed} failed in {seconds:.2f}s\n")
+    stream.write(f"  {'status':<7} {'seconds':>8} {'files':>7} {'bytes':>11}  repository\n")
+    for r in results:
+        if r.error is None:
+            stream.write(f"  {'ok':<7} {r.seconds:>8.2f} {r.files:>7} {r.size:>11}  {r.root}\n")
+        else:
+            stream.write(f"  {'FAILED':<7} {r.seconds:>8.2f} {'-':>7} {'-':>11}  {r.root}: {r.error}\n")
@@ -0,0 +1,118 @@
+from abc import ABC, abstractmethod
+
+from analyzer import tokens
+
+
+def text_bytes(text: str) -> int:
+    """Size of a string in UTF-8, without encoding it when it's plain ASCII."""
+    return len(text) if text.isascii() else len(text.encode("utf-8", "surrogateescape"))
+
+
+class Budget(ABC):
+    """
+    Global limit on a package, enforced while it's written.
+
+    Everything written through `wrap` is counted with `measure`. File sections
+    are only written while they `fit`; files left out are recorded in `omitted`.
+    Text written through `wrap(stream, fixed=True)` is counted in `fixed`
+    instead, outside the limit. Subclasses set the `unit` and the `measure`
+    of a piece of text.
+    """
+
+    unit = ""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.used = 0
+        self.fixed = 0
+        self.omitted = []
+        # Last text passed to `cost`, so checking a section and then writing it measures it once
+        self._last = (None, 0)
+
+    @staticmethod
+    @abstractmethod
+    def measure(text: str) -> int:
+        """Size of `text` in the budget's unit."""
+
+    def cost(self, text: str) -> int:
+        """What writing `text` uses of the budget."""
+        last_text, last_cost = self._last
+        if text is not last_text:
+            last_cost = self.measure(text)
+            self._last = (text, last_cost)
+        return last_cost
+
+    def wrap(self, stream, fixed: bool = False) -> "CountingStream":
+        """Count every write to `stream` against the budget, or in `fixed` outside it."""
+        return CountingStream(stream, self, fixed)
+
+    def fits(self, text: str) -> bool:
+        """Whether `text` can still be written without going over the budget."""
+        return self.used + self.cost(text) <= self.limit
+
+    def spent(self) -> bool:
+        """Whether nothing more can be written."""
+        return self.used >= self.limit
+
+    def describe(self) -> str:
+        """Name of the budget for humans, e.g. `2000000-byte`."""
+        return f"{self.limit}-{self.unit}"
+
+
+class ByteBudget(Budget):
+    """
+    Limit on the size of a package in bytes.
+
+    The first file section that doesn't fit stops the package; it and every
+    later file are recorded in `omitted`.
+    """
+
+    unit = "byte"
+    measure = staticmethod(text_bytes)
+
+    @property
+    def max_bytes(self) -> int:
+        return self.limit
+
+
+class TokenBudget(Budget):
+    """
+    Limit on the size of a package in estimated model tokens (see `tokens.estimate_tokens`).
+
+    Files are chosen up front with `tokens.select_files`; a chosen section that
+    turns out larger than estimated is skipped, and smaller ones after it are
+    still written. The tokens of every written file are kept in `file_tokens`,
+    keyed by its path relative to the root. The header and structure are the
+    same whichever files are chosen, so they're counted in `fixed`, outside the
+    limit: a small budget still takes the files that fit it.
+    """
+
+    unit = "token"
+    measure = staticmethod(tokens.estimate_tokens)
+
+    def __init__(self, limit: int):
+        super().__init__(limit)
+        self.file_tokens = {}
+
+    @property
+    def max_tokens(self) -> int:
+        return self.limit
+
+
+class CountingStream:
+    """Text stream wrapper charging every write to a `Budget`."""
+
+    def __init__(self, stream, budget: Budget, fixed: bool = False):
+        self.stream = stream
+        self.budget = budget
+        self.fixed = fixed
+
+    def write(self, text: str) -> int:
+        if self.fixed:
+            self.budget.fixed += self.budget.cost(text)
+        else:
+            self.budget.used += self.budget.cost(text)
+        return self.stream.write(text)
+
+    def flush(self) -> None:
+        self.stream.flush()
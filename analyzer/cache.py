@@ -0,0 +1,201 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import sqlite3
+import threading
+
+from analyzer.version import VERSION_NUM
+
+CACHE_DIR_NAME = "scan-repo"
+CACHE_FILE_NAME = "cache.sqlite"
+DEFAULT_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+
+def default_cache_path(absolute_path: str) -> str:
+    """
+    Choose where the cache database lives for a given root.
+
+    - Inside `.git/` when the root is a git work tree, so the cache travels with the clone.
+    - Otherwise under `$XDG_CACHE_HOME` (or `~/.cache`).
+
+    Args:
+        absolute_path: Root directory being analyzed.
+
+    Returns:
+        Path of the cache database file.
+    """
+    git_dir = os.path.join(absolute_path, ".git")
+    if os.path.isdir(git_dir):
+        return os.path.join(git_dir, CACHE_DIR_NAME, CACHE_FILE_NAME)
+
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, CACHE_DIR_NAME, CACHE_FILE_NAME)
+
+
+class FileCache:
+    """
+    Persistent cache of analyzed file content, stored in a SQLite database.
+
+    Entries are keyed on the file's identity (path, size, mtime) plus every
+    option that changes the rendered content, and evicted least-recently-used once
+    the stored content exceeds `max_bytes`. Safe to share between reader threads;
+    when another process holds the database (e.g. batch workers sharing the
+    user-level cache), new entries are simply not stored.
+    """
+
+    def __init__(self, db_path: str, max_bytes: int = DEFAULT_CACHE_MAX_BYTES):
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._used = {}
+        self._writable = True
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sections ("
+            "key TEXT PRIMARY KEY, content TEXT NOT NULL, lines INTEGER NOT NULL, "
+            "bytes INTEGER NOT NULL, last_used REAL NOT NULL, digest TEXT)"
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(sections)")}
+        if "digest" not in columns:
+            # Databases written before deduplication keys were stored
+            self._conn.execute("ALTER TABLE sections ADD COLUMN digest TEXT")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS sections_last_used ON sections (last_used)")
+
+    @staticmethod
+    def make_key(file_path: str, max_bytes: int, remove_comments: bool, markdown: bool = True,
+                 size: int | None = None, mtime: float | None = None) -> str | None:
+        """
+        Build the cache key for a file from its size and mtime.
+
+        Args:
+            file_path: Path to the file.
+            max_bytes: Byte limit applied when reading.
+            remove_comments: Whether comments are stripped.
+            markdown: Whether the content is prepared for Markdown (see `files.transform_content`).
+            size: Size from the directory scan (see `index.IndexEntry`); the file is
+                stat-ed when `size` or `mtime` is missing.
+            mtime: Modification time from the directory scan.
+
+        Returns:
+            A hex digest, or None if the file can't be stat-ed.
+        """
+        if size is None or mtime is None:
+            try:
+                st = os.stat(file_path)
+            except OSError:
+                return None
+            size, mtime = st.st_size, st.st_mtime
+
+        parts = (os.path.abspath(file_path), size, mtime, max_bytes, remove_comments, VERSION_NUM)
+        if not markdown:
+            parts += ("plain",)
+        return hashlib.sha1("\0".join(map(str, parts)).encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> tuple | None:
+        """
+        Look up analyzed content.
+
+        Args:
+            key: Key from `make_key`.
+
+        Returns:
+            The cached value as it was stored by `put`, or None on a miss.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT content, lines, digest FROM sections WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._used[key] = time.time()
+            if row[2] is None:
+                return row[0], row[1]
+            return row[0], row[1], tuple(json.loads(row[2]))
+
+    def put(self, key: str, value: tuple) -> None:
+        """
+        Store analyzed content.
+
+        Args:
+            key: Key from `make_key`.
+            value: (content, lines) tuple to store, optionally followed by the
+                file's deduplication key (see `dedupe.content_key`).
+        """
+        content, lines = value[:2]
+        digest = json.dumps(value[2]) if len(value) > 2 and value[2] is not None else None
+        with self._lock:
+            if not self._writable:
+                return
+            try:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO sections (key, content, lines, bytes, last_used, digest) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, content, lines, len(content.encode("utf-8", "surrogateescape")), time.time(), digest),
+                )
+            except sqlite3.OperationalError as e:
+                # Locked by another process: keep serving hits, stop storing
+                self._writable = False
+                logging.info("Cache %s is busy (%s); not storing new entries", self.db_path, e)
+
+    def close(self) -> None:
+        """
+        Record access times, evict old entries over the size limit and commit.
+        """
+        with self._lock:
+            try:
+                if self._writable:
+                    self._conn.executemany(
+                        "UPDATE sections SET last_used = ? WHERE key = ?",
+                        [(ts, key) for key, ts in self._used.items()],
+                    )
+                    self._evict()
+                    self._conn.commit()
+            except sqlite3.OperationalError as e:
+                logging.info("Cache %s is busy (%s); access times not updated", self.db_path, e)
+            finally:
+                self._conn.close()
+
+        logging.info("Cache %s: %d hits, %d misses", self.db_path, self.hits, self.misses)
+
+    def _evict(self) -> None:
+        """Delete least-recently-used entries until the cache fits in `max_bytes`."""
+        total = self._conn.execute("SELECT COALESCE(SUM(bytes), 0) FROM sections").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        stale = []
+        for key, size in self._conn.execute("SELECT key, bytes FROM sections ORDER BY last_used"):
+            if total <= self.max_bytes:
+                break
+            stale.append((key,))
+            total -= size
+
+        self._conn.executemany("DELETE FROM sections WHERE key = ?", stale)
+        logging.info("Evicted %d cache entries", len(stale))
+
+
+def open_cache(absolute_path: str) -> FileCache | None:
+    """
+    Open the persistent cache for a root, or return None if it can't be used.
+
+    Args:
+        absolute_path: Root directory being analyzed.
+
+    Returns:
+        A `FileCache`, or None when the cache location isn't writable.
+    """
+    db_path = default_cache_path(absolute_path)
+    try:
+        return FileCache(db_path)
+    except (OSError, sqlite3.Error) as e:
+        logging.warning("Cache disabled, could not open %s: %s", db_path, e)
+        return None
@@ -3,9 +3,9 @@ import logging
 import os
 import sys
 
-from analyzer import config, paths
+from analyzer import config
+from analyzer.version import VERSION_NUM
 
-VERSION_NUM = "0.2.1"
 DEFAULT_MAX_FILE_BYTES = 16 * 1024
 
 
@@ -31,27 +31,242 @@ def build_parser():
         default=None,
         help="Write results to file instead of stdout"
     )
+    parser.add_argument(
+        "-f", "--format",
+        choices=("markdown", "jsonl"),
+        default=None,
+        help="Package format: markdown, or jsonl with one JSON record per file "
+             "(default: jsonl for .jsonl/.ndjson output files, otherwise markdown)"
+    )
+    parser.add_argument(
+        "--compress",
+        choices=("gzip", "zstd"),
+        default=None,
+        help="Compress output files (implied by a .gz or .zst output file name)"
+    )
     parser.add_argument(
         "-r", "--recent",
         action="store_true",
         help="Include only recently modified files"
     )
+    parser.add_argument(
+        "--recent-days",
+        type=int,
+        default=None,
+        metavar="N",
+        help="Include only files changed by commits from the last N days (implies --recent)"
+    )
+    parser.add_argument(
+        "--recent-commits",
+        type=int,
+        default=None,
+        metavar="N",
+        help="Include only files changed by the last N commits (implies --recent)"
+    )
+    parser.add_argument(
+        "--recent-since",
+        default=None,
+        metavar="REF",
+        help="Include only files changed by commits since REF, e.g. main or v1.2 (implies --recent)"
+    )
     parser.add_argument(
         "-vb", "--verbose",
         action="store_true",
         help="Enable verbose logging"
     )
+    parser.add_argument(
+        "--structure-depth",
+        type=int,
+        default=None,
+        metavar="N",
+        help="Collapse directories N levels below the root in the Structure section"
+    )
+    parser.add_argument(
+        "--structure-max-entries",
+        type=int,
+        default=None,
+        metavar="N",
+        help="Collapse directories with more than N entries in the Structure section"
+    )
+    parser.add_argument(
+        "--structure-annotate",
+        action="store_true",
+        help="Annotate directories in the Structure section with their file count and total size"
+    )
     parser.add_argument(
         "--max-file-size",
         type=int,
         default=None,
         help="Maximum file size in bytes to include (default from config or 16KB)"
     )
+    parser.add_argument(
+        "--max-total-bytes",
+        type=int,
+        default=None,
+        metavar="N",
+        help="Stop adding files once the package reaches N bytes; the rest are listed as omitted"
+    )
+    parser.add_argument(
+        "--token-budget",
+        type=int,
+        default=None,
+        metavar="N",
+        help="Fit the package in about N model tokens, choosing as many files as possible"
+    )
+    parser.add_argument(
+        "--priority",
+        action="append",
+        default=None,
+        metavar="PATTERN",
+        help="Prefer files matching a gitignore-style pattern under --token-budget (repeatable)"
+    )
+    parser.add_argument(
+        "--outline",
+        nargs="?",
+        const="large",
+        choices=("large", "all"),
+        default=None,
+        metavar="MODE",
+        help="Show files over --max-file-size as an outline of their signatures instead of truncating them; "
+             "'all' outlines every source file"
+    )
+    parser.add_argument(
+        "--shard-size",
+        default=None,
+        metavar="SIZE",
+        help="Split the package into numbered files of at most SIZE bytes (e.g. 4MB) "
+             "or estimated tokens (e.g. 32000t), with an index of their files"
+    )
+    parser.add_argument(
+        "--since",
+        default=None,
+        metavar="REF",
+        help="Only package files changed since a git ref (uncommitted changes included) and list deleted ones"
+    )
+    parser.add_argument(
+        "--since-package",
+        default=None,
+        metavar="FILE",
+        help="Only package files changed since an earlier package written with --record-hashes"
+    )
+    parser.add_argument(
+        "--diff",
+        action="store_true",
+        help="Show modified files as unified diffs with --since or --since-package"
+    )
+    parser.add_argument(
+        "--record-hashes",
+        action="store_true",
+        help="Append a manifest of file sizes, mtimes and content hashes for a later --since-package"
+    )
     parser.add_argument(
         "-rc", "--remove-comments",
         action="store_true",
         help="Remove comments from code files in the output"
     )
+    parser.add_argument(
+        "--dedupe",
+        action="store_true",
+        help="Emit identical files once; later copies reference the first by path"
+    )
+    parser.add_argument(
+        "-j", "--jobs",
+        type=int,
+        default=None,
+        help="Read and process files with N parallel workers (0 = one per CPU core, default 1)"
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Don't read or update the persistent cache of processed files"
+    )
+    parser.add_argument(
+        "-t", "--tracked",
+        action="store_true",
+        help="List files from the git index (tracked files only) instead of walking the directory"
+    )
+    parser.add_argument(
+        "-x", "--exclude",
+        action="append",
+        default=None,
+        metavar="PATTERN",
+        help="Exclude paths matching a gitignore-style pattern (repeatable)"
+    )
+    parser.add_argument(
+        "-i", "--include",
+        action="append",
+        default=None,
+        metavar="PATTERN",
+        help="Only include files matching a gitignore-style pattern (repeatable)"
+    )
+    parser.add_argument(
+        "-b", "--batch",
+        action="store_true",
+        help="Treat every path as a separate repository and package them all (see --manifest)"
+    )
+    parser.add_argument(
+        "--manifest",
+        default=None,
+        metavar="FILE",
+        help="Package every repository listed in FILE, one path per line (implies --batch)"
+    )
+    parser.add_argument(
+        "--output-dir",
+        default=None,
+        metavar="DIR",
+        help="In batch mode, write one package per repository into DIR instead of one combined package"
+    )
+    parser.add_argument(
+        "--batch-jobs",
+        type=int,
+        default=None,
+        metavar="N",
+        help="Number of worker processes in batch mode (0 = one per CPU core, the default)"
+    )
+    parser.add_argument(
+        "-w", "--watch",
+        action="store_true",
+        help="Keep running and rewrite the output file whenever files change (default output: context-package.md)"
+    )
+    parser.add_argument(
+        "--poll-interval",
+        type=float,
+        default=None,
+        metavar="SECONDS",
+        help="Rescan interval for --watch when inotify isn't available (default 0.5)"
+    )
+    parser.add_argument(
+        "--serve",
+        nargs="?",
+        const="127.0.0.1:8765",
+        default=None,
+        metavar="ADDRESS",
+        help="Run a package server on HOST:PORT (default 127.0.0.1:8765) or a Unix socket path, "
+             "keeping indexes and file contents warm between requests"
+    )
+    parser.add_argument(
+        "--serve-cache-mb",
+        type=int,
+        default=None,
+        metavar="N",
+        help="Memory for file contents cached by --serve, in MB (default 256)"
+    )
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const="",
+        default=None,
+        metavar="FILE",
+        help="Print per-phase timings and the slowest files to stderr; "
+             "optionally save the profile as JSON (Chrome trace if FILE ends in .trace.json)"
+    )
+    parser.add_argument(
+        "--profile-top",
+        type=int,
+        default=None,
+        metavar="N",
+        help="Number of slowest files listed by --profile (default 10)"
+    )
 
     return parser
 
@@ -72,10 +287,13 @@ def main(argv: list[str] | None = None) -> None:
     Returns:
         None. Exits the program with code 1 on fatal error.
     """
-    # Parse CLI arguments
+    # Parse CLI arguments (--help and --version exit here, before any heavy imports)
     parser = build_parser()
     args = parser.parse_args(argv)
 
+    # Imported after parsing so --help/--version don't load the analysis modules
+    from analyzer import parallel, paths
+
     # Configure logging based on verbosity flag
     logging.basicConfig(
         level=logging.INFO if args.verbose else logging.WARNING,
@@ -87,18 +305,63 @@ def main(argv: list[str] | None = None) -> None:
 
     # Merge CLI args with config defaults
     args.output = config.merge_config(args, cfg, "output", str, args.output)
+    args.format = config.merge_config(args, cfg, "format", str, args.format)
+    args.compress = config.merge_config(args, cfg, "compress", str, args.compress)
     args.recent = config.merge_config(args, cfg, "recent", bool, args.recent)
     args.verbose = config.merge_config(args, cfg, "verbose", bool, args.verbose)
+    args.recent_days = config.merge_config(args, cfg, "recent_days", int, args.recent_days)
+    args.recent_commits = config.merge_config(args, cfg, "recent_commits", int, args.recent_commits)
+    args.recent_since = config.merge_config(args, cfg, "recent_since", str, args.recent_since)
     args.paths = config.merge_config(args, cfg, "paths", list, args.paths or [])
+    args.structure_depth = config.merge_config(args, cfg, "structure_depth", int, args.structure_depth)
+    args.structure_max_entries = config.merge_config(
+        args, cfg, "structure_max_entries", int, args.structure_max_entries
+    )
+    args.structure_annotate = config.merge_config(args, cfg, "structure_annotate", bool, args.structure_annotate)
     args.max_file_size = config.merge_config(
         args, cfg, "max_file_size", int, args.max_file_size
     ) or DEFAULT_MAX_FILE_BYTES
+    args.max_total_bytes = config.merge_config(args, cfg, "max_total_bytes", int, args.max_total_bytes)
+    args.token_budget = config.merge_config(args, cfg, "token_budget", int, args.token_budget)
+    args.priority = config.merge_config(args, cfg, "priority", list, args.priority or [])
+    args.outline = config.merge_config(args, cfg, "outline", str, args.outline)
+    args.shard_size = config.merge_config(args, cfg, "shard_size", str, args.shard_size)
+    args.since = config.merge_config(args, cfg, "since", str, args.since)
+    args.since_package = config.merge_config(args, cfg, "since_package", str, args.since_package)
+    args.diff = config.merge_config(args, cfg, "diff", bool, args.diff)
+    args.record_hashes = config.merge_config(args, cfg, "record_hashes", bool, args.record_hashes)
     args.remove_comments = config.merge_config(
         args, cfg, "remove_comments", bool, args.remove_comments
     )
+    args.dedupe = config.merge_config(args, cfg, "dedupe", bool, args.dedupe)
+    args.jobs = config.merge_config(args, cfg, "jobs", int, args.jobs)
+    args.jobs = parallel.resolve_jobs(args.jobs) if args.jobs is not None else 1
+    args.no_cache = config.merge_config(args, cfg, "no_cache", bool, args.no_cache)
+    args.tracked = config.merge_config(args, cfg, "tracked", bool, args.tracked)
+    args.exclude = config.merge_config(args, cfg, "exclude", list, args.exclude or [])
+    args.include = config.merge_config(args, cfg, "include", list, args.include or [])
+    args.profile_top = config.merge_config(args, cfg, "profile_top", int, args.profile_top) or 10
+    args.manifest = config.merge_config(args, cfg, "manifest", str, args.manifest)
+    args.batch = config.merge_config(args, cfg, "batch", bool, args.batch) or args.manifest is not None
+    args.output_dir = config.merge_config(args, cfg, "output_dir", str, args.output_dir)
+    args.batch_jobs = parallel.resolve_jobs(config.merge_config(args, cfg, "batch_jobs", int, args.batch_jobs))
+    args.watch = config.merge_config(args, cfg, "watch", bool, args.watch)
+    args.poll_interval = config.merge_config(args, cfg, "poll_interval", float, args.poll_interval) or 0.5
+    args.serve = config.merge_config(args, cfg, "serve", str, args.serve)
+    args.serve_cache_mb = config.merge_config(args, cfg, "serve_cache_mb", int, args.serve_cache_mb) or 256
+
+    if args.serve:
+        # Server mode: packages are requested over the socket, not from the command line;
+        # the path argument is the directory requests are confined to
+        if len(args.paths) > 1:
+            logging.error("--serve takes at most one directory, the root requests are confined to.")
+            sys.exit(1)
+        from analyzer import server
+        server.serve(args.serve, args.serve_cache_mb * 1024 * 1024, args.paths[0] if args.paths else None)
+        return
 
-    # Default to current working directory if no paths are provided
-    if not args.paths:
+    # Default to current working directory if no paths are provided (a manifest lists its own)
+    if not args.paths and args.manifest is None:
         args.paths = [os.getcwd()]
 
     # Delegate to core logic
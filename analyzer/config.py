@@ -1,11 +1,6 @@
 import logging
 import os
 
-try:
-    import toml
-except ImportError:
-    toml = None
-
 
 DEFAULT_CONFIG_FILE = ".scan-repo-config.toml"
 
@@ -13,19 +8,32 @@ DEFAULT_CONFIG_FILE = ".scan-repo-config.toml"
 def load_config_file(path: str = DEFAULT_CONFIG_FILE) -> dict:
     """
     Load configuration from a TOML file if available.
-    Returns an empty dict if no config file or toml not installed.
+    Returns an empty dict if no config file or no TOML parser is available.
+
+    The parser is imported only when a config file exists: the standard library
+    `tomllib` on Python 3.11+, otherwise the `toml` package.
     """
     if not os.path.exists(path):
         logging.debug("No config file found at %s", path)
         return {}
 
-    if toml is None:
-        logging.warning("TOML support not found. Install 'toml' package to enable config file support.")
-        return {}
+    try:
+        import tomllib
+    except ImportError:
+        tomllib = None
+        try:
+            import toml
+        except ImportError:
+            logging.warning("TOML support not found. Install 'toml' package to enable config file support.")
+            return {}
 
     try:
-        with open(path, "r", encoding="utf-8") as f:
-            cfg = toml.load(f)
+        if tomllib is not None:
+            with open(path, "rb") as f:
+                cfg = tomllib.load(f)
+        else:
+            with open(path, "r", encoding="utf-8") as f:
+                cfg = toml.load(f)
         logging.debug("Loaded config from %s", path)
         return cfg
     except Exception as e:
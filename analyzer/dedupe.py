@@ -0,0 +1,168 @@
+import os
+import hashlib
+import logging
+
+from analyzer import files
+
+# Read size used when hashing whole files
+HASH_CHUNK_BYTES = 1024 * 1024
+
+# blake2b is the fastest cryptographic hash in hashlib; 16 bytes is plenty for equality checks
+DIGEST_SIZE = 16
+
+
+def digest_bytes(data: bytes) -> str:
+    """Hash a buffer with blake2b."""
+    return hashlib.blake2b(data, digest_size=DIGEST_SIZE).hexdigest()
+
+
+def digest_file(file_path: str) -> str:
+    """
+    Hash a whole file with blake2b, reading it in chunks.
+
+    Args:
+        file_path: Path to the file.
+
+    Returns:
+        The hex digest.
+    """
+    h = hashlib.blake2b(digest_size=DIGEST_SIZE)
+    with open(file_path, "rb") as f:
+        while True:
+            chunk = f.read(HASH_CHUNK_BYTES)
+            if not chunk:
+                break
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def content_key(raw: files.RawFile, file_path: str, remove_comments: bool) -> tuple | None:
+    """
+    Build the deduplication key of a file from the bytes read for it.
+
+    - Files read in full are keyed on the hash of their bytes.
+    - Files cut at the size limit are keyed on their size and the hash of the
+      kept prefix; matches are confirmed with a full hash (see `Deduplicator`).
+    - With comment removal the output also depends on the language, so the
+      extension is part of the key.
+
+    Args:
+        raw: Bytes from `files.read_file_bytes`.
+        file_path: Path to the file.
+        remove_comments: Whether comments are stripped from the content.
+
+    Returns:
+        A hashable key, or None for binary files (whose placeholder is already short).
+    """
+    if raw.binary:
+        return None
+    variant = os.path.splitext(file_path)[1].lower() if remove_comments else ""
+    if raw.truncated:
+        return "prefix", raw.size, digest_bytes(raw.data), variant
+    return "full", digest_bytes(raw.data), variant
+
+
+def file_key(file_path: str, max_bytes: int, remove_comments: bool) -> tuple | None:
+    """
+    Read a file just to compute its deduplication key (used when its content came from the cache).
+
+    Returns:
+        The key from `content_key`, or None if the file can't be read.
+    """
+    try:
+        return content_key(files.read_file_bytes(file_path, max_bytes), file_path, remove_comments)
+    except OSError as e:
+        logging.debug("Could not hash %s: %s", file_path, e)
+        return None
+
+
+class Deduplicator:
+    """
+    Tracks file contents already emitted in a package.
+
+    The first file with a given content is emitted in full; later ones are
+    reported as duplicates of it. Files compared on a size + prefix key are
+    only considered duplicates once a hash of their whole content matches.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self.first = {}
+        self.keys = {}
+        self.full_digests = {}
+        self.duplicates = 0
+        self.bytes_saved = 0
+
+    def original_of(self, file_path: str, key: tuple | None) -> str | None:
+        """
+        Register a file and find the earlier file it duplicates.
+
+        Args:
+            file_path: Path to the file.
+            key: Key from `content_key`/`file_key`.
+
+        Returns:
+            Path of the first file with identical content, or None if this content is new.
+        """
+        if key is None:
+            return None
+        if key[0] != "prefix":
+            original = self.first.get(key)
+            if original is None:
+                self.first[key] = file_path
+                self.keys[file_path] = key
+            return original
+
+        # Same size and prefix: compare the whole files before calling them identical
+        candidates = self.first.setdefault(key, [])
+        if candidates:
+            digest = self._full_digest(file_path)
+            for candidate in candidates:
+                if digest is not None and self._full_digest(candidate) == digest:
+                    return candidate
+        candidates.append(file_path)
+        self.keys[file_path] = key
+        return None
+
+    def discard(self, file_path: str) -> None:
+        """
+        Forget a file that was left out of the package, so later copies are emitted in full.
+
+        Args:
+            file_path: Path of a file registered by `original_of`.
+        """
+        key = self.keys.pop(file_path, None)
+        if key is None:
+            return
+        if key[0] != "prefix":
+            del self.first[key]
+        else:
+            self.first[key].remove(file_path)
+
+    def _full_digest(self, file_path: str) -> str | None:
+        digest = self.full_digests.get(file_path)
+        if digest is None:
+            try:
+                digest = self.full_digests[file_path] = digest_file(file_path)
+            except OSError as e:
+                logging.debug("Could not hash %s: %s", file_path, e)
+        return digest
+
+    def label(self, file_path: str) -> str:
+        """Path of a file as shown in duplicate references: relative to the package root."""
+        return os.path.relpath(os.path.abspath(file_path), self.root).replace(os.sep, "/")
+
+    def record(self, full_section: str, short_section: str) -> bool:
+        """
+        Count a duplicate and the bytes saved by emitting `short_section` instead of `full_section`.
+
+        Returns:
+            Whether `short_section` is shorter; if not, nothing is counted and the
+            full section should be emitted instead.
+        """
+        saved = len(full_section.encode("utf-8", "surrogateescape")) - len(short_section.encode("utf-8"))
+        if saved <= 0:
+            return False
+        self.duplicates += 1
+        self.bytes_saved += saved
+        return True
@@ -0,0 +1,344 @@
+import os
+import json
+import difflib
+import logging
+import subprocess
+from typing import NamedTuple
+
+from analyzer import dedupe, git, gitindex, ignore
+
+# First characters of the manifest lines written by `manifest_lines` (see `read_package`)
+MANIFEST_PREFIX = '{"type": "manifest"'
+FILE_PREFIX = '{"type": "file"'
+
+# Markdown packages keep their manifest in an HTML comment, invisible when rendered
+MARKDOWN_MANIFEST_START = "<!-- scan-repo manifest"
+MARKDOWN_MANIFEST_END = "-->"
+
+
+class DeltaError(Exception):
+    """Raised when the base of a delta can't be read (unknown ref, package without a manifest)."""
+
+
+class Delta:
+    """
+    Files changed since a base: a git ref or an earlier package.
+
+    Attributes:
+        base: Description of the base, e.g. `main` or `package.md`.
+        status: "added" or "modified" by path relative to the root (`/`-separated).
+        removed: Paths of files that existed in the base but no longer do.
+        diffs: Unified diffs of modified files by relative path (from git), when requested.
+        hashes: Content hashes computed while comparing, reused by `manifest_lines`.
+        previous: File contents of an earlier package by relative path, diffed against
+            the new contents when requested.
+    """
+
+    def __init__(self, base: str, status: dict[str, str], removed: list[str],
+                 diffs: dict[str, str] | None = None, hashes: dict[str, str] | None = None,
+                 previous: dict[str, str | None] | None = None):
+        self.base = base
+        self.status = status
+        self.removed = removed
+        self.diffs = diffs
+        self.hashes = hashes or {}
+        self.previous = previous
+
+    def select(self, absolute_path: str, file_paths: list[str]) -> list[str]:
+        """
+        Keep the selected files that were added or modified, in order.
+
+        Changed files the package doesn't select (excluded, ignored, not
+        requested) are dropped from `status`, so `counts` only reports files
+        the package covers.
+        """
+        prefix = os.path.join(absolute_path, "")
+        status = {}
+        kept = []
+        for file_path in file_paths:
+            rel_path = _rel_path(file_path, absolute_path, prefix)
+            if rel_path in self.status:
+                status[rel_path] = self.status[rel_path]
+                kept.append(file_path)
+        self.status = status
+        return kept
+
+    def patch(self, rel_path: str, content: str | None) -> str | None:
+        """
+        Return the unified diff of a modified file, or None to show it in full.
+
+        Args:
+            rel_path: Path relative to the root, `/`-separated.
+            content: Content kept from the file now (None for binary files).
+        """
+        if self.status.get(rel_path) != "modified":
+            return None
+        if self.diffs is not None:
+            return self.diffs.get(rel_path)
+        if self.previous is not None and self.previous.get(rel_path) is not None and content is not None:
+            return unified_diff(self.previous[rel_path], content, rel_path)
+        return None
+
+    def counts(self) -> tuple[int, int, int]:
+        """Number of added, modified and removed files."""
+        added = sum(1 for s in self.status.values() if s == "added")
+        return added, len(self.status) - added, len(self.removed)
+
+
+class BasePackage(NamedTuple):
+    """
+    What `--since-package` needs from an earlier package.
+
+    Attributes:
+        name: File name of the package, shown as the base of the delta.
+        manifest: Manifest entries (`size`, `mtime`, `hash`) by relative path.
+        contents: File contents by relative path, or None if not requested or not available.
+    """
+    name: str
+    manifest: dict[str, dict]
+    contents: dict[str, str | None] | None
+
+
+def _rel_path(file_path: str, absolute_path: str, prefix: str) -> str:
+    abs_path = os.path.abspath(file_path)
+    rel_path = abs_path[len(prefix):] if abs_path.startswith(prefix) else os.path.relpath(abs_path, absolute_path)
+    return rel_path.replace(os.sep, "/")
+
+
+def _run_git(absolute_path: str, *args: str) -> bytes:
+    cmd = ["git", "-C", absolute_path, *args]
+    try:
+        result = subprocess.run(cmd, capture_output=True)
+    except OSError as e:
+        raise DeltaError(f"could not run git: {e}") from None
+    if result.returncode != 0:
+        message = result.stderr.decode("utf-8", "replace").strip().splitlines()
+        raise DeltaError(f"git {args[0]} failed: {message[0] if message else f'exit status {result.returncode}'}")
+    return result.stdout
+
+
+def since_ref(absolute_path: str, ref: str, with_diffs: bool = False, excludes=(), includes=()) -> Delta:
+    """
+    Find the files changed between a git ref and the work tree, uncommitted work included.
+
+    Two git calls cover everything: `git diff --name-status` lists tracked files
+    added, modified or deleted since `ref` (staged or not), and `git ls-files --others`
+    lists new untracked files. With `with_diffs`, one more `git diff` produces the
+    patches of all modified files at once.
+
+    Args:
+        absolute_path: Directory being packaged (anywhere inside a work tree).
+        ref: Commit, branch or tag to compare against.
+        with_diffs: Whether to collect unified diffs of modified files.
+        excludes: Extra gitignore-style patterns; removed files matching them aren't reported.
+        includes: Patterns a removed file must match to be reported (all files if empty).
+
+    Returns:
+        A `Delta` with paths relative to `absolute_path`.
+
+    Raises:
+        DeltaError: If `absolute_path` isn't in a git repository or `ref` isn't a commit.
+    """
+    if gitindex.find_git_dir(absolute_path) is None:
+        raise DeltaError(f"--since needs a git repository; {absolute_path} isn't in one")
+
+    # Only the resolved sha reaches git diff, so a ref can't be read as an option
+    try:
+        sha = git.verify_commit(absolute_path, ref)
+    except git.RefError as e:
+        raise DeltaError(f"--since: {e}") from None
+    except OSError as e:
+        raise DeltaError(f"could not run git: {e}") from None
+
+    # --relative limits the diff to this directory and reports paths relative to it
+    diff_args = ("--no-renames", "--no-ext-diff", "--no-color", "--relative", sha, "--")
+    listing = _run_git(absolute_path, "diff", "--name-status", "-z", *diff_args)
+    untracked = _run_git(absolute_path, "ls-files", "--others", "--exclude-standard", "-z")
+
+    status = {}
+    removed = []
+    fields = listing.split(b"\0")
+    for code, name in zip(fields[0::2], fields[1::2]):
+        rel_path = os.fsdecode(name)
+        if code == b"D":
+            removed.append(rel_path)
+        else:
+            status[rel_path] = "added" if code == b"A" else "modified"
+    for name in untracked.split(b"\0"):
+        if name:
+            status[os.fsdecode(name)] = "added"
+
+    matcher = ignore.IgnoreMatcher(absolute_path, excludes, includes, use_gitignore=False)
+    removed = sorted(p for p in removed if matcher.keeps_path(p))
+
+    diffs = None
+    if with_diffs and any(s == "modified" for s in status.values()):
+        diffs = split_patch(_run_git(absolute_path, "diff", *diff_args).decode("utf-8", "replace"))
+
+    logging.info("%d file(s) changed and %d removed since %s", len(status), len(removed), ref)
+    return Delta(ref, status, removed, diffs)
+
+
+def split_patch(patch: str) -> dict[str, str]:
+    """
+    Split the output of `git diff --no-renames` into one patch per file.
+
+    Args:
+        patch: Unified diff of several files.
+
+    Returns:
+        Each file's patch (starting at its `---` line) by path; files whose header
+        uses quoted paths, or that have no hunks, are left out and shown in full instead.
+    """
+    diffs = {}
+    # Diff lines start with "+", "-", " " or "\\", so only file headers start with "diff --git"
+    for chunk in ("\n" + patch).split("\ndiff --git ")[1:]:
+        header, _, body = chunk.partition("\n")
+        if not header.startswith("a/"):
+            continue
+        # Without renames both sides name the same path: "a/<path> b/<path>"
+        rel_path = header[2:(len(header) - 1) // 2]
+        # Binary and mode-only changes have no hunks: those files are shown in full
+        start = body.find("\n--- ")
+        if start >= 0:
+            diffs[rel_path] = body[start + 1:].rstrip("\n")
+    return diffs
+
+
+def since_package(absolute_path: str, base: BasePackage, file_paths: list[str], sizes: dict[str, int],
+                  mtimes: dict[str, float]) -> Delta:
+    """
+    Find the files changed since an earlier package, from the manifest recorded in it
+    (see `read_package` and `manifest_lines`).
+
+    Files whose size and mtime match the manifest are unchanged without being
+    read; the others are hashed and compared, so only changed files cost I/O.
+
+    Args:
+        absolute_path: Directory being packaged.
+        base: The earlier package, from `read_package`.
+        file_paths: Files selected for the new package.
+        sizes: File sizes from the index, keyed by absolute path.
+        mtimes: Modification times from the index, keyed by absolute path.
+
+    Returns:
+        A `Delta` with paths relative to `absolute_path`.
+    """
+    manifest = base.manifest
+    prefix = os.path.join(absolute_path, "")
+    status = {}
+    hashes = {}
+    seen = set()
+    for file_path in file_paths:
+        abs_path = os.path.abspath(file_path)
+        rel_path = _rel_path(file_path, absolute_path, prefix)
+        seen.add(rel_path)
+        recorded = manifest.get(rel_path)
+        if recorded is None:
+            status[rel_path] = "added"
+            continue
+        if recorded.get("size") == sizes.get(abs_path) and recorded.get("mtime") == mtimes.get(abs_path):
+            continue
+        try:
+            digest = hashes[rel_path] = dedupe.digest_file(file_path)
+        except OSError as e:
+            logging.warning("Could not hash %s: %s", file_path, e)
+            digest = None
+        if digest != recorded.get("hash"):
+            status[rel_path] = "modified"
+
+    # Files no longer selected but still on disk (e.g. newly excluded) weren't removed
+    removed = sorted(p for p in manifest if p not in seen and not os.path.lexists(os.path.join(absolute_path, p)))
+
+    logging.info("%d file(s) changed and %d removed since %s", len(status), len(removed), base.name)
+    return Delta(base.name, status, removed, hashes=hashes, previous=base.contents)
+
+
+def read_package(lines, name: str, is_jsonl: bool, with_contents: bool = False) -> BasePackage:
+    """
+    Read the manifest (and optionally the file contents) of an earlier package.
+
+    Args:
+        lines: The package, as an iterable of lines (see `output.open_input`).
+        name: File name of the package.
+        is_jsonl: Whether it's a JSON Lines package; a Markdown package keeps its
+            manifest in an HTML comment at the end.
+        with_contents: Whether to collect file contents by path, to diff modified
+            files against (JSON Lines packages only; Markdown escapes the contents).
+
+    Returns:
+        The manifest and contents.
+
+    Raises:
+        DeltaError: If the package is malformed or has no manifest.
+    """
+    contents = {} if with_contents and is_jsonl else None
+    manifest = {}
+    in_manifest = is_jsonl
+    try:
+        for line in lines:
+            if not is_jsonl and line.startswith(MARKDOWN_MANIFEST_START):
+                # The manifest comes last; a file quoting the marker starts it over
+                in_manifest = True
+                manifest.clear()
+            elif not in_manifest:
+                continue
+            elif not is_jsonl and line.startswith(MARKDOWN_MANIFEST_END):
+                in_manifest = False
+            elif line.startswith(MANIFEST_PREFIX):
+                record = json.loads(line)
+                manifest[record["path"]] = record
+            elif contents is not None and line.startswith(FILE_PREFIX):
+                record = json.loads(line)
+                contents[record["path"]] = record.get("content")
+    except (ValueError, KeyError) as e:
+        raise DeltaError(f"could not read {name}: {e}") from None
+
+    if not manifest:
+        raise DeltaError(f"{name} has no manifest; create it with --record-hashes")
+    if with_contents and contents is None:
+        logging.warning("%s isn't a JSON Lines package; showing changed files in full.", name)
+    return BasePackage(name, manifest, contents)
+
+
+def unified_diff(old: str, new: str, rel_path: str) -> str:
+    """Diff the content recorded in an earlier package against the current content."""
+    lines = difflib.unified_diff(
+        old.splitlines(keepends=True), new.splitlines(keepends=True), f"a/{rel_path}", f"b/{rel_path}"
+    )
+    # Make every line end in a newline, like git's "\ No newline at end of file" does
+    return "".join(line if line.endswith("\n") else line + "\n" for line in lines).rstrip("\n")
+
+
+def manifest_lines(absolute_path: str, file_paths: list[str], sizes: dict[str, int], mtimes: dict[str, float],
+                   previous: dict[str, dict] | None = None, delta: Delta | None = None):
+    """
+    Describe every selected file for a later `--since-package`: path, size, mtime and content hash.
+
+    Hashes are reused from the previous manifest for files whose size and mtime
+    didn't change, and from the comparison that built `delta`, so only new or
+    changed files are read again.
+
+    Yields:
+        One JSON line per file, starting with `MANIFEST_PREFIX`.
+    """
+    prefix = os.path.join(absolute_path, "")
+    previous = previous or {}
+    known = delta.hashes if delta is not None else {}
+    for file_path in file_paths:
+        abs_path = os.path.abspath(file_path)
+        rel_path = _rel_path(file_path, absolute_path, prefix)
+        size, mtime = sizes.get(abs_path), mtimes.get(abs_path)
+        digest = known.get(rel_path)
+        if digest is None:
+            recorded = previous.get(rel_path)
+            if recorded is not None and recorded.get("size") == size and recorded.get("mtime") == mtime:
+                digest = recorded.get("hash")
+        if digest is None:
+            try:
+                digest = dedupe.digest_file(file_path)
+            except OSError as e:
+                logging.warning("Could not hash %s: %s", file_path, e)
+        record = {"type": "manifest", "path": rel_path, "size": size, "mtime": mtime, "hash": digest}
+        # Escaped so a path can't close the HTML comment holding a Markdown manifest
+        yield json.dumps(record, ensure_ascii=False).replace("-->", "--\\u003e") + "\n"
@@ -1,17 +1,33 @@
 import os
+import mmap
 import time
 import logging
 import re
+from typing import NamedTuple
 
-from analyzer import removelines
+from analyzer import index, removelines
 
-def is_recently_modified(file_path: str, recent_day: int = 7) -> bool:
+# Files at least this large are memory-mapped instead of read
+MMAP_MIN_BYTES = 256 * 1024
+
+# How much of the start of a file is inspected to detect binary content
+SNIFF_BYTES = 8 * 1024
+
+# Leading bytes of common binary formats that may not contain NULs early on
+BINARY_SIGNATURES = (
+    b"\x89PNG", b"GIF87a", b"GIF89a", b"\xff\xd8\xff", b"%PDF", b"PK\x03\x04",
+    b"\x1f\x8b", b"\xfd7zXZ", b"7z\xbc\xaf", b"\x28\xb5\x2f\xfd", b"\x7fELF",
+    b"\xca\xfe\xba\xbe", b"\xcf\xfa\xed\xfe", b"OggS", b"fLaC", b"SQLite format 3",
+)
+
+def is_recently_modified(file_path: str, recent_day: int = 7, mtime: float | None = None) -> bool:
     """
     Check if a file was modified within the last `recent_day` days.
 
     Args:
         file_path: Path to the file.
         recent_day: Number of days to consider as "recent".
+        mtime: Modification time already known from the index; stats the file if omitted.
 
     Returns:
         True if the file was modified within the threshold, False otherwise.
@@ -19,7 +35,7 @@ def is_recently_modified(file_path: str, recent_day: int = 7) -> bool:
 
     try:
         # Get the last modification time of the file (in seconds since epoch)
-        last_modified_time = os.stat(file_path).st_mtime
+        last_modified_time = mtime if mtime is not None else os.stat(file_path).st_mtime
 
         # Calculate how many days ago the file was modified
         days_difference = (time.time() - last_modified_time) / (60 * 60 * 24)
@@ -32,90 +48,233 @@ def is_recently_modified(file_path: str, recent_day: int = 7) -> bool:
         return False
 
 
-def analyze_file_content(file_path: str, max_bytes: int, remove_comments: bool = False) -> tuple[str, int]:
+class RawFile(NamedTuple):
     """
-    Read and sanitize the content of a file, up to a byte limit.
+    Bytes read from a file, before any decoding or sanitizing.
+
+    Attributes:
+        data: File content, cut at `max_bytes` on a UTF-8 character boundary.
+        size: Total size of the file in bytes.
+        truncated: Whether the file is larger than `max_bytes`.
+        binary: Whether the file looks binary (in which case `data` is empty).
+    """
+    data: bytes
+    size: int
+    truncated: bool
+    binary: bool
+
+
+def looks_binary(sample: bytes) -> bool:
+    """
+    Guess whether a file is binary from its first few KB.
+
+    Args:
+        sample: Leading bytes of the file.
+
+    Returns:
+        True if the sample contains a NUL byte or starts with a known binary signature.
+    """
+    return b"\0" in sample or sample.startswith(BINARY_SIGNATURES)
+
+
+def utf8_boundary(data: bytes, limit: int) -> int:
+    """
+    Find the largest cut position <= `limit` that doesn't split a UTF-8 character.
+
+    Args:
+        data: UTF-8 encoded bytes.
+        limit: Desired cut position.
+
+    Returns:
+        A position at which `data[:pos]` ends on a character boundary.
+    """
+    if limit >= len(data):
+        return len(data)
+
+    # Step back over continuation bytes (0b10xxxxxx), at most 3 of them
+    pos = limit
+    while pos > 0 and limit - pos < 3 and (data[pos] & 0xC0) == 0x80:
+        pos -= 1
+    return pos
+
+
+def read_file_bytes(file_path: str, max_bytes: int) -> RawFile:
+    """
+    Read up to `max_bytes` of a file in binary mode, skipping binary files early.
+
+    - Large files are memory-mapped, so only the sniffed prefix and the kept
+      bytes are ever paged in.
+    - The first few KB are sniffed for NUL bytes and binary signatures.
+    - The content is cut on a UTF-8 character boundary without decoding the rest.
 
     Args:
         file_path: Path to the file.
-        max_bytes: Maximum number of bytes to read.
+        max_bytes: Maximum number of bytes to keep.
+
+    Returns:
+        A `RawFile` with the kept bytes and size information.
+    """
+    with open(file_path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+
+        if size >= MMAP_MIN_BYTES:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                if looks_binary(mm[:SNIFF_BYTES]):
+                    return RawFile(b"", size, False, True)
+                data = mm[:max_bytes + 4]
+        else:
+            # Small (or special) files: one read, capped just above the limit
+            data = f.read(max_bytes + 4)
+            if looks_binary(data[:SNIFF_BYTES]):
+                return RawFile(b"", max(size, len(data)), False, True)
+
+    size = max(size, len(data))
+    truncated = size > max_bytes
+    if truncated:
+        data = data[:utf8_boundary(data, max_bytes)]
+    return RawFile(data, size, truncated, False)
+
+
+def count_lines(data: bytes) -> int:
+    """
+    Count lines directly on bytes, the way `str.splitlines` counts `\\n`-terminated text.
+
+    Args:
+        data: File content.
+
+    Returns:
+        The number of lines, counting a final unterminated line.
+    """
+    if not data:
+        return 0
+    return data.count(b"\n") + (not data.endswith(b"\n"))
+
+
+def transform_content(raw: RawFile, file_path: str, max_bytes: int, remove_comments: bool = False,
+                      markdown: bool = True) -> tuple[str | None, int]:
+    """
+    Sanitize already-read file content: strip comments, escape backticks and count lines.
+
+    This is the CPU-bound half of `analyze_file_content`, kept separate (and picklable)
+    so it can run in a worker process.
+
+    Args:
+        raw: Bytes from `read_file_bytes`.
+        file_path: Path to the file (used to pick the comment syntax).
+        max_bytes: Byte limit the content was read against.
+        remove_comments: Whether to strip comments from the content.
+        markdown: Prepare the content for a Markdown code block (escaped backticks,
+            truncation and binary notes); otherwise keep the plain text, with None for binary files.
 
     Returns:
         A tuple containing:
             - Sanitized string content (with triple backticks escaped).
             - Number of lines read.
     """
+    if raw.binary:
+        return (f"[Binary file omitted: {raw.size} bytes]" if markdown else None), 0
 
-    try:
-        # Open the file in UTF-8 encoding and read slightly more than max_bytes
-        with open(file_path, "r", encoding="utf-8") as f:
-            content = f.read(max_bytes + 1)
+    content = raw.data.decode("utf-8", errors="replace")
+
+    # Normalize line endings the way splitting into lines would
+    if "\r" in content:
+        content = content.replace("\r\n", "\n").replace("\r", "\n")
+
+    if remove_comments:
+        # Determine file extension
+        _, file_extension = os.path.splitext(file_path)
+        # Remove comments from the content
+        content = removelines.remove_comments_from_code(content, file_extension)
+        lines = len(content.splitlines())
+    elif b"\r" in raw.data:
+        lines = content.count("\n") + (bool(content) and not content.endswith("\n"))
+    else:
+        lines = count_lines(raw.data)
+
+    # Drop the final line terminator, as rejoining split lines would
+    if content.endswith("\n"):
+        content = content[:-1]
 
-        if remove_comments:
-            # Determine file extension
-            _, file_extension = os.path.splitext(file_path)
-            # Remove comments from the content
-            content = removelines.remove_comments_from_code(content, file_extension)
+    if not markdown:
+        return content, lines
 
-        # Split content into lines
-        lines = content.splitlines()
+    # Escape any triple backticks to avoid breaking markdown formatting
+    if "```" in content:
+        content = content.replace("```", "&#96;&#96;&#96;")
 
-        # Escape any triple backticks to avoid breaking markdown formatting
-        escaped_lines = [line.replace("```", "&#96;&#96;&#96;") for line in lines]
+    if raw.truncated:
+        content += f"\n\n[Truncated: file exceeds {max_bytes//1024}KB limit]"
+
+    # Return sanitized content and line count
+    return content, lines
+
+
+def analyze_file_content(file_path: str, max_bytes: int, remove_comments: bool = False,
+                         markdown: bool = True) -> tuple[str | None, int]:
+    """
+    Read and sanitize the content of a file, up to a byte limit.
 
-        # Rejoin lines into a single string
-        result = "\n".join(escaped_lines)
+    Args:
+        file_path: Path to the file.
+        max_bytes: Maximum number of bytes to read.
+        remove_comments: Whether to strip comments from the content.
+        markdown: Whether to prepare the content for Markdown (see `transform_content`).
 
-        # Check if the file exceeds the byte limit (after encoding)
-        truncated = len(content.encode("utf-8")) > max_bytes
-        if truncated:
-            result += f"\n\n[Truncated: file exceeds {max_bytes//1024}KB limit]"
+    Returns:
+        A tuple containing:
+            - Sanitized string content (with triple backticks escaped).
+            - Number of lines read.
+    """
 
-        # Return sanitized content and line count
-        return result, len(lines)
+    try:
+        raw = read_file_bytes(file_path, max_bytes)
+        return transform_content(raw, file_path, max_bytes, remove_comments, markdown)
 
     except Exception as e:
         logging.error("Failed to read %s: %s", file_path, e)
         return f"Failed to read {file_path}: {e}", 0
 
 
-def list_all_files(absolute_path: str, include_hidden: bool = False) -> list[str]:
+def list_all_files(absolute_path: str, include_hidden: bool = False,
+                   entries: list[index.IndexEntry] | None = None) -> list[index.IndexEntry]:
     """
-    Recursively list all files in a directory, excluding .git, __pycache__, and optionally hidden files.
+    Recursively list all files in a directory, optionally excluding hidden files.
+
+    Ignored paths (.git, __pycache__, *.pyc, .gitignore and --exclude patterns)
+    never make it into the index, so only the hidden-file rule is applied here.
 
     Args:
         absolute_path: Root directory to scan.
         include_hidden: Whether to include hidden files (starting with a dot).
+        entries: Optional pre-built index from `index.build_index`; scanned if omitted.
 
     Returns:
-        A list of absolute file paths.
+        A list of index entries for the selected files.
     """
 
-    file_paths = []
+    # Reuse the shared index when available instead of walking the tree again
+    if entries is None:
+        entries = index.build_index(absolute_path)
+
+    selected = []
+
+    for entry in entries:
+        if entry.is_dir:
+            continue
 
-    # Walk through the directory tree starting at absolute_path
-    for root, dirs, files in os.walk(absolute_path):
-        
-        # Skip .git and __pycache__ directories
-        for skip_dir in [".git", "__pycache__"]:
-            if skip_dir in dirs:
-                dirs.remove(skip_dir)
+        # Skip files based on hidden status
+        if not include_hidden and os.path.basename(entry.path).startswith("."):
+            continue
 
-        for file in files:
-            # Skip files based on hidden status and .pyc extension
-            if not include_hidden and file.startswith("."):
-                continue
-            if file.endswith(".pyc"):
-                continue  # Skip compiled bytecode files
+        selected.append(entry)
 
-            # Add the full file path to the list
-            file_paths.append(os.path.join(root, file))
-    
-    # Return the complete list of file paths
-    return file_paths
+    # Return the complete list of file entries
+    return selected
 
 
-def get_file_paths(absolute_path: str, filenames: list[str] | None, recent_only: bool) -> list[str]:
+def get_file_paths(absolute_path: str, filenames: list[str] | None, recent_only: bool,
+                   entries: list[index.IndexEntry] | None = None, recent_paths: set[str] | None = None,
+                   recent_days: int = 7) -> list[str]:
     """
     Select files to include based on recency and provided filenames.
 
@@ -123,24 +282,37 @@ def get_file_paths(absolute_path: str, filenames: list[str] | None, recent_only:
         absolute_path: Root directory to scan if filenames are not provided.
         filenames: Optional list of specific files to include.
         recent_only: Whether to filter for recently modified files.
+        entries: Optional pre-built index from `index.build_index`; scanned if omitted.
+        recent_paths: Absolute paths of recently changed files, from git history
+            (see `history.recent_files`); when given, modification times aren't consulted.
+        recent_days: Window used for modification times when `recent_paths` is None.
 
     Returns:
         A list of selected file paths.
     """
+    def is_recent(file_path: str, mtime: float | None) -> bool:
+        if recent_paths is not None:
+            return os.path.abspath(file_path) in recent_paths
+        return is_recently_modified(file_path, recent_days, mtime)
+
     # If specific filenames are provided, filter them by recency if needed
     if filenames:
-        return [f for f in filenames if not recent_only or is_recently_modified(f)]
-    
+        mtimes = index.mtime_lookup(entries) if entries and recent_only and recent_paths is None else {}
+        return [
+            f for f in filenames
+            if not recent_only or is_recent(f, mtimes.get(os.path.abspath(f)))
+        ]
+
     # Otherwise, list all files in the directory and filter by recency if needed
-    all_files = list_all_files(absolute_path)
+    all_files = list_all_files(absolute_path, entries=entries)
     selected = []
 
-    # Filter files based on recency
-    for f in all_files:
-        logging.info("Checking file: %s", f)
-        if not recent_only or is_recently_modified(f):
-            selected.append(f)
-            logging.info("Included file: %s", f)
+    # Filter files based on recency, using the mtime recorded in the index
+    for entry in all_files:
+        logging.info("Checking file: %s", entry.path)
+        if not recent_only or is_recent(entry.path, entry.mtime):
+            selected.append(entry.path)
+            logging.info("Included file: %s", entry.path)
 
     # Return the final list of selected files
     return selected
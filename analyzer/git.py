@@ -1,5 +1,20 @@
+import os
+import zlib
+import bisect
+import struct
 import logging
-import git
+import subprocess
+from datetime import datetime, timedelta, timezone
+
+DATE_FORMAT = '%a %b %d %H:%M:%S %Y %z'
+
+# Pack object type for commits; other types (notably deltas) are left to GitPython
+_OBJ_COMMIT = 1
+
+
+class RefError(ValueError):
+    """Raised when a git ref given by the user isn't a commit of the repository."""
+
 
 def pull_git_info(absolute_path: str) -> dict[str, str] | None:
     """
@@ -11,12 +26,46 @@ def pull_git_info(absolute_path: str) -> dict[str, str] | None:
         - Author name and email
         - Commit timestamp (formatted)
 
+    The repository files are parsed directly (see `read_head_info`); GitPython is
+    only imported as a fallback for layouts the native reader doesn't handle.
+
     Args:
         absolute_path: Path to the root of the Git repository.
 
     Returns:
         A dictionary with Git metadata if successful, or None if the path is not a valid Git repository.
     """
+    if _resolve_git_dir(absolute_path) is None:
+        logging.warning("No valid Git repository found at: %s", absolute_path)
+        return None
+
+    try:
+        info = read_head_info(absolute_path)
+        if info is not None:
+            return info
+    except (OSError, ValueError, IndexError, zlib.error, struct.error) as e:
+        logging.debug("Native git reader failed for %s: %s", absolute_path, e)
+
+    return _pull_git_info_gitpython(absolute_path)
+
+
+def _pull_git_info_gitpython(absolute_path: str) -> dict[str, str] | None:
+    """
+    Retrieve Git metadata through GitPython.
+
+    Args:
+        absolute_path: Path to the root of the Git repository.
+
+    Returns:
+        A dictionary with Git metadata if successful, or None otherwise.
+    """
+    try:
+        # Imported lazily: GitPython is slow to import and usually not needed
+        import git
+    except ImportError:
+        logging.warning("GitPython is not installed; Git info for %s is unavailable.", absolute_path)
+        return None
+
     try:
         # Initialize the Git repository object
         repo = git.Repo(absolute_path)
@@ -30,7 +79,7 @@ def pull_git_info(absolute_path: str) -> dict[str, str] | None:
             "commit": commit.hexsha,
             "branch": branch,
             "author": f"{commit.author.name} <{commit.author.email}>",
-            "date": commit.committed_datetime.strftime('%a %b %d %H:%M:%S %Y %z')
+            "date": commit.committed_datetime.strftime(DATE_FORMAT)
         }
 
     except git.exc.InvalidGitRepositoryError:
@@ -38,4 +87,323 @@ def pull_git_info(absolute_path: str) -> dict[str, str] | None:
         return None
     except Exception as e:
         logging.error("Unexpected error while retrieving Git info from %s: %s", absolute_path, e)
-        return None
\ No newline at end of file
+        return None
+
+
+def read_head_info(absolute_path: str) -> dict[str, str] | None:
+    """
+    Read the HEAD commit metadata by parsing the repository files directly.
+
+    Follows `.git/HEAD` through loose refs and `packed-refs`, then reads the
+    commit object from a loose object or a pack file.
+
+    Args:
+        absolute_path: Path to the root of the Git repository.
+
+    Returns:
+        The same dictionary as `pull_git_info`, or None if the repository layout
+        isn't supported here (missing `.git`, delta-compressed commit, SHA-256 repo).
+    """
+    git_dir = _resolve_git_dir(absolute_path)
+    if git_dir is None:
+        return None
+
+    common_dir = _common_dir(git_dir)
+    branch, sha = read_head(git_dir)
+    if sha is None or len(sha) != 40:
+        return None
+
+    raw = _read_commit_object(common_dir, sha)
+    if raw is None:
+        return None
+
+    author, committer = _parse_commit(raw)
+    if author is None or committer is None:
+        return None
+
+    return {
+        "commit": sha,
+        "branch": branch,
+        "author": author[0],
+        "date": committer[1].strftime(DATE_FORMAT)
+    }
+
+
+def read_head(git_dir: str) -> tuple[str, str | None]:
+    """
+    Resolve HEAD to the current branch and commit sha without running git.
+
+    Args:
+        git_dir: Git directory of the work tree (e.g. `repo/.git`).
+
+    Returns:
+        A (branch, sha) tuple. The branch is "HEAD (detached)" for a detached HEAD;
+        the sha is None on an unborn branch.
+
+    Raises:
+        OSError: If HEAD can't be read.
+    """
+    with open(os.path.join(git_dir, "HEAD"), "r", encoding="utf-8") as f:
+        head = f.read().strip()
+
+    if head.startswith("ref:"):
+        ref = head[len("ref:"):].strip()
+        branch = ref[len("refs/heads/"):] if ref.startswith("refs/heads/") else ref
+        return branch, _resolve_ref(git_dir, _common_dir(git_dir), ref)
+    return "HEAD (detached)", head
+
+
+def check_ref(ref: str) -> str:
+    """
+    Reject refs that git would read as options (`--output=...`) rather than revisions.
+
+    Args:
+        ref: Commit, branch or tag name given by the user.
+
+    Returns:
+        The ref, unchanged.
+
+    Raises:
+        RefError: If the ref is empty, starts with `-` or contains a NUL byte.
+    """
+    if not ref or ref.startswith("-") or "\0" in ref:
+        raise RefError(f"invalid git ref {ref!r}")
+    return ref
+
+
+def verify_commit(work_tree: str, ref: str) -> str:
+    """
+    Resolve a ref given by the user to a commit sha, so only the sha reaches other git commands.
+
+    Args:
+        work_tree: Directory inside the git work tree.
+        ref: Commit, branch or tag name.
+
+    Returns:
+        The commit sha.
+
+    Raises:
+        RefError: If the ref is invalid (see `check_ref`) or doesn't name a commit.
+        OSError: If git can't be run.
+    """
+    check_ref(ref)
+    cmd = ["git", "-C", work_tree, "rev-parse", "--verify", "--quiet", "--end-of-options", f"{ref}^{{commit}}"]
+    result = subprocess.run(cmd, capture_output=True)
+    if result.returncode != 0:
+        raise RefError(f"unknown git ref {ref!r}")
+    return result.stdout.decode("ascii").strip()
+
+
+def _common_dir(git_dir: str) -> str:
+    """Return the directory holding refs and objects; linked worktrees keep them in a shared one."""
+    commondir_file = os.path.join(git_dir, "commondir")
+    if os.path.isfile(commondir_file):
+        with open(commondir_file, "r", encoding="utf-8") as f:
+            return os.path.normpath(os.path.join(git_dir, f.read().strip()))
+    return git_dir
+
+
+def _resolve_git_dir(absolute_path: str) -> str | None:
+    """Return the git directory for a work tree root, following `.git` files."""
+    dot_git = os.path.join(absolute_path, ".git")
+    if os.path.isdir(dot_git):
+        return dot_git
+    if os.path.isfile(dot_git):
+        with open(dot_git, "r", encoding="utf-8") as f:
+            line = f.readline().strip()
+        if line.startswith("gitdir:"):
+            return os.path.normpath(os.path.join(absolute_path, line[len("gitdir:"):].strip()))
+    return None
+
+
+def _resolve_ref(git_dir: str, common_dir: str, ref: str) -> str | None:
+    """
+    Resolve a ref name to a commit sha via loose refs, then `packed-refs`.
+
+    Args:
+        git_dir: Git directory of the work tree.
+        common_dir: Common git directory (same as `git_dir` outside linked worktrees).
+        ref: Full ref name, e.g. `refs/heads/main`.
+
+    Returns:
+        The sha as a hex string, or None if the ref doesn't exist (e.g. an unborn branch).
+    """
+    for base in (git_dir, common_dir):
+        try:
+            with open(os.path.join(base, ref), "r", encoding="utf-8") as f:
+                value = f.read().strip()
+        except OSError:
+            continue
+        if value.startswith("ref:"):
+            return _resolve_ref(git_dir, common_dir, value[len("ref:"):].strip())
+        return value
+
+    try:
+        with open(os.path.join(common_dir, "packed-refs"), "r", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith(("#", "^")):
+                    continue
+                sha, _, name = line.rstrip("\n").partition(" ")
+                if name == ref:
+                    return sha
+    except OSError:
+        pass
+    return None
+
+
+def _read_commit_object(common_dir: str, sha: str) -> bytes | None:
+    """
+    Read the body of a commit object, loose or packed.
+
+    Args:
+        common_dir: Git directory holding `objects/`.
+        sha: Commit sha as a hex string.
+
+    Returns:
+        The decompressed commit body, or None if it can't be read natively.
+    """
+    objects = os.path.join(common_dir, "objects")
+
+    # Loose object: zlib("commit <size>\0<body>")
+    try:
+        with open(os.path.join(objects, sha[:2], sha[2:]), "rb") as f:
+            data = zlib.decompress(f.read())
+        header, _, body = data.partition(b"\0")
+        return body if header.startswith(b"commit ") else None
+    except FileNotFoundError:
+        pass
+
+    # Packed object: find it through the pack indexes
+    pack_dir = os.path.join(objects, "pack")
+    try:
+        idx_names = [n for n in os.listdir(pack_dir) if n.endswith(".idx")]
+    except OSError:
+        return None
+
+    binary_sha = bytes.fromhex(sha)
+    for idx_name in idx_names:
+        offset = _find_in_pack_index(os.path.join(pack_dir, idx_name), binary_sha)
+        if offset is not None:
+            return _read_packed_commit(os.path.join(pack_dir, idx_name[:-4] + ".pack"), offset)
+    return None
+
+
+class _ShaTable:
+    """Sequence view over the sorted sha table of a pack index, for `bisect`."""
+
+    def __init__(self, data: bytes, start: int, count: int):
+        self.data = data
+        self.start = start
+        self.count = count
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __getitem__(self, i: int) -> bytes:
+        pos = self.start + i * 20
+        return self.data[pos:pos + 20]
+
+
+def _find_in_pack_index(idx_path: str, binary_sha: bytes) -> int | None:
+    """
+    Look up an object's offset in a version 2 pack index.
+
+    Args:
+        idx_path: Path of the `.idx` file.
+        binary_sha: Object id as 20 raw bytes.
+
+    Returns:
+        The object's offset within the pack, or None if it isn't in this pack.
+    """
+    with open(idx_path, "rb") as f:
+        data = f.read()
+
+    if data[:4] != b"\377tOc" or struct.unpack_from(">I", data, 4)[0] != 2:
+        return None
+
+    # Fan-out table narrows the search to shas sharing the first byte
+    fanout = 8
+    first = binary_sha[0]
+    lo = struct.unpack_from(">I", data, fanout + (first - 1) * 4)[0] if first else 0
+    hi = struct.unpack_from(">I", data, fanout + first * 4)[0]
+    count = struct.unpack_from(">I", data, fanout + 255 * 4)[0]
+
+    sha_start = fanout + 256 * 4
+    table = _ShaTable(data, sha_start, count)
+    pos = bisect.bisect_left(table, binary_sha, lo, hi)
+    if pos >= hi or table[pos] != binary_sha:
+        return None
+
+    # Skip the sha and CRC tables to reach the 4-byte offsets
+    offsets_start = sha_start + count * 24
+    offset = struct.unpack_from(">I", data, offsets_start + pos * 4)[0]
+    if offset & 0x80000000:
+        large_start = offsets_start + count * 4
+        offset = struct.unpack_from(">Q", data, large_start + (offset & 0x7FFFFFFF) * 8)[0]
+    return offset
+
+
+def _read_packed_commit(pack_path: str, offset: int) -> bytes | None:
+    """
+    Read a non-delta commit object from a pack file.
+
+    Args:
+        pack_path: Path of the `.pack` file.
+        offset: Object offset from the pack index.
+
+    Returns:
+        The decompressed commit body, or None if the object is stored as a delta.
+    """
+    with open(pack_path, "rb") as f:
+        f.seek(offset)
+        byte = f.read(1)[0]
+        obj_type = (byte >> 4) & 7
+        size = byte & 0x0F
+        shift = 4
+        while byte & 0x80:
+            byte = f.read(1)[0]
+            size |= (byte & 0x7F) << shift
+            shift += 7
+
+        if obj_type != _OBJ_COMMIT:
+            return None
+
+        decompressor = zlib.decompressobj()
+        body = b""
+        while len(body) < size and not decompressor.eof:
+            chunk = f.read(4096)
+            if not chunk:
+                break
+            body += decompressor.decompress(chunk)
+        return body[:size]
+
+
+def _parse_commit(raw: bytes) -> tuple[tuple | None, tuple | None]:
+    """
+    Extract the author and committer identity and timestamp from a commit body.
+
+    Args:
+        raw: Decompressed commit object body.
+
+    Returns:
+        Two ("Name <email>", datetime) tuples for author and committer; either may be None.
+    """
+    people = {}
+    for line in raw.split(b"\n"):
+        if not line:
+            break  # Headers end at the first blank line
+        key, _, value = line.partition(b" ")
+        if key in (b"author", b"committer"):
+            people[key] = _parse_signature(value.decode("utf-8", "replace"))
+    return people.get(b"author"), people.get(b"committer")
+
+
+def _parse_signature(value: str) -> tuple[str, datetime]:
+    """Parse `Name <email> 1700000000 +0100` into ("Name <email>", aware datetime)."""
+    identity, _, stamp = value.rpartition(">")
+    seconds, _, tz = stamp.strip().partition(" ")
+    sign = -1 if tz.startswith("-") else 1
+    tz = tz.lstrip("+-")
+    offset = timedelta(hours=int(tz[:2] or 0), minutes=int(tz[2:4] or 0)) * sign
+    when = datetime.fromtimestamp(int(seconds), timezone(offset))
+    return identity + ">", when
@@ -0,0 +1,151 @@
+import os
+import struct
+import logging
+
+# Fixed-size part of an index entry: ctime, mtime, dev, ino, mode, uid, gid, size, sha1, flags
+_ENTRY_HEAD = struct.Struct(">10I20sH")
+_NAME_MASK = 0x0FFF
+_EXTENDED_FLAG = 0x4000
+_STAGE_SHIFT = 12
+_SKIP_WORKTREE = 0x4000
+_GITLINK_MODE = 0o160000
+_DIR_MODE = 0o040000
+
+
+class GitIndexError(Exception):
+    """Raised when a git index file can't be parsed."""
+
+
+def find_git_dir(absolute_path: str) -> tuple[str, str] | None:
+    """
+    Locate the git repository containing `absolute_path`.
+
+    Walks up from `absolute_path` looking for a `.git` directory, or a `.git` file
+    pointing elsewhere (worktrees and submodules).
+
+    Args:
+        absolute_path: Directory inside a work tree.
+
+    Returns:
+        A (work_tree_root, git_dir) tuple, or None if no repository was found.
+    """
+    current = absolute_path
+    while True:
+        dot_git = os.path.join(current, ".git")
+        if os.path.isdir(dot_git):
+            return current, dot_git
+        if os.path.isfile(dot_git):
+            try:
+                with open(dot_git, "r", encoding="utf-8") as f:
+                    line = f.readline().strip()
+            except OSError:
+                return None
+            if line.startswith("gitdir:"):
+                git_dir = line[len("gitdir:"):].strip()
+                return current, os.path.normpath(os.path.join(current, git_dir))
+            return None
+
+        parent = os.path.dirname(current)
+        if parent == current:
+            return None
+        current = parent
+
+
+def read_index(git_dir: str) -> list[tuple[str, int, float]]:
+    """
+    Read the tracked files recorded in a repository's index in one pass.
+
+    Equivalent to `git ls-files`, plus the stat data git cached for each file.
+    Supports index versions 2, 3 and 4. Conflicted paths are listed once, and
+    submodules, sparse directories and skip-worktree entries are left out.
+
+    Args:
+        git_dir: Path to the `.git` directory.
+
+    Returns:
+        A list of (relative_path, size, mtime) tuples in index (sorted) order,
+        with paths using `/` as the separator.
+
+    Raises:
+        GitIndexError: If the index is missing or malformed.
+    """
+    index_path = os.path.join(git_dir, "index")
+    try:
+        with open(index_path, "rb") as f:
+            data = f.read()
+    except OSError as e:
+        raise GitIndexError(f"cannot read {index_path}: {e}") from e
+
+    if len(data) < 12 or data[:4] != b"DIRC":
+        raise GitIndexError(f"{index_path} is not a git index")
+
+    version, count = struct.unpack_from(">II", data, 4)
+    if version not in (2, 3, 4):
+        raise GitIndexError(f"unsupported index version {version}")
+
+    entries = []
+    offset = 12
+    previous = b""
+    last_kept = None
+
+    try:
+        for _ in range(count):
+            entry_start = offset
+            fields = _ENTRY_HEAD.unpack_from(data, offset)
+            mtime_s, mtime_ns, mode, size, flags = fields[2], fields[3], fields[6], fields[9], fields[11]
+            offset += _ENTRY_HEAD.size
+
+            extended = 0
+            if version >= 3 and flags & _EXTENDED_FLAG:
+                (extended,) = struct.unpack_from(">H", data, offset)
+                offset += 2
+
+            if version == 4:
+                # Path is stored as "strip N bytes from the previous path" + NUL-terminated suffix
+                strip, offset = _read_offset_varint(data, offset)
+                end = data.index(b"\0", offset)
+                path = previous[:len(previous) - strip] + data[offset:end]
+                offset = end + 1
+            else:
+                name_len = flags & _NAME_MASK
+                end = data.index(b"\0", offset + name_len if name_len < _NAME_MASK else offset)
+                path = data[offset:end]
+                # Entries are NUL-padded to a multiple of 8 bytes
+                offset = entry_start + ((end - entry_start + 8) & ~7)
+            previous = path
+
+            if (flags >> _STAGE_SHIFT) & 3 and path == last_kept:
+                continue  # Conflicted paths have one entry per stage; keep the first
+            if extended & _SKIP_WORKTREE:
+                continue  # Not checked out in this work tree
+            if mode & 0o170000 in (_GITLINK_MODE, _DIR_MODE):
+                continue  # Submodule or sparse-index directory
+
+            last_kept = path
+            entries.append((path.decode("utf-8", "surrogateescape"), size, mtime_s + mtime_ns / 1e9))
+    except (struct.error, ValueError) as e:
+        raise GitIndexError(f"{index_path} is truncated or corrupt: {e}") from e
+
+    logging.debug("Read %d entries from %s (version %d)", len(entries), index_path, version)
+    return entries
+
+
+def _read_offset_varint(data: bytes, offset: int) -> tuple[int, int]:
+    """
+    Decode git's "offset" variable-length integer used by index v4.
+
+    Args:
+        data: Buffer to read from.
+        offset: Position of the first byte.
+
+    Returns:
+        A (value, next_offset) tuple.
+    """
+    byte = data[offset]
+    offset += 1
+    value = byte & 0x7F
+    while byte & 0x80:
+        byte = data[offset]
+        offset += 1
+        value = ((value + 1) << 7) | (byte & 0x7F)
+    return value, offset
@@ -0,0 +1,215 @@
+import os
+import json
+import time
+import logging
+import subprocess
+from typing import NamedTuple
+
+from analyzer import git, gitindex
+
+# Recency results kept per repository (one per HEAD/options combination)
+MAX_CACHED_QUERIES = 16
+CACHE_FILE_NAME = "recent.json"
+
+# "Last N days" cut-offs are rounded down to this many seconds, so repeated runs share a cache entry
+CUTOFF_GRANULARITY = 3600
+
+
+class HistoryError(Exception):
+    """Raised when git rejects a recency query (e.g. an unknown ref)."""
+
+
+class Recency(NamedTuple):
+    """
+    Which files count as recent, judged from git history.
+
+    Exactly one field is normally set; with several, a file must satisfy all of them.
+
+    Attributes:
+        days: Files changed by commits from the last N days.
+        commits: Files changed by the last N commits.
+        since: Files changed by commits reachable from HEAD but not from this ref.
+    """
+    days: int | None = None
+    commits: int | None = None
+    since: str | None = None
+
+    def __bool__(self) -> bool:
+        return any(v is not None for v in self)
+
+
+def log_arguments(recency: Recency, now: float | None = None) -> list[str]:
+    """
+    Build the `git log` revision arguments selecting the commits of a recency window.
+
+    Args:
+        recency: Recency options; `since` must already be resolved to a sha (see `resolve_since`).
+        now: Current time (defaults to `time.time()`).
+
+    Returns:
+        Arguments for `git log`, ending with the revision range.
+    """
+    args = []
+    if recency.days is not None:
+        now = time.time() if now is None else now
+        cutoff = int(now - recency.days * 86400) // CUTOFF_GRANULARITY * CUTOFF_GRANULARITY
+        args.append(f"--since=@{cutoff}")
+    if recency.commits is not None:
+        args.append(f"--max-count={recency.commits}")
+    args.append(f"{recency.since}..HEAD" if recency.since is not None else "HEAD")
+    return args
+
+
+def changed_paths(work_tree: str, log_args: list[str]) -> list[str]:
+    """
+    List the files touched by a range of commits, in one `git log` call.
+
+    Args:
+        work_tree: Root of the git work tree.
+        log_args: Revision arguments from `log_arguments`.
+
+    Returns:
+        Paths relative to the work tree root, `/`-separated, without duplicates.
+
+    Raises:
+        HistoryError: If git exits with an error (bad ref, corrupt repository).
+        OSError: If git can't be run.
+    """
+    cmd = ["git", "-C", work_tree, "log", "--format=", "--name-only", "-z", "--no-renames", *log_args, "--"]
+    result = subprocess.run(cmd, capture_output=True)
+    if result.returncode != 0:
+        message = result.stderr.decode("utf-8", "replace").strip().splitlines()
+        raise HistoryError(f"git log failed: {message[0] if message else f'exit status {result.returncode}'}")
+
+    paths = {}
+    for name in result.stdout.split(b"\0"):
+        name = name.strip(b"\n")
+        if name:
+            paths.setdefault(os.fsdecode(name), None)
+    return list(paths)
+
+
+def recent_files(absolute_path: str, recency: Recency, use_cache: bool = True) -> set[str] | None:
+    """
+    Find the files under `absolute_path` changed within a recency window.
+
+    The answer only depends on the commit graph, so it's cached in the git
+    directory keyed by the HEAD sha and the options; later runs on the same
+    commit skip git entirely.
+
+    Args:
+        absolute_path: Directory being analyzed (anywhere inside a work tree).
+        recency: Recency options.
+        use_cache: Whether to read and update the on-disk cache.
+
+    Returns:
+        Absolute paths of the recently changed files (whether or not they still
+        exist), or None if `absolute_path` isn't in a git repository or git is unavailable.
+
+    Raises:
+        HistoryError: If the `since` ref is invalid or git rejects the query.
+    """
+    located = gitindex.find_git_dir(absolute_path)
+    if located is None:
+        return None
+    work_tree, git_dir = located
+
+    try:
+        _, head = git.read_head(git_dir)
+    except OSError as e:
+        logging.warning("Could not read HEAD of %s: %s", work_tree, e)
+        return None
+    if head is None:
+        return set()  # Unborn branch: nothing has been committed yet
+
+    # Only the sha of a --recent-since ref reaches git log, so the ref can't be read as an option;
+    # it's also what keys the cache, since the ref can move while HEAD stays put
+    if recency.since is not None:
+        try:
+            recency = recency._replace(since=resolve_since(work_tree, git_dir, recency.since))
+        except OSError as e:
+            logging.warning("Could not run git (%s); falling back to modification times.", e)
+            return None
+
+    log_args = log_arguments(recency)
+    key = head + " " + " ".join(log_args)
+
+    cache_path = os.path.join(git_dir, "scan-repo", CACHE_FILE_NAME)
+    cached = _load_cache(cache_path) if use_cache else {}
+
+    rel_paths = cached.get(key)
+    if rel_paths is None:
+        try:
+            rel_paths = changed_paths(work_tree, log_args)
+        except OSError as e:
+            logging.warning("Could not run git (%s); falling back to modification times.", e)
+            return None
+        logging.info("git log found %d recently changed files", len(rel_paths))
+        if use_cache:
+            _store_cache(cache_path, cached, key, rel_paths)
+    else:
+        logging.info("Using cached recency for %s", key)
+
+    return {os.path.join(work_tree, *p.split("/")) for p in rel_paths}
+
+
+def resolve_since(work_tree: str, git_dir: str, ref: str) -> str:
+    """
+    Resolve a `--recent-since` ref to a sha: natively for branches, tags and shas,
+    otherwise (e.g. `HEAD~3`) with `git rev-parse` (see `git.verify_commit`).
+
+    Raises:
+        HistoryError: If the ref could be read as an option or doesn't name a commit.
+        OSError: If git can't be run.
+    """
+    try:
+        git.check_ref(ref)
+        return _resolve_simple_ref(git_dir, ref) or git.verify_commit(work_tree, ref)
+    except git.RefError as e:
+        raise HistoryError(f"--recent-since: {e}") from None
+
+
+def _resolve_simple_ref(git_dir: str, ref: str) -> str | None:
+    """
+    Resolve a branch, tag, remote branch or full sha natively.
+
+    Returns:
+        The sha, or None for anything else (e.g. `HEAD~3`).
+    """
+    def is_sha(value: str | None) -> bool:
+        return value is not None and len(value) == 40 and all(c in "0123456789abcdef" for c in value)
+
+    if is_sha(ref):
+        return ref
+    common_dir = git._common_dir(git_dir)
+    for prefix in ("", "refs/", "refs/tags/", "refs/heads/", "refs/remotes/"):
+        sha = git._resolve_ref(git_dir, common_dir, prefix + ref)
+        if sha is not None:
+            return sha if is_sha(sha) else None
+    return None
+
+
+def _load_cache(cache_path: str) -> dict:
+    try:
+        with open(cache_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return data if isinstance(data, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+
+def _store_cache(cache_path: str, cached: dict, key: str, rel_paths: list[str]) -> None:
+    """Add an entry, dropping the oldest ones beyond `MAX_CACHED_QUERIES`."""
+    cached.pop(key, None)
+    cached[key] = rel_paths
+    while len(cached) > MAX_CACHED_QUERIES:
+        cached.pop(next(iter(cached)))
+
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(cached, f)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        logging.debug("Could not write recency cache %s: %s", cache_path, e)
@@ -0,0 +1,401 @@
+import os
+import re
+import logging
+from typing import NamedTuple
+
+# Always excluded, on top of .gitignore and user patterns
+DEFAULT_EXCLUDES = ("__pycache__/", "*.pyc")
+
+_GLOB_CHARS = re.compile(r"[*?\[\\]")
+
+
+class Pattern(NamedTuple):
+    """
+    One parsed gitignore-style pattern.
+
+    Attributes:
+        glob: Pattern body with negation, anchoring slash and trailing slash removed.
+        negated: Whether the pattern re-includes (`!pattern`).
+        dir_only: Whether the pattern only matches directories (`pattern/`).
+        anchored: Whether the pattern is relative to its base directory
+            (it contained a slash) rather than matching a name at any depth.
+    """
+    glob: str
+    negated: bool
+    dir_only: bool
+    anchored: bool
+
+
+def parse_pattern(line: str) -> Pattern | None:
+    """
+    Parse a single line of a .gitignore file (or an --exclude/--include value).
+
+    Args:
+        line: Raw pattern line.
+
+    Returns:
+        A `Pattern`, or None for blank lines and comments.
+    """
+    line = line.rstrip("\r\n")
+    if not line or line.startswith("#"):
+        return None
+
+    # Trailing spaces are ignored unless escaped with a backslash
+    stripped = line.rstrip(" ")
+    if stripped.endswith("\\") and len(stripped) < len(line):
+        stripped += " "
+    line = stripped
+
+    negated = line.startswith("!")
+    if negated:
+        line = line[1:]
+    elif line.startswith(("\\!", "\\#")):
+        line = line[1:]
+
+    dir_only = line.endswith("/")
+    line = line.rstrip("/")
+    if not line:
+        return None
+
+    # A slash anywhere but the end anchors the pattern to its base directory
+    anchored = "/" in line
+    return Pattern(line.lstrip("/"), negated, dir_only, anchored)
+
+
+def glob_to_regex(glob: str) -> str:
+    """
+    Translate a gitignore glob into a regular expression body.
+
+    - `*` and `?` never cross a `/`.
+    - `**/` matches zero or more directories, a trailing `/**` matches everything inside.
+    - `[...]` character classes (with `!` negation) and backslash escapes are supported.
+
+    Args:
+        glob: Pattern body from `parse_pattern`.
+
+    Returns:
+        A regex string (without anchors) matching the same paths.
+    """
+    out = []
+    i, n = 0, len(glob)
+
+    while i < n:
+        c = glob[i]
+        if c == "*":
+            if glob.startswith("**", i) and (i == 0 or glob[i - 1] == "/"):
+                end = i + 2
+                if end == n:
+                    out.append(".*")
+                    i = end
+                    continue
+                if glob[end] == "/":
+                    out.append("(?:.*/)?")
+                    i = end + 1
+                    continue
+            # Collapse runs of stars that aren't a `**` path component
+            while i < n and glob[i] == "*":
+                i += 1
+            out.append("[^/]*")
+            continue
+        if c == "?":
+            out.append("[^/]")
+        elif c == "[":
+            start = i + 1
+            if start < n and glob[start] in "!^":
+                start += 1
+            if start < n and glob[start] == "]":
+                start += 1
+            close = glob.find("]", start)
+            if close == -1:
+                out.append("\\[")
+            else:
+                body = glob[i + 1:close]
+                if body[0] in "!^":
+                    body = "^" + body[1:]
+                out.append("[" + body.replace("\\", "\\\\") + "]")
+                i = close + 1
+                continue
+        elif c == "\\" and i + 1 < n:
+            out.append(re.escape(glob[i + 1]))
+            i += 2
+            continue
+        else:
+            out.append(re.escape(c))
+        i += 1
+
+    return "".join(out)
+
+
+class _PatternSet:
+    """
+    A batch of patterns with the same polarity, compiled for constant-ish lookup.
+
+    - Literal names and paths go into hash sets.
+    - `*suffix` name patterns (like `*.log`) go into sets keyed by suffix length.
+    - Anchored globs are bucketed by their first path component, so a path is only
+      tested against patterns rooted in the same top-level directory.
+    - Everything else is folded into one alternation regex.
+    """
+
+    __slots__ = ("names", "suffixes", "paths", "name_regex", "path_regexes", "path_regex")
+
+    def __init__(self, patterns: list[Pattern]):
+        self.names = set()
+        self.suffixes = {}
+        self.paths = set()
+        name_globs = []
+        path_globs = {}
+        wild_path_globs = []
+
+        for p in patterns:
+            if not _GLOB_CHARS.search(p.glob):
+                (self.paths if p.anchored else self.names).add(p.glob)
+            elif not p.anchored:
+                tail = p.glob[1:]
+                if p.glob[0] == "*" and tail and not _GLOB_CHARS.search(tail):
+                    self.suffixes.setdefault(len(tail), set()).add(tail)
+                else:
+                    name_globs.append(glob_to_regex(p.glob))
+            else:
+                head, _, _ = p.glob.partition("/")
+                if _GLOB_CHARS.search(head):
+                    wild_path_globs.append(glob_to_regex(p.glob))
+                else:
+                    path_globs.setdefault(head, []).append(glob_to_regex(p.glob))
+
+        self.name_regex = _compile_alternation(name_globs)
+        self.path_regexes = {head: _compile_alternation(bodies) for head, bodies in path_globs.items()}
+        self.path_regex = _compile_alternation(wild_path_globs)
+
+    def matches(self, rel_path: str, name: str) -> bool:
+        if name in self.names or rel_path in self.paths:
+            return True
+        for length, tails in self.suffixes.items():
+            if len(name) >= length and name[-length:] in tails:
+                return True
+        if self.name_regex is not None and self.name_regex.fullmatch(name):
+            return True
+        if self.path_regexes:
+            regex = self.path_regexes.get(rel_path.partition("/")[0])
+            if regex is not None and regex.fullmatch(rel_path):
+                return True
+        return self.path_regex is not None and self.path_regex.fullmatch(rel_path) is not None
+
+
+def _compile_alternation(bodies: list[str]) -> re.Pattern | None:
+    """Compile regex bodies into a single alternation, or None if there are none."""
+    if not bodies:
+        return None
+    return re.compile("|".join(f"(?:{b})" for b in bodies), re.DOTALL)
+
+
+class PatternList:
+    """
+    An ordered list of gitignore patterns sharing one base directory.
+
+    Consecutive patterns with the same polarity are compiled together, so the
+    number of regex evaluations depends on how often `!` negations alternate,
+    not on the number of patterns. Later runs take precedence, as in git.
+    """
+
+    __slots__ = ("runs",)
+
+    def __init__(self, patterns: list[Pattern]):
+        self.runs = []
+        batch = []
+        for p in patterns:
+            if batch and batch[-1].negated != p.negated:
+                self.runs.append(self._compile_run(batch))
+                batch = []
+            batch.append(p)
+        if batch:
+            self.runs.append(self._compile_run(batch))
+
+    @staticmethod
+    def _compile_run(batch: list[Pattern]) -> tuple[bool, _PatternSet, _PatternSet]:
+        return (
+            batch[0].negated,
+            _PatternSet([p for p in batch if not p.dir_only]),
+            _PatternSet([p for p in batch if p.dir_only]),
+        )
+
+    def __bool__(self) -> bool:
+        return bool(self.runs)
+
+    def decide(self, rel_path: str, name: str, is_dir: bool) -> bool | None:
+        """
+        Check a path against the list.
+
+        Args:
+            rel_path: Path relative to the list's base directory, `/`-separated.
+            name: Last component of the path.
+            is_dir: Whether the path is a directory.
+
+        Returns:
+            True if ignored, False if explicitly re-included, None if no pattern matched.
+        """
+        for negated, any_kind, dirs_only in reversed(self.runs):
+            if any_kind.matches(rel_path, name) or (is_dir and dirs_only.matches(rel_path, name)):
+                return not negated
+        return None
+
+
+def parse_lines(lines) -> list[Pattern]:
+    """Parse an iterable of pattern lines, skipping blanks and comments."""
+    return [p for p in map(parse_pattern, lines) if p is not None]
+
+
+def read_pattern_file(path: str) -> list[Pattern]:
+    """
+    Read patterns from a .gitignore-style file.
+
+    Args:
+        path: File to read.
+
+    Returns:
+        The parsed patterns, or an empty list if the file can't be read.
+    """
+    try:
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            return parse_lines(f)
+    except OSError as e:
+        logging.warning("Could not read ignore file %s: %s", path, e)
+        return []
+
+
+class IgnoreMatcher:
+    """
+    Decides which paths under a root are excluded from a scan.
+
+    Combines, from lowest to highest precedence: built-in defaults,
+    `.git/info/exclude`, `.gitignore` files (deeper files override shallower
+    ones) and user `--exclude` patterns. Optional `--include` patterns further
+    restrict which files are kept.
+
+    Ignore state is threaded through a walk as a "stack": a tuple of
+    (base_prefix, PatternList) pairs, ordered from lowest to highest precedence.
+    """
+
+    def __init__(self, root: str, excludes=(), includes=(), use_gitignore: bool = True):
+        self.root = root
+        self.use_gitignore = use_gitignore
+        self.defaults = PatternList(parse_lines(DEFAULT_EXCLUDES))
+        self.user = PatternList(parse_lines(excludes))
+        self.includes = PatternList(parse_lines(includes))
+
+        self.base = [("", self.defaults)]
+        info_exclude = os.path.join(root, ".git", "info", "exclude")
+        if use_gitignore and os.path.isfile(info_exclude):
+            self.base.append(("", PatternList(read_pattern_file(info_exclude))))
+
+        self._dir_cache = {}
+        self._include_cache = {}
+
+    def enter_directory(self, dirpath: str, rel_dir: str, stack: tuple, has_gitignore: bool) -> tuple:
+        """
+        Extend the stack with a directory's .gitignore, if it has one.
+
+        Args:
+            dirpath: Absolute path of the directory.
+            rel_dir: Path of the directory relative to the root, `/`-separated, "" for the root.
+            stack: Stack of the parent directory.
+            has_gitignore: Whether the directory contains a .gitignore file.
+
+        Returns:
+            The stack to use for the directory's children.
+        """
+        if not (self.use_gitignore and has_gitignore):
+            return stack
+
+        patterns = PatternList(read_pattern_file(os.path.join(dirpath, ".gitignore")))
+        if not patterns:
+            return stack
+        prefix = rel_dir + "/" if rel_dir else ""
+        return stack + ((prefix, patterns),)
+
+    def is_ignored(self, rel_path: str, is_dir: bool, stack: tuple) -> bool:
+        """
+        Check whether a path found during a walk is excluded.
+
+        Args:
+            rel_path: Path relative to the root, `/`-separated.
+            is_dir: Whether the path is a directory.
+            stack: Stack of the directory containing the path.
+
+        Returns:
+            True if the path (and, for directories, everything below it) should be skipped.
+        """
+        name = rel_path.rpartition("/")[2]
+
+        # User patterns win over everything else
+        if self.user:
+            decision = self.user.decide(rel_path, name, is_dir)
+            if decision is not None:
+                return decision
+
+        for prefix, patterns in reversed(stack):
+            decision = patterns.decide(rel_path[len(prefix):], name, is_dir)
+            if decision is not None:
+                return decision
+        return False
+
+    def is_included(self, rel_path: str) -> bool:
+        """
+        Check a file against the --include patterns.
+
+        A file matches directly or through one of its directories, so `src` and
+        `src/` include everything below `src`. The deepest match wins, and a
+        pattern matching the file itself wins over its directories.
+
+        Args:
+            rel_path: Path relative to the root, `/`-separated.
+
+        Returns:
+            True if there are no include patterns or the file matches one of them.
+        """
+        if not self.includes:
+            return True
+        parent, _, name = rel_path.rpartition("/")
+        matched = self.includes.decide(rel_path, name, False)
+        if matched is not None:
+            return matched
+        return bool(parent) and self._includes_dir(parent)
+
+    def _includes_dir(self, rel_dir: str) -> bool:
+        """Check a directory and its parents against the --include patterns, memoizing the result."""
+        included = self._include_cache.get(rel_dir)
+        if included is None:
+            parent, _, name = rel_dir.rpartition("/")
+            matched = self.includes.decide(rel_dir, name, True)
+            included = matched if matched is not None else bool(parent) and self._includes_dir(parent)
+            self._include_cache[rel_dir] = included
+        return included
+
+    def keeps_path(self, rel_path: str) -> bool:
+        """
+        Check a file path outside of a walk (e.g. from the git index).
+
+        Only built-in defaults and user patterns apply, since tracked files aren't
+        subject to .gitignore. Parent directories are checked too, with their
+        results memoized.
+
+        Args:
+            rel_path: File path relative to the root, `/`-separated.
+
+        Returns:
+            True if the file should be kept.
+        """
+        stack = (("", self.defaults),)
+        parent, _, _ = rel_path.rpartition("/")
+        if parent and not self._keeps_dir(parent, stack):
+            return False
+        return not self.is_ignored(rel_path, False, stack) and self.is_included(rel_path)
+
+    def _keeps_dir(self, rel_dir: str, stack: tuple) -> bool:
+        """Check a directory and all of its parents, memoizing the result."""
+        kept = self._dir_cache.get(rel_dir)
+        if kept is None:
+            parent, _, _ = rel_dir.rpartition("/")
+            kept = (not parent or self._keeps_dir(parent, stack)) and not self.is_ignored(rel_dir, True, stack)
+            self._dir_cache[rel_dir] = kept
+        return kept
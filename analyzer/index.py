@@ -0,0 +1,293 @@
+import os
+import re
+import fnmatch
+import logging
+from typing import NamedTuple
+
+from analyzer import gitindex, ignore
+
+
+class IndexEntry(NamedTuple):
+    """
+    Compact record describing one file or directory found during a scan.
+
+    Attributes:
+        path: Absolute path of the entry.
+        size: Size in bytes (0 for directories).
+        mtime: Last modification time in seconds since epoch.
+        is_dir: Whether the entry is a directory.
+        depth: Nesting level relative to the scanned root (root is 0).
+    """
+    path: str
+    size: int
+    mtime: float
+    is_dir: bool
+    depth: int
+
+
+def build_index(absolute_path: str, matcher: ignore.IgnoreMatcher | None = None) -> list[IndexEntry]:
+    """
+    Scan a directory tree once and return an in-memory index of its entries.
+
+    - Uses `os.scandir` so directory/file type checks come from the directory listing.
+    - Skips `.git` directories.
+    - Applies `.gitignore` files and exclude patterns while walking, so ignored
+      directories are pruned rather than listed and filtered afterwards.
+    - Entries are ordered like a top-down `os.walk`: each directory is followed by
+      its files, then by its subdirectories (recursively). Names are sorted within
+      each directory, so the order doesn't depend on the file system.
+
+    Args:
+        absolute_path: Root directory to scan.
+        matcher: Ignore rules to apply; defaults to the built-in excludes plus `.gitignore` files.
+
+    Returns:
+        A list of `IndexEntry` records, starting with the root directory itself.
+    """
+    try:
+        root_mtime = os.stat(absolute_path).st_mtime
+    except OSError as e:
+        logging.error("OS error while scanning %s: %s", absolute_path, e)
+        return []
+
+    if matcher is None:
+        matcher = ignore.IgnoreMatcher(absolute_path)
+
+    entries = [IndexEntry(absolute_path, 0, root_mtime, True, 0)]
+    _scan_directory(absolute_path, "", 1, entries, matcher, tuple(matcher.base))
+    return entries
+
+
+def build_git_index(absolute_path: str, matcher: ignore.IgnoreMatcher | None = None) -> list[IndexEntry] | None:
+    """
+    Build the index from the git index (tracked files only) instead of walking the disk.
+
+    - Reads `.git/index` in a single pass, like `git ls-files`, so untracked trees
+      (`node_modules`, build outputs, virtualenvs) are never visited.
+    - Sizes and mtimes come from the stat data cached in the git index.
+    - Directories are derived from the file paths and listed in sorted order.
+    - Tracked files aren't subject to `.gitignore`; only the built-in and user
+      exclude/include patterns of `matcher` are applied.
+
+    Args:
+        absolute_path: Root directory to list; may be a subdirectory of a work tree.
+        matcher: Ignore rules to apply; defaults to the built-in excludes.
+
+    Returns:
+        A list of `IndexEntry` records in the same layout as `build_index`,
+        or None if `absolute_path` isn't inside a readable git repository.
+    """
+    located = gitindex.find_git_dir(absolute_path)
+    if located is None:
+        logging.warning("No git repository found at %s; scanning the file system instead.", absolute_path)
+        return None
+
+    work_tree, git_dir = located
+    try:
+        tracked = gitindex.read_index(git_dir)
+    except gitindex.GitIndexError as e:
+        logging.warning("Could not read git index (%s); scanning the file system instead.", e)
+        return None
+
+    # Only keep paths under the requested directory
+    prefix = os.path.relpath(absolute_path, work_tree).replace(os.sep, "/")
+    prefix = "" if prefix == "." else prefix + "/"
+
+    if matcher is None:
+        matcher = ignore.IgnoreMatcher(absolute_path, use_gitignore=False)
+
+    # Group tracked files into a nested tree: {"": [files], "subdir": {...}}
+    tree = {"": []}
+    for rel_path, size, mtime in tracked:
+        if not rel_path.startswith(prefix):
+            continue
+        rel_path = rel_path[len(prefix):]
+        if not matcher.keeps_path(rel_path):
+            continue
+        *parts, name = rel_path.split("/")
+        node = tree
+        for part in parts:
+            node = node.setdefault(part, {"": []})
+        node[""].append((name, size, mtime))
+
+    entries = [IndexEntry(absolute_path, 0, 0.0, True, 0)]
+    _flatten_tree(tree, absolute_path, 1, entries)
+    logging.info("Listed %d entries from the git index", len(entries))
+    return entries
+
+
+def _flatten_tree(node: dict, dirpath: str, depth: int, entries: list[IndexEntry]) -> None:
+    """
+    Append a nested tree from `build_git_index` in walk order: files, then subdirectories.
+
+    Args:
+        node: Tree node; key "" holds (name, size, mtime) file tuples, other keys are subdirectories.
+        dirpath: Absolute path of the directory the node represents.
+        depth: Depth assigned to the children of `dirpath`.
+        entries: List the new entries are appended to.
+    """
+    for name, size, mtime in node[""]:
+        entries.append(IndexEntry(os.path.join(dirpath, name), size, mtime, False, depth))
+
+    for name in sorted(k for k in node if k):
+        subdir = os.path.join(dirpath, name)
+        entries.append(IndexEntry(subdir, 0, 0.0, True, depth))
+        _flatten_tree(node[name], subdir, depth + 1, entries)
+
+
+def _scan_directory(dirpath: str, rel_dir: str, depth: int, entries: list[IndexEntry],
+                    matcher: ignore.IgnoreMatcher, stack: tuple) -> None:
+    """
+    Append the files of `dirpath`, then recurse into its subdirectories.
+
+    Args:
+        dirpath: Directory to list.
+        rel_dir: `dirpath` relative to the scan root, `/`-separated ("" for the root).
+        depth: Depth assigned to the children of `dirpath`.
+        entries: List the new entries are appended to.
+        matcher: Ignore rules for the scan.
+        stack: Ignore stack of the parent directory (see `ignore.IgnoreMatcher`).
+    """
+    try:
+        with os.scandir(dirpath) as it:
+            listing = list(it)
+    except OSError as e:
+        logging.error("OS error while scanning %s: %s", dirpath, e)
+        return
+    listing.sort(key=lambda entry: entry.name)
+
+    # Pick up this directory's .gitignore before judging its children
+    stack = matcher.enter_directory(
+        dirpath, rel_dir, stack, any(entry.name == ".gitignore" for entry in listing)
+    )
+    prefix = rel_dir + "/" if rel_dir else ""
+    subdirs = []
+
+    for entry in listing:
+        rel_path = prefix + entry.name
+        try:
+            if entry.is_dir():
+                # Skip .git directories and, like os.walk, don't follow directory symlinks
+                if entry.name == ".git" or entry.is_symlink():
+                    continue
+                # Prune ignored directories without descending into them
+                if matcher.is_ignored(rel_path, True, stack):
+                    continue
+                subdirs.append((entry, rel_path))
+            else:
+                if matcher.is_ignored(rel_path, False, stack) or not matcher.is_included(rel_path):
+                    continue
+                st = entry.stat()
+                entries.append(IndexEntry(entry.path, st.st_size, st.st_mtime, False, depth))
+        except OSError as e:
+            logging.error("OS error while checking %s: %s", entry.path, e)
+
+    # Directories come after the files of their parent, mirroring os.walk output
+    for entry, rel_path in subdirs:
+        try:
+            mtime = entry.stat().st_mtime
+        except OSError:
+            mtime = 0.0
+        entries.append(IndexEntry(entry.path, 0, mtime, True, depth))
+        _scan_directory(entry.path, rel_path, depth + 1, entries, matcher, stack)
+
+
+def file_entries(entries: list[IndexEntry]) -> list[IndexEntry]:
+    """
+    Return only the file entries of an index, preserving order.
+
+    Args:
+        entries: Index produced by `build_index`.
+
+    Returns:
+        A list of entries for regular files.
+    """
+    return [e for e in entries if not e.is_dir]
+
+
+def mtime_lookup(entries: list[IndexEntry]) -> dict[str, float]:
+    """
+    Map each file path in the index to its modification time.
+
+    Args:
+        entries: Index produced by `build_index`.
+
+    Returns:
+        A dictionary of absolute file path to mtime.
+    """
+    return {e.path: e.mtime for e in entries if not e.is_dir}
+
+
+def size_lookup(entries: list[IndexEntry]) -> dict[str, int]:
+    """
+    Map each file path in the index to its size in bytes.
+
+    Args:
+        entries: Index produced by `build_index`.
+
+    Returns:
+        A dictionary of absolute file path to size.
+    """
+    return {e.path: e.size for e in entries if not e.is_dir}
+
+
+class NameIndex:
+    """
+    Lookup tables over an index for resolving file arguments in O(1).
+
+    Files are keyed both by basename (which may be shared by several files)
+    and by their `/`-separated path relative to the indexed root.
+    """
+
+    def __init__(self, root: str, entries: list[IndexEntry]):
+        self.root = root
+        self.by_name = {}
+        self.by_path = {}
+        self.paths = []
+
+        prefix_len = len(os.path.join(root, ""))
+        for entry in entries:
+            if entry.is_dir:
+                continue
+            rel_path = entry.path[prefix_len:].replace(os.sep, "/")
+            self.by_path[rel_path] = entry.path
+            self.by_name.setdefault(rel_path.rpartition("/")[2], []).append(entry.path)
+            self.paths.append(rel_path)
+
+    def lookup(self, name: str) -> list[str]:
+        """
+        Find the files a name refers to.
+
+        Args:
+            name: A relative path (`src/app.py`) or a bare basename (`app.py`).
+
+        Returns:
+            Absolute paths of the matching files, in index order; several for a
+            basename shared by files in different directories, none if unknown.
+        """
+        rel_path = name.replace(os.sep, "/")
+        while rel_path.startswith("./"):
+            rel_path = rel_path[2:]
+        exact = self.by_path.get(rel_path)
+        if exact is not None:
+            return [exact]
+        if "/" in rel_path:
+            return []
+        return list(self.by_name.get(rel_path, ()))
+
+    def glob(self, pattern: str) -> list[str]:
+        """
+        Find the files matching a shell-style glob.
+
+        Args:
+            pattern: Glob matched against relative paths if it contains a `/`,
+                otherwise against basenames.
+
+        Returns:
+            Absolute paths of the matching files, in index order.
+        """
+        pattern = pattern.replace(os.sep, "/")
+        regex = re.compile(fnmatch.translate(pattern))
+        if "/" in pattern:
+            return [self.by_path[p] for p in self.paths if regex.match(p)]
+        return [self.by_path[p] for p in self.paths if regex.match(p.rpartition("/")[2])]
@@ -0,0 +1,137 @@
+import os
+import json
+import time
+
+from analyzer import index, sections
+
+
+class JsonlWriter:
+    """
+    Writes a package as JSON Lines: one JSON object per line, so packages can be
+    parsed back record by record instead of by scraping Markdown headers.
+
+    Records, in order:
+        - `{"type": "repository", "root", "git"}`: `git` is null outside a git repository.
+        - `{"type": "file", "path", "size", "lines", "truncated", "binary", "content"}`, one per file;
+          `path` is `/`-separated and relative to the root, and `content` is the plain
+          text that was kept (null for binary files). Recent-only packages add `modified`,
+          and deduplicated files have a null `content` and a `duplicate_of` path. Delta
+          packages add `status` ("added" or "modified"), and a `diff` replacing `content`.
+          Outlined files (see `outline`) have `"outline": true`, and `content` holds the outline.
+        - `{"type": "removed", "path"}` for each file deleted since the base of a delta.
+        - `{"type": "omitted", "path"}` for each file left out by the byte or token budget.
+        - `{"type": "summary", "files", "lines", "recent_only"}`, plus `duplicates` and
+          `bytes_saved` when deduplicating, `omitted` when files were left out,
+          `tokens`, `token_budget` and `file_tokens` (by path) with a token budget, and
+          `since`, `added`, `modified` and `removed` in a delta package.
+        - `{"type": "manifest", "path", "size", "mtime", "hash"}` for each selected file,
+          with `--record-hashes` (see `delta.manifest_lines`).
+
+    In a sharded package, every shard after the first starts with a
+    `{"type": "shard", "root", "shard"}` record.
+
+    Provides the same methods as `output.MarkdownWriter`.
+    """
+
+    def __init__(self, absolute_path: str):
+        self.absolute_path = absolute_path
+
+    @staticmethod
+    def write_record(out, record: dict) -> None:
+        """Write one record as a line of JSON."""
+        out.write(json.dumps(record, ensure_ascii=False))
+        out.write("\n")
+
+    def write_header(self, out, absolute_path: str, git_info: dict[str, str] | None) -> None:
+        """Write the repository record."""
+        self.write_record(out, {"type": "repository", "root": absolute_path, "git": git_info or None})
+
+    def write_structure(self, out, absolute_path: str, entries: list[index.IndexEntry]) -> None:
+        """The tree is implied by the file paths."""
+
+    def write_contents_intro(self, out, recent_only: bool, since: str | None = None) -> None:
+        """File records need no heading."""
+
+    def write_no_content(self, out) -> None:
+        """An empty package simply has no file records."""
+
+    def render_file_section(self, record: sections.Section, recent_only: bool, max_file_size: int) -> str:
+        """
+        Render the record of a file.
+
+        Args:
+            record: The file's `sections.Section`.
+            recent_only: Whether to include the modification time.
+            max_file_size: Maximum number of bytes read from the file.
+
+        Returns:
+            The JSON line for the file.
+        """
+        line = {
+            "type": "file",
+            "path": record.rel_path,
+            "size": record.size,
+            "lines": record.lines,
+            "truncated": record.truncated,
+            "binary": record.binary,
+            "content": None if record.duplicate_of is not None or record.diff is not None else record.content,
+        }
+        if recent_only:
+            mtime = record.mtime
+            if mtime is None:
+                try:
+                    mtime = os.path.getmtime(record.path)
+                except OSError:
+                    pass
+            line["modified"] = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(mtime)) if mtime else None
+        if record.duplicate_of is not None:
+            line["duplicate_of"] = record.duplicate_of
+        if record.outline:
+            line["outline"] = True
+        if record.status is not None:
+            line["status"] = record.status
+        if record.diff is not None:
+            line["diff"] = record.diff
+        return json.dumps(line, ensure_ascii=False) + "\n"
+
+    def render_shard_header(self, absolute_path: str, number: int) -> str:
+        """Render the record that opens every shard after the first one."""
+        return json.dumps({"type": "shard", "root": absolute_path, "shard": number}, ensure_ascii=False) + "\n"
+
+    def write_removed(self, out, changes) -> None:
+        """Write a record for every file deleted since the base of a delta."""
+        for rel_path in changes.removed:
+            self.write_record(out, {"type": "removed", "path": rel_path})
+
+    def write_omitted(self, out, absolute_path: str, byte_budget) -> None:
+        """Write a record for every file left out by a budget."""
+        for file_path in byte_budget.omitted:
+            path = os.path.relpath(os.path.abspath(file_path), absolute_path).replace(os.sep, "/")
+            self.write_record(out, {"type": "omitted", "path": path})
+
+    def write_summary(self, out, recent_only: bool, file_count: int, line_count: int, deduper=None,
+                      byte_budget=None, token_budget=None, changes=None) -> None:
+        """Write the summary record."""
+        record = {"type": "summary", "files": file_count, "lines": line_count, "recent_only": recent_only}
+        if deduper is not None:
+            record["duplicates"] = deduper.duplicates
+            record["bytes_saved"] = deduper.bytes_saved
+        if byte_budget is not None and byte_budget.omitted:
+            record["omitted"] = len(byte_budget.omitted)
+            record["max_total_bytes"] = byte_budget.max_bytes
+        if token_budget is not None:
+            if token_budget.omitted:
+                record["omitted"] = record.get("omitted", 0) + len(token_budget.omitted)
+            record["tokens"] = token_budget.used
+            record["token_budget"] = token_budget.max_tokens
+            record["header_tokens"] = token_budget.fixed
+            record["file_tokens"] = {p.replace(os.sep, "/"): n for p, n in token_budget.file_tokens.items()}
+        if changes is not None:
+            record["since"] = changes.base
+            record["added"], record["modified"], record["removed"] = changes.counts()
+        self.write_record(out, record)
+
+    def write_manifest(self, out, lines) -> None:
+        """Write the manifest records, already rendered as JSON lines."""
+        for line in lines:
+            out.write(line)
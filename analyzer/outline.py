@@ -0,0 +1,257 @@
+import os
+import re
+import ast
+import logging
+from typing import NamedTuple
+
+from analyzer import dedupe, files
+
+# Outline modes: outline files over the per-file limit, or every file in a supported language
+MODES = ("large", "all")
+
+# Bump when the outline format changes, so cached outlines are rebuilt
+OUTLINE_VERSION = 1
+
+# Signature lines longer than this are cut
+MAX_SIGNATURE_CHARS = 200
+
+# Longer lines (minified code, data) are never declarations worth a regex test
+MAX_LINE_CHARS = 1000
+
+# Files over this many times the per-file limit aren't read in full to be outlined;
+# they're shown truncated like any other large file
+MAX_READ_FACTOR = 8
+
+
+class Language(NamedTuple):
+    """
+    What the regex outliner needs to know about a language.
+
+    Attributes:
+        declaration: Pattern matching the first line of a class, function or method declaration.
+        comments: Prefixes of the comment lines that document a declaration (written above it).
+    """
+    declaration: re.Pattern
+    comments: tuple[str, ...]
+
+
+_MODIFIERS = r"(?:(?:public|private|protected|internal|static|final|abstract|override|virtual|async|sealed|open|" \
+             r"data|suspend|synchronized|inline|export|default|declare|readonly|partial|extern|unsafe|const)\s+)*"
+_C_COMMENTS = ("///", "//", "/**", "/*", "*")
+
+_C_FAMILY = Language(
+    re.compile(
+        r"^(?:struct|class|enum|union|namespace|typedef\s+struct)\b"
+        r"|^(?!\s*(?:if|for|while|switch|return|else|do|case)\b)[A-Za-z_][\w\s\*&:<>,~]*?\b~?\w+\s*\([^;]*$"
+    ),
+    _C_COMMENTS,
+)
+_JAVA_FAMILY = Language(
+    re.compile(
+        rf"^\s*{_MODIFIERS}(?:class|interface|enum|record|struct|object|fun|trait)\b"
+        r"|^\s*(?:(?:public|private|protected|internal|static|final|abstract|override|virtual|async|"
+        r"synchronized)\s+)+(?!class\b|interface\b|enum\b|record\b)[\w<>\[\],.?\s]+?\s+\w+\s*\([^;]*$"
+    ),
+    _C_COMMENTS + ("@",),
+)
+_JS_FAMILY = Language(
+    re.compile(
+        rf"^\s*{_MODIFIERS}(?:function\b|class\b|interface\b|enum\b|type\s+\w+.*=)"
+        r"|^\s*(?:export\s+)?(?:const|let|var)\s+[\w$]+\s*(?::[^=]+)?=\s*(?:async\s+)?(?:function\b|\([^)]*\)\s*(?::[^=]+)?=>|[\w$]+\s*=>)"
+        r"|^\s+(?:(?:static|async|get|set|public|private|protected|readonly|override)\s+)*"
+        r"(?!(?:if|for|while|switch|catch|return|function|else|do|with)\b)[\w$#]+\s*\([^;]*\)\s*(?::[^{;]+)?\{\s*$"
+    ),
+    _C_COMMENTS,
+)
+_HASH_COMMENTS = ("#",)
+
+LANGUAGES = {
+    ".py": Language(re.compile(r"^\s*(?:async\s+)?def\s|^\s*class\s"), _HASH_COMMENTS),
+    ".pyi": Language(re.compile(r"^\s*(?:async\s+)?def\s|^\s*class\s"), _HASH_COMMENTS),
+    ".js": _JS_FAMILY, ".jsx": _JS_FAMILY, ".mjs": _JS_FAMILY, ".cjs": _JS_FAMILY,
+    ".ts": _JS_FAMILY, ".tsx": _JS_FAMILY,
+    ".java": _JAVA_FAMILY, ".kt": _JAVA_FAMILY, ".kts": _JAVA_FAMILY, ".cs": _JAVA_FAMILY, ".scala": _JAVA_FAMILY,
+    ".c": _C_FAMILY, ".h": _C_FAMILY, ".cc": _C_FAMILY, ".cpp": _C_FAMILY, ".cxx": _C_FAMILY,
+    ".hpp": _C_FAMILY, ".hh": _C_FAMILY, ".m": _C_FAMILY,
+    ".go": Language(re.compile(r"^func\b|^type\s+\w+\s+(?:struct|interface)\b"), ("//",)),
+    ".rs": Language(
+        re.compile(r"^\s*(?:pub(?:\([^)]*\))?\s+)?(?:async\s+)?(?:const\s+)?(?:unsafe\s+)?"
+                   r"(?:fn|struct|enum|trait|impl|mod|union)\b"),
+        ("///", "//!", "//"),
+    ),
+    ".swift": Language(
+        re.compile(r"^\s*(?:(?:public|private|internal|open|fileprivate|static|final|override|mutating|"
+                   r"@\w+)\s+)*(?:func|class|struct|enum|protocol|extension|actor)\b"),
+        ("///", "//"),
+    ),
+    ".rb": Language(re.compile(r"^\s*(?:def|class|module)\s"), _HASH_COMMENTS),
+    ".php": Language(
+        re.compile(r"^\s*(?:(?:public|private|protected|static|abstract|final)\s+)*"
+                   r"(?:function|class|interface|trait|enum)\s"),
+        _C_COMMENTS + _HASH_COMMENTS,
+    ),
+    ".sh": Language(re.compile(r"^\s*(?:function\s+[\w-]+|[\w-]+\s*\(\)\s*\{?)"), _HASH_COMMENTS),
+    ".bash": Language(re.compile(r"^\s*(?:function\s+[\w-]+|[\w-]+\s*\(\)\s*\{?)"), _HASH_COMMENTS),
+    ".lua": Language(re.compile(r"^\s*(?:local\s+)?function\b"), ("--",)),
+}
+
+
+def supports(file_path: str) -> bool:
+    """Whether files with this extension can be outlined."""
+    return os.path.splitext(file_path)[1].lower() in LANGUAGES
+
+
+def outline_text(text: str, file_path: str) -> str | None:
+    """
+    Reduce source code to its outline: class, function and method signatures, and
+    the first line of their docstrings, each prefixed with its line number.
+
+    Python is parsed with `ast` (falling back to the regex pass on syntax errors);
+    other languages go through one regex pass per line (see `LANGUAGES`).
+
+    Args:
+        text: Source code.
+        file_path: Path to the file (its extension selects the language).
+
+    Returns:
+        The outline, or None if the language isn't supported or nothing was found.
+    """
+    ext = os.path.splitext(file_path)[1].lower()
+    language = LANGUAGES.get(ext)
+    if language is None:
+        return None
+    lines = None
+    if ext in (".py", ".pyi"):
+        lines = outline_python(text)
+    if lines is None:
+        lines = outline_regex(text, language)
+    return "\n".join(lines) if lines else None
+
+
+def outline_python(text: str) -> list[str] | None:
+    """
+    Outline Python code with `ast`: decorators, signatures and docstring first lines, nested as in the source.
+
+    Returns:
+        The outline lines, or None if the code doesn't parse.
+    """
+    try:
+        tree = ast.parse(text)
+    except (SyntaxError, ValueError, RecursionError):
+        return None
+
+    lines = []
+    _docstring_line(tree, lines, "")
+    _outline_body(tree.body, lines, "")
+    return lines
+
+
+def _outline_body(body: list[ast.stmt], lines: list[str], indent: str) -> None:
+    for node in body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            for decorator in node.decorator_list:
+                lines.append(f"{decorator.lineno}: {indent}@{_unparse(decorator)}")
+            prefix = "async def" if isinstance(node, ast.AsyncFunctionDef) else "def"
+            returns = f" -> {_unparse(node.returns)}" if node.returns is not None else ""
+            lines.append(f"{node.lineno}: {indent}{prefix} {node.name}({_unparse(node.args)}){returns}:")
+            _docstring_line(node, lines, indent + "    ")
+        elif isinstance(node, ast.ClassDef):
+            for decorator in node.decorator_list:
+                lines.append(f"{decorator.lineno}: {indent}@{_unparse(decorator)}")
+            bases = ", ".join(_unparse(b) for b in node.bases + node.keywords)
+            lines.append(f"{node.lineno}: {indent}class {node.name}{f'({bases})' if bases else ''}:")
+            _docstring_line(node, lines, indent + "    ")
+            # Methods and nested classes, but not the bodies of functions
+            _outline_body(node.body, lines, indent + "    ")
+
+
+def _docstring_line(node, lines: list[str], indent: str) -> None:
+    docstring = ast.get_docstring(node)
+    if docstring:
+        first = docstring.strip().splitlines()[0]
+        lines.append(f"{node.body[0].lineno}: {indent}\"\"\"{_shorten(first)}\"\"\"")
+
+
+def _unparse(node) -> str:
+    return _shorten(ast.unparse(node))
+
+
+def _shorten(text: str) -> str:
+    return text if len(text) <= MAX_SIGNATURE_CHARS else text[:MAX_SIGNATURE_CHARS - 3] + "..."
+
+
+def outline_regex(text: str, language: Language) -> list[str]:
+    """
+    Outline code with one regex test per line: each declaration line, preceded
+    by the first line of the comment block written directly above it.
+
+    Returns:
+        The outline lines (declarations keep their indentation, without a trailing `{`).
+    """
+    lines = []
+    source = text.splitlines()
+    for i, line in enumerate(source):
+        if len(line) > MAX_LINE_CHARS or not language.declaration.match(line):
+            continue
+        # Walk up the comment block above the declaration to its first line
+        start = i
+        while start > 0 and source[start - 1].lstrip().startswith(language.comments):
+            start -= 1
+        if start < i:
+            first = next((j for j in range(start, i) if source[j].strip().strip("/*#-!").strip()), start)
+            lines.append(f"{first + 1}: {_shorten(source[first].rstrip())}")
+        lines.append(f"{i + 1}: {_shorten(line.rstrip().rstrip('{').rstrip())}")
+    return lines
+
+
+def outline_file(file_path: str, text: str | None = None, file_cache=None,
+                 max_bytes: int | None = None) -> tuple[str, int] | None:
+    """
+    Outline a file, reusing the outline cached for the same content.
+
+    Outlines are cached by a hash of the text they're built from (not by path
+    or mtime), so copies, renames and files touched without changes are free.
+
+    Args:
+        file_path: Path to the file.
+        text: Its full text if already read (e.g. a file under the per-file limit);
+            read from disk otherwise.
+        file_cache: Optional `cache.FileCache` (or any cache with `get`/`put`) storing outlines.
+        max_bytes: Size limit of a file read from disk; larger files aren't outlined.
+
+    Returns:
+        A (outline, lines) tuple, or None if the file has no outline (unsupported
+        language, nothing found, too large or unreadable), in which case it's shown as usual.
+    """
+    if text is None:
+        try:
+            size = os.path.getsize(file_path)
+            if max_bytes is not None and size > max_bytes:
+                logging.info("Not outlining %s: %d bytes is over the %d byte limit", file_path, size, max_bytes)
+                return None
+            raw = files.read_file_bytes(file_path, size if max_bytes is None else max_bytes)
+        except OSError as e:
+            logging.error("Failed to read %s: %s", file_path, e)
+            return None
+        if raw.binary or raw.truncated:
+            # Grown past the limit since it was sized
+            return None
+        text = raw.data.decode("utf-8", errors="replace")
+        if "\r" in text:
+            text = text.replace("\r\n", "\n").replace("\r", "\n")
+
+    ext = os.path.splitext(file_path)[1].lower()
+    key = None
+    if file_cache is not None:
+        digest = dedupe.digest_bytes(text.encode("utf-8", "surrogateescape"))
+        key = f"outline:{OUTLINE_VERSION}:{ext}:{digest}"
+        cached = file_cache.get(key)
+        if cached is not None:
+            return cached if cached[0] else None
+
+    outline = outline_text(text, file_path)
+    result = (outline, outline.count("\n") + 1) if outline else None
+    if key is not None:
+        # An empty entry remembers that there is nothing to outline
+        file_cache.put(key, result or ("", 0))
+    return result
@@ -1,138 +1,813 @@
+import contextlib
 import io
 import os
+import sys
 import time
 import logging
 
-from analyzer import git, structure, files
+from analyzer import (
+    budget, cache, dedupe, delta, git, history, ignore, index, jsonl, profiling, sections, structure, files, tokens
+)
+
+# Size of the write buffer used for output files and piped stdout
+WRITE_BUFFER_BYTES = 1024 * 1024
+
+# Package formats, and the output file extensions that select one
+FORMATS = ("markdown", "jsonl")
+FORMAT_SUFFIXES = {".jsonl": "jsonl", ".ndjson": "jsonl"}
+
+# Compression formats, selected by the output file extension
+COMPRESSION_SUFFIXES = {".gz": "gzip", ".zst": "zstd"}
+
+# Fast levels: packages are mostly text and compress well without the slow settings
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 3
+
 
 def content_output(absolute_path, contain_recent_files_only,
-                   filenames=None, output=None, max_file_size=16*1024, remove_comments=False) -> None:
+                   filenames=None, output=None, max_file_size=16*1024, remove_comments=False,
+                   jobs=1, use_cache=True, tracked_only=False, excludes=(), includes=(),
+                   profiler=None, entries=None, recency=None, deduplicate=False, output_format=None,
+                   structure_options=None, max_total_bytes=None, token_budget=None, priority=(),
+                   since=None, since_package=None, show_diffs=False, record_hashes=False,
+                   shard_size=None, shard_unit="bytes", outline=None) -> None:
     """
     Generate repository context output for a directory or set of files.
+
+    Sections are streamed to the output file (or stdout) as soon as they are produced,
+    so memory use doesn't grow with the size of the package.
+
+    When a `profiling.Profiler` is given, every phase and every file is timed into it.
+    An index already built for `absolute_path` (see `build_entries`) can be passed as
+    `entries` to skip the scan. A `history.Recency` selects recent files from
+    git history instead of modification times. With `deduplicate`, files whose
+    content was already emitted are replaced by a reference to the first copy.
+
+    `output_format` is "markdown" or "jsonl" (see `jsonl.JsonlWriter`); by default it's
+    chosen from the output file's extension. Output files ending in `.gz` or `.zst`
+    are compressed as they are written. `structure_options` limits and annotates
+    the Structure section (see `structure.StructureOptions`). `max_total_bytes`
+    caps the size of the package; files past the budget are listed as omitted.
+    `token_budget` fits the package in an estimated number of model tokens,
+    choosing as many files as possible and preferring those matching `priority`.
+
+    `since` (a git ref) or `since_package` (an earlier package written with
+    `record_hashes`) limits the package to the files changed since then (see
+    `delta`); `show_diffs` shows modified files as unified diffs. `record_hashes`
+    appends the manifest a later `since_package` compares against.
+
+    With `shard_size`, the package is split across numbered files of at most that
+    many bytes or estimated tokens (`shard_unit`) next to `output`, written in
+    parallel and listed in an index (see `shards.ShardedOutput`).
+
+    `outline` ("large" or "all") shows files over `max_file_size` (or every source
+    file) as an outline of their signatures instead of their text (see `outline`).
+    """
+    logging.info("Starting content output for path: %s", absolute_path)
+    phase = profiler.phase if profiler is not None else profiling.no_phase
+    output_format = output_format or format_for(output)
+
+    # Read the earlier package before the output is opened: it may be the same file
+    base_package = None
+    if since_package is not None:
+        with phase("read_base_package"):
+            try:
+                with open_input(since_package) as f:
+                    base_package = delta.read_package(
+                        f, os.path.basename(since_package), format_for(since_package) == "jsonl", show_diffs
+                    )
+            except OSError as e:
+                raise delta.DeltaError(f"could not read {since_package}: {e}") from None
+
+    # Ask git before the output is opened, so an unknown ref leaves an existing package alone
+    changes = None
+    if since is not None:
+        with phase("delta"):
+            changes = delta.since_ref(absolute_path, since, show_diffs, excludes, includes)
+    recent_paths = None
+    if recency:
+        with phase("select_recent"):
+            recent_paths = select_recent(absolute_path, recency, use_cache)
+
+    # Persistent cache of analyzed files from previous runs
+    with phase("open_cache"):
+        file_cache = cache.open_cache(absolute_path) if use_cache else None
+
+    sharded = None
+    if shard_size:
+        # Imported here: shards builds on this module
+        from analyzer import shards
+        sharded = shards.ShardedOutput(output, shard_size, shard_unit, workers=max(2, jobs))
+        destination = sharded
+    else:
+        destination = open_output(output, banner=output_format == "markdown")
+
+    try:
+        with destination as out:
+            write_package(
+                out, absolute_path, contain_recent_files_only, filenames,
+                max_file_size, remove_comments, jobs, file_cache, tracked_only,
+                excludes, includes, profiler, entries, recency, deduplicate, output_format,
+                structure_options, max_total_bytes, token_budget, priority,
+                since=since, base_package=base_package, show_diffs=show_diffs, record_hashes=record_hashes,
+                sharded=sharded, outline=outline, recent_paths=recent_paths, changes=changes
+            )
+    except OSError as e:
+        # Log error if writing fails
+        logging.error("Failed to write to %s: %s", output or "stdout", e)
+        return
+    finally:
+        if file_cache is not None:
+            with phase("close_cache"):
+                file_cache.close()
+
+    if output:
+        # Log success message
+        logging.info("Results successfully written to %s", output)
+
+
+@contextlib.contextmanager
+def open_output(output: str | None, banner: bool = True):
+    """
+    Open the destination for a package: a buffered (possibly compressed) file, or stdout.
+
+    Args:
+        output: Path to the output file, or None for the terminal.
+        banner: Frame terminal output with a "Displaying results.." line and a final
+            newline (left out for machine-readable formats).
+
+    Yields:
+        A writable text stream.
+    """
+    if output:
+        logging.info("Writing results to file: %s", output)
+        with open_file(output) as f:
+            yield f
+    else:
+        logging.info("Displaying results to terminal.")
+        if banner:
+            sys.stdout.write("Displaying results..\n\n")
+        yield sys.stdout
+        # Match the trailing newline `print` used to add
+        if banner:
+            sys.stdout.write("\n")
+        sys.stdout.flush()
+
+
+def open_file(path: str, compression: str | None = None):
+    """
+    Open a package file for writing as text, compressing it on the fly if needed.
+
+    Compressed data is produced incrementally as the text is written, so the
+    package is never held in memory as a whole.
+
+    Args:
+        path: Path to the file.
+        compression: "gzip", "zstd" or None; by default chosen from the file extension.
+
+    Returns:
+        A writable UTF-8 text stream.
+
+    Raises:
+        ValueError: If zstd is requested and no zstd implementation is installed.
     """
-    buffer = io.StringIO()
+    compression = compression or compression_for(path)
+    if compression is None:
+        return open(path, "w", encoding="utf-8", buffering=WRITE_BUFFER_BYTES)
+
+    if compression == "gzip":
+        import gzip
+        return gzip.open(path, "wt", compresslevel=GZIP_LEVEL, encoding="utf-8")
+
+    # zstd: the standard library module on Python 3.14+, otherwise the optional `zstandard` package
+    try:
+        from compression import zstd
+        return zstd.open(path, "wt", level=ZSTD_LEVEL, encoding="utf-8")
+    except ImportError:
+        pass
+    try:
+        import zstandard
+    except ImportError:
+        raise ValueError("zstd output requires the 'zstandard' package (pip install zstandard)") from None
+    raw = open(path, "wb", buffering=WRITE_BUFFER_BYTES)
+    return io.TextIOWrapper(zstandard.ZstdCompressor(level=ZSTD_LEVEL).stream_writer(raw), encoding="utf-8")
+
+
+def open_input(path: str):
+    """
+    Open a package file for reading as text, decompressing it on the fly if needed (see `open_file`).
+
+    Raises:
+        ValueError: If the file is zstd-compressed and no zstd implementation is installed.
+    """
+    compression = compression_for(path)
+    if compression is None:
+        return open(path, "r", encoding="utf-8", errors="surrogateescape")
+
+    if compression == "gzip":
+        import gzip
+        return gzip.open(path, "rt", encoding="utf-8", errors="surrogateescape")
+
+    try:
+        from compression import zstd
+        return zstd.open(path, "rt", encoding="utf-8", errors="surrogateescape")
+    except ImportError:
+        pass
+    try:
+        import zstandard
+    except ImportError:
+        raise ValueError("zstd input requires the 'zstandard' package (pip install zstandard)") from None
+    raw = open(path, "rb")
+    return io.TextIOWrapper(zstandard.ZstdDecompressor().stream_reader(raw), encoding="utf-8", errors="surrogateescape")
+
+
+def compression_for(path: str) -> str | None:
+    """Return the compression format selected by a file name ("gzip", "zstd"), or None."""
+    return COMPRESSION_SUFFIXES.get(os.path.splitext(path)[1].lower())
+
+
+def compressed_name(path: str | None, compression: str | None) -> str | None:
+    """
+    Add the extension of a compression format to a file name, unless it's already there.
+
+    Args:
+        path: Output file name, or None for the terminal.
+        compression: "gzip", "zstd" or None.
+
+    Returns:
+        The file name to write, e.g. `package.md.gz` for `package.md` and "gzip".
+    """
+    if not path or not compression:
+        return path
+    suffix = next(ext for ext, name in COMPRESSION_SUFFIXES.items() if name == compression)
+    return path if path.lower().endswith(suffix) else path + suffix
+
+
+def format_for(output: str | None) -> str:
+    """
+    Choose the package format from an output file name (`.jsonl`, `.jsonl.gz`, ...).
+
+    Args:
+        output: Path to the output file, or None for the terminal.
+
+    Returns:
+        "jsonl" for JSON Lines file names, otherwise "markdown".
+    """
+    if not output:
+        return "markdown"
+    stem, ext = os.path.splitext(output.lower())
+    if ext in COMPRESSION_SUFFIXES:
+        ext = os.path.splitext(stem)[1]
+    return FORMAT_SUFFIXES.get(ext, "markdown")
+
+
+def make_writer(output_format: str, absolute_path: str, structure_options=None):
+    """
+    Create the section writer of a package format.
+
+    Args:
+        output_format: "markdown" or "jsonl".
+        absolute_path: Root directory being analyzed.
+        structure_options: Optional `structure.StructureOptions` for the Markdown Structure section.
+
+    Returns:
+        A `MarkdownWriter` or `jsonl.JsonlWriter`.
+    """
+    if output_format == "jsonl":
+        return jsonl.JsonlWriter(absolute_path)
+    return MarkdownWriter(structure_options)
+
+
+def write_package(out, absolute_path, contain_recent_files_only,
+                  filenames=None, max_file_size=16*1024, remove_comments=False, jobs=1,
+                  file_cache=None, tracked_only=False, excludes=(), includes=(), profiler=None,
+                  entries=None, recency=None, deduplicate=False, output_format="markdown",
+                  structure_options=None, max_total_bytes=None, token_budget=None,
+                  priority=(), git_info=None, since=None, base_package=None, show_diffs=False,
+                  record_hashes=False, sharded=None, outline=None, recent_paths=None,
+                  changes=None) -> tuple[int, int]:
+    """
+    Write every section of the package to an open stream, one piece at a time.
+
+    Args:
+        out: Writable text stream.
+        absolute_path: Root directory being analyzed.
+        contain_recent_files_only: Whether to include only recently modified files.
+        filenames: Optional list of specific files to include.
+        max_file_size: Maximum number of bytes to read per file.
+        remove_comments: Whether to strip comments from code files.
+        jobs: Number of parallel workers for reading files.
+        file_cache: Optional `cache.FileCache` used to skip unchanged files.
+        tracked_only: List files from the git index instead of walking the directory.
+        excludes: Extra gitignore-style patterns to exclude.
+        includes: Glob patterns a file must match to be included (all files if empty).
+        profiler: Optional `profiling.Profiler` timing each phase and file.
+        entries: Optional index from `build_entries`; scanned if omitted.
+        recency: Optional `history.Recency`; implies recent-only mode, judged from git history.
+        deduplicate: Emit each distinct file content once, referencing later copies by path.
+        output_format: "markdown" or "jsonl" (see `make_writer`).
+        structure_options: Optional `structure.StructureOptions` (depth limit, collapsing, annotations).
+        max_total_bytes: Optional size limit of the package in bytes (see `budget.ByteBudget`).
+            Reading stops at the first file that doesn't fit; it and the remaining
+            files are listed as omitted, outside the budget.
+        token_budget: Optional size limit of the package in estimated tokens (see `budget.TokenBudget`).
+            Files are chosen before reading (see `tokens.select_files`) to include as many as
+            possible; the files left out are listed as omitted, outside the budget.
+        priority: Gitignore-style patterns of files chosen first under `token_budget`.
+        git_info: Optional Git metadata already read with `git.pull_git_info`; read if omitted.
+        since: Optional git ref; only files changed since it (uncommitted work included)
+            are read, and deleted files are listed (see `delta.since_ref`).
+        base_package: Optional `delta.BasePackage`; only files changed since that package
+            are read, and deleted files are listed (see `delta.since_package`).
+        show_diffs: Show modified files of a delta as unified diffs instead of in full.
+        record_hashes: Append a manifest of every selected file (size, mtime, content hash)
+            for a later `base_package`, outside the budgets.
+        sharded: Optional `shards.ShardedOutput` that `out` writes to; file sections are
+            placed so that none is split across shards.
+        outline: "large" to show files over `max_file_size` as an outline of their
+            signatures, "all" to outline every file in a supported language, or None.
+        recent_paths: Recent files found for `recency` with `select_recent` before the
+            output was opened (so a bad ref can't leave a partial package behind),
+            or None to judge recency by modification time.
+        changes: The `delta.Delta` of `since`, if already found with `delta.since_ref`.
+
+    Returns:
+        The number of files and lines included.
+    """
+    phase = profiler.phase if profiler is not None else profiling.no_phase
+    writer = make_writer(output_format, absolute_path, structure_options)
+    contain_recent_files_only = contain_recent_files_only or bool(recency)
+    deduper = dedupe.Deduplicator(absolute_path) if deduplicate else None
+    byte_budget = budget.ByteBudget(max_total_bytes) if max_total_bytes else None
+    # The omitted list and the Summary are written outside the budgets
+    unbudgeted = out
+    if byte_budget is not None:
+        out = byte_budget.wrap(out)
+    token_limit = budget.TokenBudget(token_budget) if token_budget else None
+    # Header, structure and contents heading: counted by the byte budget, outside the token budget
+    fixed_out = out
+    if token_limit is not None:
+        fixed_out = token_limit.wrap(out, fixed=True)
+        out = token_limit.wrap(out)
+    if sharded is not None:
+        sharded.preamble = lambda number: writer.render_shard_header(absolute_path, number)
     file_count = 0
     line_count = 0
 
-    logging.info("Starting content output for path: %s", absolute_path)
+    # Ask git before the header, so an unknown ref fails before anything is written
+    if since is not None and changes is None:
+        with phase("delta"):
+            changes = delta.since_ref(absolute_path, since, show_diffs, excludes, includes)
+
+    # Repository context header and git info
+    with phase("git_info"):
+        if git_info is None:
+            git_info = git.pull_git_info(absolute_path)
+    writer.write_header(fixed_out, absolute_path, git_info)
+
+    # Scan the tree once; structure, file selection, sizes and mtimes all read from this index
+    with phase("scan"):
+        if entries is None:
+            entries = build_entries(absolute_path, tracked_only, excludes, includes)
+        mtimes = index.mtime_lookup(entries)
+        sizes = index.size_lookup(entries)
 
-    # Repository context header
-    buffer.write("# Repository Context\n\n")
-    buffer.write("## File System Location\n\n")
-    buffer.write(f"{absolute_path}\n\n")
+    with phase("structure"):
+        writer.write_structure(fixed_out, absolute_path, entries)
 
-    # Git info
-    buffer.write("## Git Info\n\n")
-    git_info = git.pull_git_info(absolute_path)
+    # Let downstream readers start on the header while files are being read
+    out.flush()
+
+    delta_base = base_package.name if base_package is not None else since
+    writer.write_contents_intro(fixed_out, contain_recent_files_only, delta_base)
+
+    with phase("select_files"):
+        file_paths = select_package_files(
+            absolute_path, filenames, contain_recent_files_only, entries, recency, recent_paths
+        )
+        selected = file_paths
+        if base_package is not None:
+            changes = delta.since_package(absolute_path, base_package, file_paths, sizes, mtimes)
+        if changes is not None:
+            # Only the delta is read and rendered
+            file_paths = changes.select(absolute_path, file_paths)
+        candidates = file_paths
+        if token_limit is not None and file_paths:
+            # Choose the files before reading any, so skipped files cost nothing
+            window = (recency.days if recency and recency.days is not None else 7) * 24 * 60 * 60
+            file_paths = select_for_tokens(
+                absolute_path, file_paths, sizes, mtimes, recent_paths, window, token_limit,
+                max_file_size, priority
+            )
+
+    if not candidates:
+        writer.write_no_content(out)
+    elif byte_budget is not None and byte_budget.spent():
+        # Header and structure used up the budget: don't read anything
+        byte_budget.omitted = file_paths
+    elif file_paths:
+        with phase("file_contents"):
+            rendered = iter_file_sections(
+                absolute_path, file_paths, contain_recent_files_only, max_file_size, remove_comments, sizes,
+                mtimes, jobs, file_cache, profiler, deduper, writer, changes, outline, fresh_stats=not tracked_only
+            )
+            for i, (section, lines) in enumerate(rendered):
+                if byte_budget is not None and not byte_budget.fits(section):
+                    byte_budget.omitted = file_paths[i:]
+                    break
+                if token_limit is not None:
+                    if not token_limit.fits(section):
+                        # Larger than estimated: skip it, smaller files may still fit
+                        token_limit.omitted.append(file_paths[i])
+                        if deduper is not None:
+                            # Later copies can't refer to a file that isn't in the package
+                            deduper.discard(file_paths[i])
+                        continue
+                    rel_path = os.path.relpath(os.path.abspath(file_paths[i]), absolute_path)
+                    token_limit.file_tokens[rel_path] = token_limit.cost(section)
+                if sharded is not None:
+                    rel_path = os.path.relpath(os.path.abspath(file_paths[i]), absolute_path)
+                    sharded.begin_file(section, rel_path.replace(os.sep, "/"))
+                out.write(section)
+                file_count += 1
+                line_count += lines
+            # Stop the readers and drop the files still queued
+            rendered.close()
+
+    if token_limit is not None and token_limit.omitted:
+        # Back in package order, mixing the files left out before and while reading
+        left_out = set(token_limit.omitted)
+        token_limit.omitted = [p for p in candidates if p in left_out]
+
+    if changes is not None and changes.removed:
+        writer.write_removed(unbudgeted, changes)
+    for limit in (token_limit, byte_budget):
+        if limit is not None and limit.omitted:
+            writer.write_omitted(unbudgeted, absolute_path, limit)
+    writer.write_summary(
+        unbudgeted, contain_recent_files_only, file_count, line_count, deduper, byte_budget, token_limit, changes
+    )
+
+    if record_hashes:
+        # Describes the whole selection, not only the delta, so the next delta has a complete base
+        with phase("record_hashes"):
+            previous = base_package.manifest if base_package is not None else None
+            writer.write_manifest(
+                unbudgeted, delta.manifest_lines(absolute_path, selected, sizes, mtimes, previous, changes)
+            )
+    return file_count, line_count
+
+
+def select_for_tokens(absolute_path: str, file_paths: list[str], sizes: dict[str, int],
+                      mtimes: dict[str, float], recent_paths: set[str] | None, window: float,
+                      token_limit: budget.TokenBudget, max_file_size: int, priority=()) -> list[str]:
+    """
+    Choose the files that fit in what's left of a token budget (see `tokens.select_files`).
+
+    Recently changed files are those in `recent_paths` (from git history), or
+    otherwise those modified within `window` seconds. The files left out are
+    recorded in `token_limit.omitted`.
+
+    Returns:
+        The chosen files, in package order.
+    """
+    if recent_paths is not None:
+        def is_recent(file_path):
+            return os.path.abspath(file_path) in recent_paths
+    else:
+        cutoff = time.time() - window
+
+        def is_recent(file_path):
+            return mtimes.get(os.path.abspath(file_path), 0) >= cutoff
+
+    selected, token_limit.omitted = tokens.select_files(
+        file_paths, sizes, token_limit.limit - token_limit.used, max_file_size, absolute_path,
+        priority, is_recent
+    )
+    return selected
+
+
+def select_package_files(absolute_path: str, filenames: list[str] | None, recent_only: bool,
+                         entries: list[index.IndexEntry], recency=None, recent_paths: set[str] | None = None) -> list[str]:
+    """
+    Choose the files of a package, in package order.
+
+    Args:
+        absolute_path: Root directory being analyzed.
+        filenames: Optional list of specific files to include.
+        recent_only: Whether to include only recently modified files.
+        entries: Index from `build_entries`.
+        recency: Optional `history.Recency` (its day window replaces the default 7 days).
+        recent_paths: Recent files from `select_recent`, or None to judge by modification time.
+
+    Returns:
+        The selected file paths.
+    """
+    return files.get_file_paths(
+        absolute_path, filenames, recent_only, entries, recent_paths,
+        recency.days if recency and recency.days is not None else 7
+    )
+
+
+def select_recent(absolute_path: str, recency, use_cache: bool = True) -> set[str] | None:
+    """
+    Resolve a `history.Recency` to the set of recently changed files.
+
+    Args:
+        absolute_path: Root directory being analyzed.
+        recency: Recency options.
+        use_cache: Whether to use the on-disk recency cache.
+
+    Returns:
+        Absolute paths of the recent files, or None to fall back to modification times.
+    """
+    recent_paths = history.recent_files(absolute_path, recency, use_cache)
+    if recent_paths is None:
+        logging.warning("%s is not in a git repository; judging recency by modification time.", absolute_path)
+    return recent_paths
+
+
+def build_entries(absolute_path: str, tracked_only: bool = False, excludes=(), includes=()) -> list[index.IndexEntry]:
+    """
+    Scan the tree once into the index shared by every section.
+
+    Args:
+        absolute_path: Root directory being analyzed.
+        tracked_only: List files from the git index, falling back to a scan outside git repositories.
+        excludes: Extra gitignore-style patterns to exclude.
+        includes: Glob patterns a file must match to be included (all files if empty).
+
+    Returns:
+        The index entries, in walk order.
+    """
+    if tracked_only:
+        matcher = ignore.IgnoreMatcher(absolute_path, excludes, includes, use_gitignore=False)
+        entries = index.build_git_index(absolute_path, matcher)
+        if entries is not None:
+            return entries
+    matcher = ignore.IgnoreMatcher(absolute_path, excludes, includes)
+    return index.build_index(absolute_path, matcher)
+
+
+def write_header(out, absolute_path: str, git_info: dict[str, str] | None) -> None:
+    """Write the repository context header and the Git Info section."""
+    out.write("# Repository Context\n\n")
+    out.write("## File System Location\n\n")
+    out.write(f"{absolute_path}\n\n")
+
+    out.write("## Git Info\n\n")
     if git_info:
         for k, v in git_info.items():
-            buffer.write(f"- {k.capitalize()}: {v}\n")
-        buffer.write("\n")
+            out.write(f"- {k.capitalize()}: {v}\n")
+        out.write("\n")
     else:
-        buffer.write("Not a git repository\n\n")
+        out.write("Not a git repository\n\n")
+
+
+def write_structure(out, absolute_path: str, entries: list[index.IndexEntry], options=None) -> None:
+    """Write the Structure section, line by line rather than joined into one string."""
+    out.write("## Structure\n```\n")
+    for line in structure.iter_structure(absolute_path, entries, options):
+        out.write(line)
+        out.write("\n")
+    out.write("```\n\n")
 
-    # Structure
-    buffer.write("## Structure\n```\n")
-    structure_str = structure.analyze_structure(absolute_path)
-    buffer.write(f"{structure_str}\n```\n\n")
 
-    # File contents
-    buffer.write("## File Contents\n")
-    if contain_recent_files_only:
-        buffer.write("[Only the recently modified files are included]\n\n")
+def write_contents_intro(out, recent_only: bool, since: str | None = None) -> None:
+    """Write the heading of the File Contents section (`since` names the base of a delta package)."""
+    out.write("## File Contents\n")
+    if recent_only:
+        out.write("[Only the recently modified files are included]\n")
         logging.info("Filtering for recently modified files only.")
     else:
-        buffer.write("\n")
         logging.info("Including all files.")
+    if since is not None:
+        out.write(f"[Only the files changed since {since} are included]\n")
+    out.write("\n")
 
-    file_paths = files.get_file_paths(absolute_path, filenames, contain_recent_files_only)
 
-    if not file_paths:
-        buffer.write("No file content available.\n\n")
-        logging.info("No files matched the criteria.")
-    else:
-        for file_path in file_paths:
-            section, lines = render_file_section(file_path, contain_recent_files_only, max_file_size, remove_comments)
-            buffer.write(section)
-            file_count += 1
-            line_count += lines
-
-    # Summary
-    buffer.write("## Summary\n")
-    if contain_recent_files_only:
-        buffer.write(f"- Total files (recently changed): {len(file_paths)}\n")
-    else:
-        buffer.write(f"- Total files: {file_count}\n")
-    buffer.write(f"- Total lines: {line_count}\n\n")
+def write_no_content(out) -> None:
+    """Write the placeholder used when no file was selected."""
+    out.write("No file content available.\n\n")
+    logging.info("No files matched the criteria.")
 
-    # Output
-    content = buffer.getvalue()
 
-    if output:
-        logging.info("Writing results to file: %s", output)
-        write_results(content, output)
+def write_omitted(out, absolute_path: str, byte_budget: budget.Budget) -> None:
+    """Write the Omitted Files section: the files left out by a byte or token budget."""
+    out.write("## Omitted Files\n")
+    out.write(f"[The {byte_budget.describe()} budget was reached; these files were not included]\n\n")
+    for file_path in byte_budget.omitted:
+        out.write(f"- {os.path.relpath(os.path.abspath(file_path), absolute_path)}\n")
+    out.write("\n")
+
+
+def render_shard_header(absolute_path: str, number: int) -> str:
+    """Render the heading that opens every shard after the first one."""
+    return f"# Repository Context (part {number})\n\n## File System Location\n\n{absolute_path}\n\n## File Contents\n\n"
+
+
+def write_removed(out, changes: delta.Delta) -> None:
+    """Write the Removed Files section: the files of a delta's base that no longer exist."""
+    out.write("## Removed Files\n")
+    out.write(f"[These files were deleted since {changes.base}]\n\n")
+    for rel_path in changes.removed:
+        out.write(f"- {rel_path}\n")
+    out.write("\n")
+
+
+def write_manifest(out, lines) -> None:
+    """Write the manifest lines inside an HTML comment, hidden when the Markdown is rendered."""
+    out.write(f"{delta.MARKDOWN_MANIFEST_START}\n")
+    for line in lines:
+        out.write(line)
+    out.write(f"{delta.MARKDOWN_MANIFEST_END}\n")
+
+
+def write_summary(out, recent_only: bool, file_count: int, line_count: int, deduper=None, byte_budget=None,
+                  token_budget=None, changes=None) -> None:
+    """Write the Summary section from running totals (and deduplication, budget and delta results, if enabled)."""
+    out.write("## Summary\n")
+    if recent_only:
+        out.write(f"- Total files (recently changed): {file_count}\n")
     else:
-        logging.info("Displaying results to terminal.")
-        print("Displaying results..\n")
-        print(content)
+        out.write(f"- Total files: {file_count}\n")
+    out.write(f"- Total lines: {line_count}\n")
+    if deduper is not None:
+        out.write(f"- Duplicate files: {deduper.duplicates} ({deduper.bytes_saved} bytes saved)\n")
+    if byte_budget is not None and byte_budget.omitted:
+        out.write(f"- Omitted files: {len(byte_budget.omitted)} (over the {byte_budget.describe()} budget)\n")
+    if token_budget is not None:
+        out.write(
+            f"- Total tokens (estimated): {token_budget.used} of {token_budget.limit} in files, "
+            f"plus {token_budget.fixed} in the header and structure\n"
+        )
+        if token_budget.omitted:
+            out.write(f"- Omitted files: {len(token_budget.omitted)} (over the {token_budget.describe()} budget)\n")
+        if token_budget.file_tokens:
+            out.write("- Tokens per file (estimated):\n")
+            for rel_path, count in token_budget.file_tokens.items():
+                out.write(f"  - {rel_path}: {count}\n")
+    if changes is not None:
+        added, modified, removed = changes.counts()
+        out.write(f"- Changed since {changes.base}: {added} added, {modified} modified, {removed} removed\n")
+    out.write("\n")
+
+
+def iter_file_sections(absolute_path: str, file_paths: list[str], recent_only: bool, max_file_size: int,
+                       remove_comments: bool, sizes: dict[str, int], mtimes: dict[str, float], jobs: int = 1,
+                       file_cache=None, profiler=None, deduper=None, writer=None, changes=None, outline=None,
+                       fresh_stats=False):
+    """
+    Render the section of every selected file, in order.
+
+    Files are read into `sections.Section` records (see `sections.iter_sections`),
+    which the writer then renders; with more than one job, reading runs in parallel.
+
+    Args:
+        absolute_path: Root directory being analyzed.
+        file_paths: Files to render.
+        recent_only: Whether to include modification time.
+        max_file_size: Maximum number of bytes to read from each file.
+        remove_comments: Whether to strip comments from the content.
+        sizes: File sizes from the index, keyed by absolute path.
+        mtimes: Modification times from the index, keyed by absolute path.
+        jobs: Number of workers (1 keeps everything on the calling thread).
+        file_cache: Optional `cache.FileCache` used to skip unchanged files.
+        profiler: Optional `profiling.Profiler` recording read and render time per file.
+        deduper: Optional `dedupe.Deduplicator`; repeated contents are replaced by a reference.
+        writer: Section writer of the package format (Markdown by default, see `make_writer`).
+        changes: Optional `delta.Delta` giving each file its status and diff.
+        outline: Outline mode, "large" or "all" (see `sections.iter_sections`).
+        fresh_stats: Whether `sizes` and `mtimes` can key the file cache (see `sections.iter_sections`).
 
-def render_file_section(file_path: str, recent_only: bool, max_file_size: int, remove_comments: bool) -> tuple[str, int]:
+    Yields:
+        (section, lines) tuples in the same order as `file_paths`.
+    """
+    render = writer.render_file_section if writer is not None else render_file_section
+    records = sections.iter_sections(
+        absolute_path, file_paths, max_file_size, remove_comments, sizes, mtimes, jobs, file_cache, profiler, deduper,
+        changes, outline, fresh_stats
+    )
+    try:
+        for record in records:
+            if profiler is None and record.duplicate_of is None:
+                yield render(record, recent_only, max_file_size), record.lines
+                continue
+
+            start = time.perf_counter()
+            section = render(record, recent_only, max_file_size)
+
+            if record.duplicate_of is not None:
+                # Measure what the reference saves against the full section; a tiny file is
+                # shorter than its reference, so it's emitted in full
+                original, record.duplicate_of = record.duplicate_of, None
+                full_section = render(record, recent_only, max_file_size)
+                if deduper.record(full_section, section):
+                    record.duplicate_of = original
+                else:
+                    section = full_section
+
+            if profiler is not None:
+                profiler.record_render(record.path, time.perf_counter() - start, section, record.lines)
+            yield section, record.lines
+    finally:
+        # Closing early (e.g. once the byte budget is spent) cancels the reads still queued
+        records.close()
+
+
+def render_file_section(record: sections.Section, recent_only: bool, max_file_size: int) -> str:
     """
     Render a markdown-formatted section for a file, including optional modification time.
 
     Args:
-        file_path: Path to the file.
+        record: The file's `sections.Section`.
         recent_only: Whether to include modification time.
-        max_file_size: Maximum number of bytes to read from the file.
+        max_file_size: Maximum number of bytes read from the file (shown in the truncation note).
 
     Returns:
-        A tuple containing:
-            - Markdown-formatted string for the file section.
-            - Number of lines in the file.
+        Markdown-formatted string for the file section.
     """
     # Create the section header with filename
-    filename = os.path.basename(file_path)
+    filename = os.path.basename(record.path)
     header = f"### File: {filename}"
     
-    # Append modification time if recent_only is enabled
     if recent_only:
         try:
-            # Get the last modification time
-            ts = os.path.getmtime(file_path)
+            # Get the last modification time, preferring the indexed value
+            ts = record.mtime if record.mtime is not None else os.path.getmtime(record.path)
             modified = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(ts))
         except Exception as e:
-            logging.error("Could not retrieve modification time for %s: %s", file_path, e)
+            logging.error("Could not retrieve modification time for %s: %s", record.path, e)
             modified = "Unknown"
         
         # Append modification time to header
         header += f" (Modified: {modified})"
+
+    # In a delta package, say how the file changed
+    if record.status is not None:
+        header += f" [{record.status}]"
     
-    # Analyze file content
-    content, lines = files.analyze_file_content(file_path, max_file_size, remove_comments)
+    # Identical files are emitted once; later copies only point at the first
+    if record.duplicate_of is not None:
+        return f"{header}\n[Identical to {record.duplicate_of}]\n\n"
+
+    if record.diff is not None:
+        return f"{header}\n```diff\n{record.diff.replace('```', '&#96;&#96;&#96;')}\n```\n\n"
+
+    if record.binary:
+        content = f"[Binary file omitted: {record.size} bytes]"
+    else:
+        # Escape any triple backticks to avoid breaking markdown formatting
+        content = record.content
+        if "```" in content:
+            content = content.replace("```", "&#96;&#96;&#96;")
+        if record.outline:
+            content += f"\n\n[Outline: signatures of a {record.size}-byte file, with line numbers]"
+        elif record.truncated:
+            content += f"\n\n[Truncated: file exceeds {max_file_size//1024}KB limit]"
 
     # Format the section with markdown code block
-    return f"{header}\n```\n{content}\n```\n\n", lines
+    return f"{header}\n```\n{content}\n```\n\n"
 
 
-def write_results(content: str, output: str) -> None:
+class MarkdownWriter:
     """
-    Write the given content to a file at the specified path.
-
-    Args:
-        content: The string content to write.
-        output: The path to the output file.
+    Section writer of the default Markdown package layout.
 
-    Returns:
-        None
+    Every format provides these methods (see `jsonl.JsonlWriter`), so
+    `write_package` doesn't depend on the layout.
     """
-    try:
-        # Open the file in write mode with UTF-8 encoding
-        with open(output, "w", encoding="utf-8") as f:
-            f.write(content)
 
-        # Log success message
-        logging.info("Results successfully written to %s", output)
+    def __init__(self, structure_options=None):
+        self.structure_options = structure_options
 
-    except Exception as e:
-        # Log error if writing fails
-        logging.error("Failed to write to %s: %s", output, e)
\ No newline at end of file
+    def write_header(self, out, absolute_path: str, git_info: dict[str, str] | None) -> None:
+        write_header(out, absolute_path, git_info)
+
+    def write_structure(self, out, absolute_path: str, entries: list[index.IndexEntry]) -> None:
+        write_structure(out, absolute_path, entries, self.structure_options)
+
+    def write_contents_intro(self, out, recent_only: bool, since: str | None = None) -> None:
+        write_contents_intro(out, recent_only, since)
+
+    def write_no_content(self, out) -> None:
+        write_no_content(out)
+
+    def render_file_section(self, record: sections.Section, recent_only: bool, max_file_size: int) -> str:
+        return render_file_section(record, recent_only, max_file_size)
+
+    def write_omitted(self, out, absolute_path: str, byte_budget: budget.Budget) -> None:
+        write_omitted(out, absolute_path, byte_budget)
+
+    def render_shard_header(self, absolute_path: str, number: int) -> str:
+        return render_shard_header(absolute_path, number)
+
+    def write_removed(self, out, changes: delta.Delta) -> None:
+        write_removed(out, changes)
+
+    def write_summary(self, out, recent_only: bool, file_count: int, line_count: int, deduper=None,
+                      byte_budget=None, token_budget=None, changes=None) -> None:
+        write_summary(out, recent_only, file_count, line_count, deduper, byte_budget, token_budget, changes)
+
+    def write_manifest(self, out, lines) -> None:
+        write_manifest(out, lines)
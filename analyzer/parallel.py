@@ -0,0 +1,193 @@
+import os
+import time
+import logging
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Iterable, Iterator
+
+from analyzer import dedupe, files
+
+# Number of files kept in flight per worker; bounds memory while keeping workers busy
+WINDOW_PER_JOB = 4
+
+
+def resolve_jobs(jobs: int | None) -> int:
+    """
+    Turn the `--jobs` value into a worker count.
+
+    Args:
+        jobs: Requested number of workers; 0 or None means one per CPU core.
+
+    Returns:
+        A worker count of at least 1.
+    """
+    if not jobs:
+        return os.cpu_count() or 1
+    return max(1, jobs)
+
+
+def ordered_map(executor: Executor, fn: Callable, items: Iterable, window: int) -> Iterator:
+    """
+    Map `fn` over `items` on an executor, yielding results in input order.
+
+    Unlike `Executor.map`, at most `window` tasks are submitted ahead of the consumer,
+    so a slow consumer never causes the whole input to be loaded at once.
+
+    Args:
+        executor: Executor the tasks are submitted to.
+        fn: Function applied to each item.
+        items: Input items.
+        window: Maximum number of outstanding tasks.
+
+    Returns:
+        An iterator over the results, in the same order as `items`.
+    """
+    pending = deque()
+    iterator = iter(items)
+
+    try:
+        # Prime the window
+        for item in iterator:
+            pending.append(executor.submit(fn, item))
+            if len(pending) >= window:
+                break
+
+        # Yield the oldest result and refill one slot at a time
+        while pending:
+            result = pending.popleft().result()
+            for item in iterator:
+                pending.append(executor.submit(fn, item))
+                break
+            yield result
+    finally:
+        # Drop queued work if the consumer stops early
+        for future in pending:
+            future.cancel()
+
+
+def analyze_files(file_paths: list[str], max_bytes: int, remove_comments: bool, jobs: int = 1,
+                  file_cache=None, profiler=None, digests: dict | None = None,
+                  markdown: bool = True, sizes: dict[str, int] | None = None,
+                  mtimes: dict[str, float] | None = None) -> Iterator[tuple[str | None, int]]:
+    """
+    Read and sanitize many files, yielding results in input order.
+
+    - With one job everything runs on the calling thread.
+    - Otherwise files are read on a thread pool so I/O waits overlap, and when
+      comments are being removed the CPU-bound transform is sent to a process
+      pool so it isn't serialized by the GIL.
+    - Files unchanged since a previous run are served from `file_cache`.
+
+    Args:
+        file_paths: Files to analyze.
+        max_bytes: Maximum number of bytes to read per file.
+        remove_comments: Whether to strip comments from the content.
+        jobs: Number of workers.
+        file_cache: Optional `cache.FileCache` consulted before reading.
+        profiler: Optional `profiling.Profiler` recording the time spent on each file.
+        digests: Optional dictionary filled with each file's deduplication key
+            (see `dedupe.content_key`) by the time its result is yielded.
+        markdown: Whether to prepare the content for Markdown (see `files.transform_content`).
+        sizes: Optional file sizes from a directory scan, keyed by path; with `mtimes`,
+            they build cache keys without another `os.stat` (see `cache.FileCache.make_key`).
+        mtimes: Optional modification times from the same scan.
+
+    Returns:
+        An iterator of (content, lines) tuples, identical to calling
+        `files.analyze_file_content` on each path in turn.
+    """
+    if jobs <= 1:
+        for file_path in file_paths:
+            yield analyze_one(
+                file_path, max_bytes, remove_comments, file_cache, profiler=profiler, digests=digests, markdown=markdown,
+                sizes=sizes, mtimes=mtimes
+            )
+        return
+
+    # Comment stripping is the only transform heavy enough to pay for process hand-off
+    use_processes = remove_comments and (os.cpu_count() or 1) > 1
+    processes = ProcessPoolExecutor(jobs) if use_processes else None
+    logging.info("Analyzing %d files with %d jobs (worker processes: %s)", len(file_paths), jobs, use_processes)
+
+    def load(file_path: str) -> tuple[str | None, int]:
+        return analyze_one(
+            file_path, max_bytes, remove_comments, file_cache, processes, profiler, digests, markdown, sizes, mtimes
+        )
+
+    try:
+        with ThreadPoolExecutor(jobs) as readers:
+            yield from ordered_map(readers, load, file_paths, jobs * WINDOW_PER_JOB)
+    finally:
+        if processes is not None:
+            processes.shutdown(cancel_futures=True)
+
+
+def analyze_one(file_path: str, max_bytes: int, remove_comments: bool, file_cache=None,
+                processes: Executor | None = None, profiler=None, digests: dict | None = None,
+                markdown: bool = True, sizes: dict[str, int] | None = None,
+                mtimes: dict[str, float] | None = None) -> tuple[str | None, int]:
+    """
+    Analyze a single file, going through the cache and an optional process pool.
+
+    Args:
+        file_path: Path to the file.
+        max_bytes: Maximum number of bytes to read.
+        remove_comments: Whether to strip comments from the content.
+        file_cache: Optional `cache.FileCache`; successful results are stored in it,
+            along with the deduplication key when `digests` is given.
+        processes: Optional executor the transform step is sent to.
+        profiler: Optional `profiling.Profiler`; the file's timing, bytes read and
+            truncation are recorded in it.
+        digests: Optional dictionary the file's deduplication key is stored in.
+        markdown: Whether to prepare the content for Markdown (see `files.transform_content`).
+        sizes: Optional file sizes from a directory scan, used for the cache key.
+        mtimes: Optional modification times from the same scan.
+
+    Returns:
+        A (content, lines) tuple, or an error message and 0 if the file couldn't be read.
+    """
+    start = time.perf_counter() if profiler is not None else 0.0
+    key = None
+    if file_cache is not None:
+        size = sizes.get(file_path) if sizes is not None else None
+        mtime = mtimes.get(file_path) if mtimes is not None else None
+        key = file_cache.make_key(file_path, max_bytes, remove_comments, markdown, size, mtime)
+    if key is not None:
+        cached = file_cache.get(key)
+        if cached is not None:
+            if digests is not None:
+                if len(cached) > 2:
+                    digests[file_path] = cached[2]
+                else:
+                    # Stored without its deduplication key: hash the file once and remember it
+                    digests[file_path] = dedupe.file_key(file_path, max_bytes, remove_comments)
+                    file_cache.put(key, (*cached, digests[file_path]))
+            if profiler is not None:
+                profiler.record_read(file_path, start, time.perf_counter(), 0, None, True)
+            return cached[:2]
+
+    raw = None
+    try:
+        raw = files.read_file_bytes(file_path, max_bytes)
+        if digests is not None:
+            digests[file_path] = dedupe.content_key(raw, file_path, remove_comments)
+        if processes is not None and not raw.binary:
+            result = processes.submit(
+                files.transform_content, raw, file_path, max_bytes, remove_comments, markdown
+            ).result()
+        else:
+            result = files.transform_content(raw, file_path, max_bytes, remove_comments, markdown)
+
+    except Exception as e:
+        logging.error("Failed to read %s: %s", file_path, e)
+        return f"Failed to read {file_path}: {e}", 0
+    finally:
+        if profiler is not None:
+            bytes_read = len(raw.data) if raw is not None and not raw.binary else 0
+            truncated = raw.truncated if raw is not None else None
+            profiler.record_read(file_path, start, time.perf_counter(), bytes_read, truncated, False)
+
+    # Only successful reads are cached, so failures are retried next run (binary files have no plain content)
+    if key is not None and result[0] is not None:
+        file_cache.put(key, (*result, digests[file_path]) if digests is not None else result)
+    return result
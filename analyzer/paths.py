@@ -1,9 +1,15 @@
 import os
 import sys
+import time
 import logging
 import argparse
 
-from analyzer import output
+# Every run needs these; modules used by a single flag (--batch, --watch, --outline,
+# --shard-size, --profile) are imported where the flag is handled
+from analyzer import history, index, output, structure
+
+# Characters that make a file argument a glob pattern
+GLOB_CHARS = "*?["
 
 
 def normalize_path(path: str) -> str:
@@ -59,12 +65,55 @@ def validate_paths(paths: list[str]) -> tuple[str | None, list[str]]:
     return (directories[0] if directories else None, filenames)
 
 
+def resolve_filenames(filenames: list[str], name_index: index.NameIndex, base_dir: str | None = None) -> list[str]:
+    """
+    Resolve file arguments to the files they refer to.
+
+    Each argument is, in order of preference:
+        - An existing file path (absolute, or relative to `base_dir`).
+        - A path relative to the searched directory, or a basename found anywhere below it.
+        - A glob pattern (`*.py`, `src/**/*.ts`), which may match several files.
+
+    Args:
+        filenames: File arguments from the command line.
+        name_index: Index of the searched directory.
+        base_dir: Directory relative paths are checked against; the current directory if None.
+
+    Returns:
+        Absolute paths of the selected files, without duplicates, in argument order.
+
+    Raises:
+        ValueError: If an argument matches no file, or a basename matches several files.
+    """
+    resolved = {}
+    for name in filenames:
+        path = name if base_dir is None else os.path.join(base_dir, name)
+        if os.path.isfile(path):
+            matches = [normalize_path(path)]
+        elif any(c in name for c in GLOB_CHARS):
+            matches = name_index.glob(name)
+        else:
+            matches = name_index.lookup(name)
+            if len(matches) > 1:
+                candidates = "\n  ".join(os.path.relpath(m, name_index.root) for m in matches)
+                raise ValueError(f"{name} is ambiguous; it matches:\n  {candidates}\nPass a relative path instead.")
+
+        if not matches:
+            raise ValueError(f"{name} not found.")
+        logging.info("Found %s: %s", name, ", ".join(matches))
+        for match in matches:
+            resolved.setdefault(match, None)
+
+    return list(resolved)
+
+
 def analyze_path_args(args: argparse.Namespace) -> None:
     """
     Entry point for path analysis logic.
 
     Determines whether to analyze a directory or a list of filenames based on user input.
-    Validates paths, logs progress, and delegates to `output.content_output`.
+    Validates paths, logs progress, and delegates to `output.content_output`
+    (or `watch.watch_package` in watch mode).
 
     Args:
         args: Parsed CLI arguments containing:
@@ -72,10 +121,71 @@ def analyze_path_args(args: argparse.Namespace) -> None:
             - recent: Whether to filter by recently modified files.
             - output: Path to write the results.
             - max_file_size: Maximum number of bytes to read per file.
+            - remove_comments: Whether to strip comments from code files.
+            - jobs: Number of parallel workers for reading files.
+            - no_cache: Whether to bypass the persistent file cache.
+            - tracked: Whether to list files from the git index only.
+            - exclude: Extra gitignore-style patterns to exclude.
+            - include: Glob patterns a file must match to be included.
+            - profile: None, or "" / a file path to profile the run (see `profiling.Profiler`).
+            - profile_top: Number of slowest files listed in the profile report.
+            - watch: Whether to keep the output file up to date (see `watch.watch_package`).
+            - poll_interval: Rescan interval for watch mode without inotify.
+            - dedupe: Whether to emit identical files only once.
+            - recent_days, recent_commits, recent_since: Git-history recency windows
+              (see `history.Recency`); any of them implies `recent`.
+            - batch, manifest, output_dir, batch_jobs: Batch mode options (see `analyze_batch`).
+            - format: "markdown", "jsonl", or None to choose from the output file name.
+            - compress: "gzip", "zstd", or None to choose from the output file name.
+            - structure_depth, structure_max_entries, structure_annotate: Structure
+              section limits (see `structure.StructureOptions`).
+            - max_total_bytes: Size limit of the whole package (see `budget.ByteBudget`).
+            - token_budget, priority: Estimated token limit of the package and patterns of
+              files to prefer within it (see `budget.TokenBudget`).
+            - since, since_package: Git ref or earlier package; only files changed since
+              then are packaged (see `delta`).
+            - diff: Whether to show modified files as unified diffs in a delta package.
+            - record_hashes: Whether to append the manifest read by a later `since_package`.
+            - shard_size: Size of each file of a sharded package (see `shards.parse_size`).
+            - outline: "large" or "all" to show files as outlines of their signatures (see `outline`).
 
     Returns:
         None. Exits the program with code 1 if validation fails or files are missing.
     """
+    # --compress adds the matching extension, which is what selects compression when writing
+    if args.watch and not args.output:
+        args.output = "context-package.md"
+    if args.compress and not args.output and not (args.batch and args.output_dir):
+        logging.warning("--compress only applies to output files; writing uncompressed output.")
+    args.output = output.compressed_name(args.output, args.compress)
+    if args.priority and not args.token_budget:
+        logging.warning("--priority only applies with --token-budget; ignoring it.")
+    if args.since and args.since_package:
+        logging.error("--since and --since-package can't be combined.")
+        sys.exit(1)
+    if args.diff and not (args.since or args.since_package):
+        logging.warning("--diff only applies with --since or --since-package; ignoring it.")
+    if args.outline is not None:
+        from analyzer import outline
+        if args.outline not in outline.MODES:
+            logging.error("Invalid outline mode %r; use one of: %s.", args.outline, ", ".join(outline.MODES))
+            sys.exit(1)
+    shard_size, shard_unit = None, "bytes"
+    if args.shard_size and not (args.batch or args.watch):
+        from analyzer import shards
+        try:
+            shard_size, shard_unit = shards.parse_size(args.shard_size)
+        except ValueError as e:
+            logging.error(str(e))
+            sys.exit(1)
+        if not args.output:
+            logging.error("--shard-size needs an output file (-o) to name the shards after.")
+            sys.exit(1)
+
+    if args.batch:
+        analyze_batch(args)
+        return
+
     try:
         # Separate input into either a directory or a list of filenames
         directory, filenames = validate_paths(args.paths)
@@ -84,37 +194,181 @@ def analyze_path_args(args: argparse.Namespace) -> None:
         logging.error(str(e))
         sys.exit(1)
 
+    profiler = None
+    if args.profile is not None:
+        from analyzer import profiling
+        profiler = profiling.Profiler()
+    structure_options = structure_options_from_args(args)
+    recency = history.Recency(args.recent_days, args.recent_commits, args.recent_since) or None
+    entries = None
+
     if directory:
         # Directory mode: analyze all files within the directory
         logging.info("Analyzing directory: %s", directory)
-        output.content_output(
-            directory,
-            args.recent,
-            None,
-            args.output,
-            args.max_file_size,
-            args.remove_comments
-        )
+        root, names = directory, None
 
     elif filenames:
         # File mode: search for filenames in the current working directory
         search_dir = os.getcwd()
         logging.info("Searching in directory: %s", search_dir)
 
-        # Confirm each filename exists somewhere in the directory tree
-        for name in filenames:
-            found = any(name in files for _, _, files in os.walk(search_dir))
-            if not found:
-                logging.error("%s not found.", name)
-                sys.exit(1)
-            logging.info("Found %s", name)
+        # Scan the tree once; the same index resolves every argument and feeds the package
+        entries = output.build_entries(search_dir, args.tracked, args.exclude, args.include)
+        try:
+            names = resolve_filenames(filenames, index.NameIndex(search_dir, entries))
+        except ValueError as e:
+            logging.error(str(e))
+            sys.exit(1)
 
         # Analyze the matched files
-        output.content_output(
-            search_dir,
+        root = search_dir
+
+    else:
+        return
+
+    if args.watch:
+        # Watch mode: keep the package file up to date until interrupted
+        if args.dedupe:
+            logging.warning("--dedupe is not supported with --watch; all copies are included.")
+        if args.token_budget:
+            logging.warning("--token-budget is not supported with --watch; use --max-total-bytes instead.")
+        if args.since or args.since_package or args.record_hashes:
+            logging.warning("Delta packages are not supported with --watch; the whole package is kept up to date.")
+        if args.shard_size:
+            logging.warning("--shard-size is not supported with --watch; writing a single file.")
+        if args.outline:
+            logging.warning("--outline is not supported with --watch; large files are truncated.")
+        from analyzer import watch
+        watch.watch_package(
+            root,
             args.recent,
-            filenames,
+            names,
             args.output,
             args.max_file_size,
-            args.remove_comments
-        )
\ No newline at end of file
+            args.remove_comments,
+            jobs=args.jobs,
+            use_cache=not args.no_cache,
+            tracked_only=args.tracked,
+            excludes=args.exclude,
+            includes=args.include,
+            poll_interval=args.poll_interval,
+            recency=recency,
+            output_format=args.format or output.format_for(args.output),
+            structure_options=structure_options,
+            max_total_bytes=args.max_total_bytes
+        )
+        return
+
+    output.content_output(
+        root,
+        args.recent,
+        names,
+        args.output,
+        args.max_file_size,
+        args.remove_comments,
+        jobs=args.jobs,
+        use_cache=not args.no_cache,
+        tracked_only=args.tracked,
+        excludes=args.exclude,
+        includes=args.include,
+        profiler=profiler,
+        entries=entries,
+        recency=recency,
+        deduplicate=args.dedupe,
+        output_format=args.format,
+        structure_options=structure_options,
+        max_total_bytes=args.max_total_bytes,
+        token_budget=args.token_budget,
+        priority=args.priority,
+        since=args.since,
+        since_package=args.since_package,
+        show_diffs=args.diff,
+        record_hashes=args.record_hashes,
+        shard_size=shard_size,
+        shard_unit=shard_unit,
+        outline=args.outline
+    )
+
+    if profiler is not None:
+        profiler.report(sys.stderr, args.profile_top)
+        if args.profile:
+            profiler.write(args.profile)
+
+
+def structure_options_from_args(args: argparse.Namespace) -> structure.StructureOptions | None:
+    """Collect the Structure section options, or None when none are set."""
+    options = structure.StructureOptions(args.structure_depth, args.structure_max_entries, args.structure_annotate)
+    return options if options != structure.StructureOptions() else None
+
+
+def analyze_batch(args: argparse.Namespace) -> None:
+    """
+    Package every repository given as a path or listed in `args.manifest` (see `batch.run_batch`).
+
+    Every path is a separate repository root. Packages go to one file per
+    repository in `args.output_dir`, or are combined into `args.output` (or stdout).
+    Per-repository timings and failures are reported on stderr.
+
+    Args:
+        args: Parsed CLI arguments (see `analyze_path_args`).
+
+    Returns:
+        None. Exits the program with code 1 if the manifest can't be read or any repository failed.
+    """
+    from analyzer import batch
+
+    roots = list(args.paths)
+    if args.manifest is not None:
+        try:
+            roots += batch.read_manifest(args.manifest)
+        except OSError as e:
+            logging.error("Could not read manifest %s: %s", args.manifest, e)
+            sys.exit(1)
+    if not roots:
+        logging.error("No repositories to package.")
+        sys.exit(1)
+
+    if args.watch:
+        logging.warning("--watch is not supported in batch mode; packaging once.")
+    if args.profile is not None:
+        logging.warning("--profile is not supported in batch mode; see the batch report instead.")
+    if args.since_package:
+        logging.warning("--since-package is not supported in batch mode; use --since instead.")
+    if args.shard_size:
+        logging.warning("--shard-size is not supported in batch mode; writing one file per repository.")
+
+    options = {
+        "contain_recent_files_only": args.recent,
+        "max_file_size": args.max_file_size,
+        "remove_comments": args.remove_comments,
+        "jobs": args.jobs,
+        "tracked_only": args.tracked,
+        "excludes": args.exclude,
+        "includes": args.include,
+        "recency": history.Recency(args.recent_days, args.recent_commits, args.recent_since) or None,
+        "deduplicate": args.dedupe,
+        "output_format": args.format or output.format_for(args.output),
+        "structure_options": structure_options_from_args(args),
+        "max_total_bytes": args.max_total_bytes,
+        "token_budget": args.token_budget,
+        "priority": args.priority,
+        "since": args.since,
+        "show_diffs": args.diff,
+        "record_hashes": args.record_hashes,
+        "outline": args.outline,
+    }
+
+    start = time.perf_counter()
+    results = batch.run_batch(
+        roots,
+        options,
+        output_dir=args.output_dir,
+        combined=args.output,
+        workers=args.batch_jobs,
+        use_cache=not args.no_cache,
+        compression=args.compress
+    )
+    batch.report(results, time.perf_counter() - start, sys.stderr)
+
+    if any(r.error is not None for r in results):
+        sys.exit(1)
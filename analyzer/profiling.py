@@ -0,0 +1,187 @@
+import os
+import sys
+import json
+import time
+import logging
+import threading
+import contextlib
+
+# Shared no-op context returned by `no_phase`, so disabled profiling allocates nothing
+_NULL_CONTEXT = contextlib.nullcontext()
+
+
+def no_phase(name: str):
+    """Stand-in for `Profiler.phase` when profiling is off."""
+    return _NULL_CONTEXT
+
+
+class Profiler:
+    """
+    Collects per-phase and per-file timings for one run.
+
+    Phases are the steps of `output.content_output` (git info, scan, structure,
+    file contents, ...). Files are recorded in two halves: reading/sanitizing,
+    which may happen on a worker thread, and rendering the section, which
+    happens on the writing thread. Both halves end up in the same record.
+    """
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.phases = []
+        self.files = {}
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def phase(self, name: str):
+        """
+        Time a block as a named phase.
+
+        Args:
+            name: Phase name shown in the report.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            self.phases.append({
+                "name": name,
+                "start": start - self.start,
+                "seconds": end - start,
+                "thread": threading.get_ident(),
+            })
+
+    def _file(self, file_path: str) -> dict:
+        with self._lock:
+            record = self.files.get(file_path)
+            if record is None:
+                record = self.files[file_path] = {
+                    "path": file_path, "start": None, "read_seconds": 0.0, "render_seconds": 0.0,
+                    "bytes_read": 0, "bytes_emitted": 0, "lines": 0, "truncated": None,
+                    "cached": False, "thread": None,
+                }
+            return record
+
+    def record_read(self, file_path: str, start: float, end: float, bytes_read: int,
+                    truncated: bool | None, cached: bool) -> None:
+        """
+        Record reading and sanitizing a file.
+
+        Args:
+            file_path: Path to the file.
+            start: `time.perf_counter()` value when the file was picked up.
+            end: `time.perf_counter()` value when its content was ready.
+            bytes_read: Bytes read from disk (0 when served from the cache).
+            truncated: Whether the file was cut at the size limit (None if unknown).
+            cached: Whether the content came from the persistent cache.
+        """
+        record = self._file(file_path)
+        record["start"] = start - self.start
+        record["read_seconds"] = end - start
+        record["bytes_read"] = bytes_read
+        record["truncated"] = truncated
+        record["cached"] = cached
+        record["thread"] = threading.get_ident()
+
+    def record_render(self, file_path: str, seconds: float, section: str, lines: int) -> None:
+        """
+        Record rendering a file's section.
+
+        Args:
+            file_path: Path to the file.
+            seconds: Time spent in `render_file_section`.
+            section: The rendered section.
+            lines: Line count reported for the file.
+        """
+        record = self._file(file_path)
+        record["render_seconds"] = seconds
+        record["bytes_emitted"] = len(section.encode("utf-8", "surrogateescape"))
+        record["lines"] = lines
+
+    def total_seconds(self) -> float:
+        """Wall time since the profiler was created."""
+        return time.perf_counter() - self.start
+
+    def slowest_files(self, top: int) -> list[dict]:
+        """Return the `top` files with the highest read + render time."""
+        return sorted(
+            self.files.values(), key=lambda r: r["read_seconds"] + r["render_seconds"], reverse=True
+        )[:top]
+
+    def report(self, stream=None, top: int = 10) -> None:
+        """
+        Write a human-readable summary: phase times and the slowest files.
+
+        Args:
+            stream: Text stream to write to (stderr by default).
+            top: Number of slowest files to list.
+        """
+        stream = stream or sys.stderr
+        total = self.total_seconds()
+        stream.write(f"\nProfile ({total:.3f}s total, {len(self.files)} files)\n")
+
+        stream.write(f"  {'phase':<16} {'seconds':>9} {'share':>7}\n")
+        for p in self.phases:
+            share = p["seconds"] / total * 100 if total else 0.0
+            stream.write(f"  {p['name']:<16} {p['seconds']:9.4f} {share:6.1f}%\n")
+
+        slowest = self.slowest_files(top)
+        if slowest:
+            stream.write(f"\n  Slowest {len(slowest)} files:\n")
+            stream.write(f"  {'read s':>8} {'render s':>9} {'read KB':>9} {'out KB':>8} {'lines':>7}  flags  path\n")
+            for r in slowest:
+                flags = ("T" if r["truncated"] else "-") + ("C" if r["cached"] else "-")
+                stream.write(
+                    f"  {r['read_seconds']:8.4f} {r['render_seconds']:9.4f} {r['bytes_read'] / 1024:9.1f} "
+                    f"{r['bytes_emitted'] / 1024:8.1f} {r['lines']:7d}  {flags:5}  {r['path']}\n"
+                )
+            stream.write("  (flags: T = truncated, C = served from cache)\n")
+        stream.flush()
+
+    def to_json(self) -> dict:
+        """Return the collected data as a JSON-serializable dictionary."""
+        return {
+            "total_seconds": self.total_seconds(),
+            "phases": [{k: v for k, v in p.items() if k != "thread"} for p in self.phases],
+            "files": [{k: v for k, v in r.items() if k != "thread"} for r in self.files.values()],
+        }
+
+    def to_chrome_trace(self) -> dict:
+        """
+        Return the collected data in the Chrome trace event format.
+
+        Load the file in chrome://tracing or https://ui.perfetto.dev; phases and
+        files appear as complete ("X") events on the thread that ran them.
+        """
+        pid = os.getpid()
+        events = []
+        for p in self.phases:
+            events.append({
+                "name": p["name"], "cat": "phase", "ph": "X", "pid": pid, "tid": p["thread"],
+                "ts": p["start"] * 1e6, "dur": p["seconds"] * 1e6,
+            })
+        for r in self.files.values():
+            if r["start"] is None:
+                continue
+            events.append({
+                "name": os.path.basename(r["path"]), "cat": "file", "ph": "X", "pid": pid, "tid": r["thread"],
+                "ts": r["start"] * 1e6, "dur": r["read_seconds"] * 1e6,
+                "args": {k: r[k] for k in ("path", "bytes_read", "bytes_emitted", "lines", "truncated", "cached")},
+            })
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def write(self, path: str) -> None:
+        """
+        Save the profile to a file.
+
+        Args:
+            path: Destination; a name ending in `.trace.json` gets the Chrome
+                trace format, anything else the plain JSON summary.
+        """
+        data = self.to_chrome_trace() if path.endswith(".trace.json") else self.to_json()
+        try:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(data, f, indent=1)
+            logging.info("Profile written to %s", path)
+        except OSError as e:
+            logging.error("Failed to write profile to %s: %s", path, e)
@@ -1,4 +1,251 @@
 import re
+from typing import NamedTuple
+
+
+class LexerSpec(NamedTuple):
+    """
+    Comment and string syntax of a language.
+
+    Attributes:
+        line: Tokens starting a comment that runs to the end of the line.
+        block: (open, close) pairs delimiting block comments.
+        strings: Regexes matching string/char literals, whose content is never treated as a comment.
+        docstrings: Whether triple-quoted strings starting a line are Python docstrings (removed).
+        hash_after_space: Whether `#` only starts a comment at line start or after whitespace
+            (shell, YAML), so `$#` or `a#b` are left alone.
+        regex_literals: Whether `/.../` can be a regex literal (JavaScript), kept like a string
+            when the `/` can't be a division (see `_starts_regex`).
+    """
+    line: tuple = ()
+    block: tuple = ()
+    strings: tuple = ()
+    docstrings: bool = False
+    hash_after_space: bool = False
+    regex_literals: bool = False
+
+
+# Reusable string literal patterns; each is linear (no nested quantifiers over the same text)
+# and starts with a literal character (see `_split_first`)
+_DQ = r'"(?:[^"\\\n]|\\[\s\S])*"'
+_SQ = r"'(?:[^'\\\n]|\\[\s\S])*'"
+_DQ_MULTILINE = r'"(?:[^"\\]|\\[\s\S])*"'
+_SQ_RAW = r"'[^']*'"
+_SQL_SQ = r"'(?:[^']|'')*'"
+_CHAR = r"'(?:[^'\\\n]|\\[^\n]{1,10})'"
+_BACKTICK = r"`(?:[^`\\]|\\[\s\S])*`"
+# Python string prefixes (r, b, f, ...) don't change where a string ends, so strings are
+# lexed from their quote; a docstring may still be written r"""...""" (see `strip_comments`)
+_PY_PREFIX_CHARS = "rRbBuUfF"
+_PY_TRIPLE = (
+    r'"""(?:[^"\\]|\\[\s\S]|"(?!""))*"""',
+    r"'''(?:[^'\\]|\\[\s\S]|'(?!''))*'''",
+)
+_RUST_RAW = r'r(?P<hashes>#*)"[\s\S]*?"(?P=hashes)'
+# A regex literal on one line, with character classes (which may hold `/`) and escapes
+_REGEX = r"/(?![/*])(?:[^/\\\n\[]|\\[^\n]|\[(?:[^\]\\\n]|\\[^\n])*\])+/"
+
+# Before a regex literal, as opposed to a division: the last character or keyword of the
+# code before it (or the start of a line)
+_REGEX_AFTER_CHARS = "\n(,=:[!&|?{};+-*%<>~^"
+_REGEX_AFTER_WORDS = frozenset((
+    "return", "typeof", "instanceof", "in", "of", "new", "delete", "void", "throw", "case", "do", "else",
+    "yield", "await",
+))
+
+_C_BLOCK = (("/*", "*/"),)
+
+LEXERS = {
+    "python": LexerSpec(line=("#",), strings=(*_PY_TRIPLE, _DQ, _SQ), docstrings=True),
+    "c": LexerSpec(line=("//",), block=_C_BLOCK, strings=(_DQ, _CHAR)),
+    "js": LexerSpec(line=("//",), block=_C_BLOCK, strings=(_DQ, _SQ, _BACKTICK), regex_literals=True),
+    "go": LexerSpec(line=("//",), block=_C_BLOCK, strings=(_DQ, _CHAR, r"`[^`]*`")),
+    "rust": LexerSpec(line=("//",), block=_C_BLOCK, strings=(_RUST_RAW, _DQ_MULTILINE, _CHAR)),
+    "php": LexerSpec(line=("//", "#"), block=_C_BLOCK, strings=(_DQ_MULTILINE, _SQ)),
+    "css": LexerSpec(block=_C_BLOCK, strings=(_DQ, _SQ)),
+    "scss": LexerSpec(line=("//",), block=_C_BLOCK, strings=(_DQ, _SQ)),
+    "shell": LexerSpec(line=("#",), strings=(_DQ_MULTILINE, _SQ_RAW), hash_after_space=True),
+    "yaml": LexerSpec(line=("#",), strings=(_DQ, r"'(?:[^'\n]|'')*'"), hash_after_space=True),
+    "hash": LexerSpec(line=("#",), strings=(_DQ, _SQ)),
+    "ini": LexerSpec(line=(";", "#")),
+    "sql": LexerSpec(line=("--",), block=_C_BLOCK, strings=(_SQL_SQ, r'"(?:[^"]|"")*"')),
+    "lua": LexerSpec(line=("--",), block=(("--[[", "]]"),), strings=(_DQ, _SQ, r"\[\[[\s\S]*?\]\]")),
+    "haskell": LexerSpec(line=("--",), block=(("{-", "-}"),), strings=(_DQ,)),
+    "erlang": LexerSpec(line=("%",), strings=(_DQ,)),
+    "lisp": LexerSpec(line=(";",), strings=(_DQ_MULTILINE,)),
+    "markup": LexerSpec(block=(("<!--", "-->"),)),
+}
+
+# File extension -> lexer name
+EXTENSIONS = {
+    ".py": "python", ".pyi": "python", ".pyw": "python",
+    ".c": "c", ".h": "c", ".cc": "c", ".cpp": "c", ".cxx": "c", ".hpp": "c", ".hh": "c",
+    ".java": "c", ".cs": "c", ".kt": "c", ".kts": "c", ".scala": "c", ".swift": "c",
+    ".dart": "c", ".m": "c", ".mm": "c", ".proto": "c", ".groovy": "c", ".gradle": "c",
+    ".js": "js", ".mjs": "js", ".cjs": "js", ".jsx": "js", ".ts": "js", ".tsx": "js", ".mts": "js", ".cts": "js",
+    ".go": "go",
+    ".rs": "rust",
+    ".php": "php",
+    ".css": "css",
+    ".scss": "scss", ".less": "scss",
+    ".sh": "shell", ".bash": "shell", ".zsh": "shell", ".ksh": "shell",
+    ".yaml": "yaml", ".yml": "yaml",
+    ".toml": "hash", ".rb": "hash", ".pl": "hash", ".pm": "hash", ".r": "hash",
+    ".ex": "hash", ".exs": "hash", ".cmake": "hash", ".mk": "hash",
+    ".ini": "ini", ".cfg": "ini",
+    ".sql": "sql",
+    ".lua": "lua",
+    ".hs": "haskell",
+    ".erl": "erlang", ".hrl": "erlang",
+    ".clj": "lisp", ".cljs": "lisp", ".lisp": "lisp", ".el": "lisp", ".scm": "lisp",
+    ".html": "markup", ".htm": "markup", ".xml": "markup", ".svg": "markup", ".xhtml": "markup",
+}
+
+_compiled = {}
+
+
+def _split_first(pattern: str) -> tuple[str, str]:
+    """Split a token pattern into its first (literal) character and the rest."""
+    first = 2 if pattern.startswith("\\") else 1
+    return pattern[:first], pattern[first:]
+
+
+def _compile(spec: LexerSpec) -> re.Pattern:
+    """
+    Build the single alternation regex that lexes a language in one pass.
+
+    The regex starts with the set of characters that can open a token, which
+    lets the regex engine skip plain code in a tight loop instead of trying
+    every alternative at every position. Each alternative then checks (with a
+    lookbehind) which character opened it.
+
+    Alternatives are tried in order: docstrings, string literals, regex
+    literals, then comments. Strings are matched (and kept) as whole tokens, so comment
+    markers inside them are never seen. Comments and docstrings also match the
+    whitespace and line ending after them; the whitespace before them is
+    handled by `strip_comments`.
+    """
+    firsts = []
+
+    def alternatives(patterns) -> str:
+        parts = []
+        for pattern in patterns:
+            first, rest = _split_first(pattern)
+            if first not in firsts:
+                firsts.append(first)
+            parts.append(f"(?<={first}){rest}")
+        return "|".join(parts)
+
+    groups = []
+    if spec.docstrings:
+        groups.append(r"(?P<doc>" + alternatives(_PY_TRIPLE) + r")(?P<doc_eol>[ \t]*(?:\n|\Z))?")
+    if spec.strings:
+        groups.append("(?P<str>" + alternatives(spec.strings) + ")")
+    if spec.regex_literals:
+        groups.append("(?P<regex>" + alternatives((_REGEX,)) + ")")
+
+    comments = [re.escape(o) + r"[\s\S]*?" + re.escape(c) for o, c in spec.block]
+    for token in spec.line:
+        # In shell and YAML, `#` only opens a comment after whitespace or at the start
+        prefix = r"(?<![^\s]#)" if spec.hash_after_space and token == "#" else ""
+        first, rest = _split_first(re.escape(token))
+        comments.append(first + prefix + rest + r"[^\n]*")
+    if comments:
+        groups.append(r"(?P<com>" + alternatives(comments) + r")(?P<com_eol>[ \t]*(?:\n|\Z))?")
+
+    return re.compile("[" + "".join(firsts) + "](?:" + "|".join(groups) + ")")
+
+
+def get_lexer(file_extension: str) -> re.Pattern | None:
+    """
+    Return the compiled lexer regex for a file extension, compiling it on first use.
+
+    Args:
+        file_extension: Extension including the dot, e.g. ".py".
+
+    Returns:
+        The compiled regex, or None if the language isn't supported.
+    """
+    name = EXTENSIONS.get(file_extension.lower())
+    if name is None:
+        return None
+    regex = _compiled.get(name)
+    if regex is None:
+        regex = _compiled[name] = _compile(LEXERS[name])
+    return regex
+
+
+def strip_comments(code: str, regex: re.Pattern) -> str:
+    """
+    Remove comments (and Python docstrings) from code in a single linear pass.
+
+    - Comment-only lines are removed entirely, including their line ending.
+    - Trailing comments are removed along with the whitespace before them.
+    - Comment markers inside string (and regex) literals are left untouched.
+
+    Args:
+        code: Source code.
+        regex: Lexer from `get_lexer`.
+
+    Returns:
+        The code without comments.
+    """
+    pieces = []
+    kept = 0  # Everything before this offset has been copied to `pieces` or dropped
+    search = regex.search
+    m = search(code)
+    while m is not None:
+        kind = m.lastgroup
+        start = m.start()
+        if kind == "str":
+            m = search(code, m.end())
+            continue
+        if kind == "regex":
+            # A division isn't a regex literal: lex again from just after its `/`
+            m = search(code, m.end() if _starts_regex(code, start) else start + 1)
+            continue
+
+        m_end = m.end()
+        before = code[kept:start]
+
+        if kind in ("doc", "doc_eol"):
+            # Only a triple-quoted string standing alone on its lines (after an
+            # optional prefix such as r""") is a docstring
+            head = before.rstrip(_PY_PREFIX_CHARS)
+            if len(before) - len(head) <= 2 and m.group("doc_eol") is not None:
+                head = head.rstrip(" \t")
+                if head.endswith("\n") or not head and (kept == 0 or code[kept - 1] == "\n"):
+                    pieces.append(head)
+                    kept = m_end
+            m = search(code, m_end)
+            continue
+
+        # Code before the comment, without the whitespace in between
+        head = before.rstrip(" \t")
+        pieces.append(head)
+        eol = m.group("com_eol")
+        if eol is not None and (head.endswith("\n") or not head and (kept == 0 or code[kept - 1] == "\n")):
+            pass  # Whole line was a comment: drop its line ending too
+        elif eol and eol.endswith("\n"):
+            pieces.append("\n")
+        kept = m_end
+        m = search(code, m_end)
+
+    pieces.append(code[kept:])
+    return "".join(pieces)
+
+
+def _starts_regex(code: str, start: int) -> bool:
+    """Whether the `/` at `start` opens a regex literal: it follows an operator, a keyword or nothing."""
+    i = start - 1
+    while i >= 0 and code[i] in " \t":
+        i -= 1
+    if i < 0 or code[i] in _REGEX_AFTER_CHARS:
+        return True
+    end = i + 1
+    while i >= 0 and (code[i].isalnum() or code[i] in "_$"):
+        i -= 1
+    return code[i + 1:end] in _REGEX_AFTER_WORDS
+
 
 def remove_comments_from_code(code: str, file_extension: str) -> str:
     """
@@ -8,87 +255,22 @@ def remove_comments_from_code(code: str, file_extension: str) -> str:
     Args:
         code: The code string from which to remove comments.
         file_extension: The file extension indicating the programming language.
-    
+
     Returns:
         Code with comments removed and empty lines collapsed.
     """
-    
-    if file_extension == '.py':
-        code = remove_hash_comments(code)
-    elif file_extension in ['.js', '.java', '.c', '.cpp']:
-        code = remove_slash_comments(code)
-    elif file_extension == '.html':
-        code = re.sub(r'<!--.*?-->', '', code, flags=re.DOTALL)
-    
-    # Remove blank lines
-    # code = re.sub(r'\n\s*\n+', '\n', code)
-    
+    regex = get_lexer(file_extension)
+    if regex is not None:
+        code = strip_comments(code, regex)
+
     return code.strip()
 
 
 def remove_hash_comments(code: str) -> str:
     """Remove Python comments (#) and docstrings while preserving code."""
-    lines = code.split('\n')
-    result = []
-    docstring = None
-    
-    for line in lines:
-        stripped = line.lstrip() # Remove leading whitespace for checks
-        
-        # Skip # comment-only lines
-        if stripped.startswith('#'):
-            continue
-        
-        # If already in docstring, look for the closing quotation mark
-        if docstring:
-            if docstring in line:
-                docstring = None
-            continue
-
-        # If line starts a docstring
-        if stripped.startswith('"""') or stripped.startswith("'''"):
-            quote = '"""' if stripped.startswith('"""') else "'''"
-            # Check if docstring closes on same line
-            if stripped.count(quote) >= 2:
-                continue  # Single-line docstring, skip it
-            else:
-                docstring = quote 
-                continue
-
-        result.append(line)
-
-    return '\n'.join(result)
+    return strip_comments(code, get_lexer(".py"))
 
 
 def remove_slash_comments(code: str) -> str:
-    """Remove C-style comment-only lines and multi-line comments."""
-    lines = code.split('\n')
-    result = []
-    docstring = None
-    
-    for line in lines:
-        stripped = line.lstrip()  # Remove leading whitespace for checks
-        
-        # Skip // comment-only lines
-        if stripped.startswith('//'):
-            continue
-
-        # If already in docstring, look for the closing quotation mark
-        if docstring:
-            if docstring in line:
-                docstring = None
-            continue
-
-        # If line starts a docstring
-        if stripped.startswith('/*'):
-            quote = '*/'
-            # Check if docstring closes on same line
-            if quote in line:
-                continue  # Single-line docstring, skip it
-            else:
-                docstring = quote 
-                continue
-        
-        result.append(line)
-    
-    return '\n'.join(result)
\ No newline at end of file
+    """Remove C-style line and block comments while preserving code."""
+    return strip_comments(code, get_lexer(".c"))
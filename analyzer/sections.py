@@ -0,0 +1,149 @@
+import os
+
+from analyzer import outline as outliner, parallel
+
+
+class Section:
+    """
+    One file of a package, as plain data rather than rendered text.
+
+    Writers (`output.MarkdownWriter`, `jsonl.JsonlWriter`) render sections; library
+    callers can use them directly (see `api.iter_package`). Slots keep each
+    record small when many of them are alive at once.
+
+    Attributes:
+        path: Path to the file, as selected.
+        rel_path: Path relative to the package root, `/`-separated.
+        size: File size in bytes (None if it couldn't be read).
+        mtime: Modification time from the index (None if unknown).
+        lines: Number of lines kept.
+        content: Plain text that was kept (no Markdown escaping), or None for binary files.
+        truncated: Whether the file is larger than the per-file byte limit.
+        binary: Whether the file was detected as binary.
+        duplicate_of: `rel_path` of an earlier file with the same content, when deduplicating.
+        status: "added" or "modified" in a delta package (see `delta.Delta`), else None.
+        diff: Unified diff of a modified file, shown instead of `content` when requested.
+        outline: Whether `content` is the file's outline (see `outline.outline_text`) rather than its text.
+    """
+
+    __slots__ = (
+        "path", "rel_path", "size", "mtime", "lines", "content", "truncated", "binary", "duplicate_of",
+        "status", "diff", "outline"
+    )
+
+    def __init__(self, path: str, rel_path: str, size: int | None, mtime: float | None, lines: int,
+                 content: str | None, truncated: bool = False, binary: bool = False,
+                 duplicate_of: str | None = None, status: str | None = None, diff: str | None = None,
+                 outline: bool = False):
+        self.path = path
+        self.rel_path = rel_path
+        self.size = size
+        self.mtime = mtime
+        self.lines = lines
+        self.content = content
+        self.truncated = truncated
+        self.binary = binary
+        self.duplicate_of = duplicate_of
+        self.status = status
+        self.diff = diff
+        self.outline = outline
+
+    def __repr__(self) -> str:
+        return f"Section({self.rel_path!r}, size={self.size}, lines={self.lines})"
+
+
+def iter_sections(absolute_path: str, file_paths: list[str], max_file_size: int = 16*1024,
+                  remove_comments: bool = False, sizes: dict[str, int] | None = None,
+                  mtimes: dict[str, float] | None = None, jobs: int = 1, file_cache=None, profiler=None,
+                  deduper=None, changes=None, outline: str | None = None, fresh_stats: bool = False):
+    """
+    Read every file into a `Section`, in order, as lazily as the readers allow.
+
+    With more than one job, files are read ahead in parallel (see `parallel.analyze_files`);
+    closing the generator early cancels the reads still queued.
+
+    Args:
+        absolute_path: Root directory of the package (paths are reported relative to it).
+        file_paths: Files to read.
+        max_file_size: Maximum number of bytes kept per file.
+        remove_comments: Whether to strip comments from the content.
+        sizes: File sizes from the index, keyed by absolute path; files missing from it are stat-ed.
+        mtimes: Modification times from the index, keyed by absolute path.
+        jobs: Number of workers (1 keeps everything on the calling thread).
+        file_cache: Optional `cache.FileCache` used to skip unchanged files.
+        profiler: Optional `profiling.Profiler` recording read time per file.
+        deduper: Optional `dedupe.Deduplicator`; repeated contents get a `duplicate_of` path.
+        changes: Optional `delta.Delta`; sections get its `status` and, when collected, `diff`.
+        outline: "large" to replace the content of files over `max_file_size` with their
+            outline, "all" to outline every file in a supported language, or None.
+        fresh_stats: Whether `sizes` and `mtimes` come from the file system (not the stat
+            data cached in the git index, which can be stale), so cache keys can be built
+            from them instead of another `os.stat`.
+
+    Yields:
+        One `Section` per file, in the same order as `file_paths`.
+    """
+    sizes = sizes or {}
+    mtimes = mtimes or {}
+    prefix = os.path.join(absolute_path, "")
+    digests = {} if deduper is not None else None
+    analyzed = parallel.analyze_files(
+        file_paths, max_file_size, remove_comments, jobs, file_cache, profiler, digests, markdown=False,
+        sizes=sizes if fresh_stats else None, mtimes=mtimes if fresh_stats else None
+    )
+    try:
+        for file_path, (content, lines) in zip(file_paths, analyzed):
+            abs_path = file_path if os.path.isabs(file_path) else os.path.abspath(file_path)
+            size = sizes.get(abs_path)
+            mtime = mtimes.get(abs_path)
+            if size is None:
+                try:
+                    st = os.stat(file_path)
+                    size, mtime = st.st_size, mtime if mtime is not None else st.st_mtime
+                except OSError:
+                    pass
+
+            duplicate_of = None
+            if deduper is not None:
+                original = deduper.original_of(file_path, digests.pop(file_path, None))
+                if original is not None:
+                    duplicate_of = deduper.label(original)
+
+            # Selected files are below the root, so their relative path is a slice
+            if abs_path.startswith(prefix):
+                rel_path = abs_path[len(prefix):]
+            else:
+                rel_path = os.path.relpath(abs_path, absolute_path)
+
+            rel_path = rel_path.replace(os.sep, "/")
+            binary = content is None
+            truncated = not binary and size is not None and size > max_file_size
+
+            diff = changes.patch(rel_path, content) if changes is not None else None
+
+            is_outline = False
+            if (outline and not binary and (truncated or outline == "all") and duplicate_of is None
+                    and diff is None and outliner.supports(file_path)):
+                # A truncated file is read again in full, up to a limit; the outline is cached by content
+                outlined = outliner.outline_file(
+                    file_path, None if truncated else content, file_cache, max_file_size * outliner.MAX_READ_FACTOR
+                )
+                if outlined is not None:
+                    (content, lines), is_outline = outlined, True
+
+            yield Section(
+                file_path,
+                rel_path,
+                size,
+                mtime,
+                lines,
+                content,
+                truncated=truncated,
+                binary=binary,
+                duplicate_of=duplicate_of,
+                status=changes.status.get(rel_path) if changes is not None else None,
+                diff=diff,
+                outline=is_outline,
+            )
+    finally:
+        analyzed.close()
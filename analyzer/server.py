@@ -0,0 +1,591 @@
+import io
+import os
+import json
+import stat
+import socket
+import logging
+import threading
+import socketserver
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from analyzer import cache, delta, git, gitindex, history, index, outline, output, parallel, paths, structure, watch
+
+# Address used by a bare --serve
+DEFAULT_ADDRESS = "127.0.0.1:8765"
+
+# Repositories kept warm at once; each holds an index and an inotify instance
+MAX_WARM_REPOS = 8
+
+# Largest request body accepted, in bytes
+MAX_REQUEST_BYTES = 1024 * 1024
+
+# Host headers always accepted on TCP; anything else (e.g. a rebound DNS name) is refused
+LOOPBACK_HOSTS = ("localhost", "127.0.0.1", "::1")
+
+# Request options: name -> (type, default). Names match the CLI flags.
+REQUEST_OPTIONS = {
+    "path": (str, None),
+    "files": (list, []),
+    "recent": (bool, False),
+    "recent_days": (int, None),
+    "recent_commits": (int, None),
+    "recent_since": (str, None),
+    "max_file_size": (int, 16 * 1024),
+    "remove_comments": (bool, False),
+    "format": (str, "markdown"),
+    "tracked": (bool, False),
+    "exclude": (list, []),
+    "include": (list, []),
+    "dedupe": (bool, False),
+    "jobs": (int, 1),
+    "structure_depth": (int, None),
+    "structure_max_entries": (int, None),
+    "structure_annotate": (bool, False),
+    "max_total_bytes": (int, None),
+    "token_budget": (int, None),
+    "priority": (list, []),
+    "since": (str, None),
+    "diff": (bool, False),
+    "record_hashes": (bool, False),
+    "outline": (str, None),
+}
+
+CONTENT_TYPES = {"markdown": "text/markdown; charset=utf-8", "jsonl": "application/x-ndjson; charset=utf-8"}
+
+
+class MemoryCache:
+    """
+    In-memory LRU of analyzed file content, shared by every request and repository.
+
+    Holds the same values as `cache.FileCache` ((content, lines), optionally followed by
+    a deduplication key), and evicts the least recently used entries once their
+    content exceeds `max_bytes`.
+    Safe to share between request threads.
+    """
+
+    def __init__(self, max_bytes: int = cache.DEFAULT_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.used = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple) -> tuple | None:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: tuple, value: tuple) -> None:
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.used -= len(previous[0])
+            self._entries[key] = value
+            self.used += len(value[0])
+            while self.used > self.max_bytes and self._entries:
+                _, evicted = self._entries.popitem(last=False)
+                self.used -= len(evicted[0])
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries), "bytes": self.used, "max_bytes": self.max_bytes,
+                "hits": self.hits, "misses": self.misses,
+            }
+
+
+class CacheView:
+    """
+    A `MemoryCache` seen through the interface of `cache.FileCache` (see `parallel.analyze_one`).
+
+    Keys use the sizes and mtimes of a warm index instead of a fresh `os.stat`,
+    so a fully cached request doesn't touch the file system at all.
+    """
+
+    def __init__(self, memory: MemoryCache, sizes: dict[str, int], mtimes: dict[str, float]):
+        self.memory = memory
+        self.sizes = sizes
+        self.mtimes = mtimes
+
+    def make_key(self, file_path: str, max_bytes: int, remove_comments: bool, markdown: bool = True,
+                 size: int | None = None, mtime: float | None = None) -> tuple | None:
+        abs_path = os.path.abspath(file_path)
+        if mtime is None:
+            mtime = self.mtimes.get(abs_path)
+            if mtime is None:
+                return None
+            size = self.sizes.get(abs_path)
+        return abs_path, size, mtime, max_bytes, remove_comments, markdown
+
+    def get(self, key: tuple) -> tuple | None:
+        return self.memory.get(key)
+
+    def put(self, key: tuple, value: tuple) -> None:
+        self.memory.put(key, value)
+
+    def close(self) -> None:
+        pass
+
+
+class WarmRepo:
+    """
+    Index and Git metadata of one repository, kept up to date between requests.
+
+    - File changes are picked up through inotify (see `watch.InotifyWatcher`):
+      content edits only refresh the size and mtime of the edited files, while
+      added, removed or renamed entries (or `.gitignore` edits) trigger a rescan.
+    - Without inotify, the tree is rescanned on every request.
+    - Git metadata is re-read only when `HEAD`, its reflog, `packed-refs` or
+      (for tracked-only listings) the git index have a new mtime.
+    """
+
+    def __init__(self, absolute_path: str, tracked_only: bool, excludes: tuple, includes: tuple):
+        self.absolute_path = absolute_path
+        self.tracked_only = tracked_only
+        self.excludes = excludes
+        self.includes = includes
+        self.entries = None
+        self.positions = {}
+        self.lock = threading.Lock()
+
+        located = gitindex.find_git_dir(absolute_path)
+        self.git_dir = located[1] if located is not None else None
+        self._git_stamp = None
+        self._git_info = None
+        self._index_stamp = None
+
+        try:
+            self.watcher = watch.InotifyWatcher()
+        except (OSError, AttributeError, TypeError) as e:
+            logging.info("inotify unavailable (%s); rescanning %s on every request", e, absolute_path)
+            self.watcher = None
+
+    def snapshot(self) -> tuple[list[index.IndexEntry], dict[str, str]]:
+        """
+        Bring the repository up to date and return its current state.
+
+        Returns:
+            A tuple containing:
+                - The index (never modified in place, so it's safe to use without the lock).
+                - The Git metadata, or an empty dictionary outside a git repository
+                  (so `output.write_package` doesn't look for it again).
+        """
+        with self.lock:
+            self._refresh_index()
+            return self.entries, self._refresh_git_info()
+
+    def _refresh_index(self) -> None:
+        index_stamp = self._stamp("index") if self.tracked_only else None
+        if self.entries is None or self.watcher is None or index_stamp != self._index_stamp:
+            self._index_stamp = index_stamp
+            self._rescan()
+            return
+
+        changes = self.watcher.wait(0)
+        if not changes:
+            return
+        if any(changes.values()) or any(os.path.basename(p) == ".gitignore" for p in changes):
+            self._rescan()
+            return
+
+        # Content edits: only the stat data of the edited files changes
+        entries = list(self.entries)
+        for path in changes:
+            position = self.positions.get(path)
+            if position is None:
+                continue
+            try:
+                st = os.stat(path)
+            except OSError:
+                self._rescan()
+                return
+            entries[position] = entries[position]._replace(size=st.st_size, mtime=st.st_mtime)
+        self.entries = entries
+        logging.info("Refreshed %d changed file(s) in %s", len(changes), self.absolute_path)
+
+    def _rescan(self) -> None:
+        # Start watching before scanning so edits made during the scan aren't lost
+        if self.watcher is not None and self.entries is None:
+            self._sync_watches([self.absolute_path])
+        entries = output.build_entries(self.absolute_path, self.tracked_only, self.excludes, self.includes)
+        self.entries = entries
+        self.positions = {e.path: i for i, e in enumerate(entries) if not e.is_dir}
+        if self.watcher is not None:
+            self._sync_watches(e.path for e in entries if e.is_dir)
+        logging.info("Indexed %s: %d entries", self.absolute_path, len(entries))
+
+    def _sync_watches(self, directories) -> None:
+        try:
+            self.watcher.sync(directories)
+        except OSError as e:
+            logging.warning("Could not watch %s (%s); rescanning on every request.", self.absolute_path, e)
+            self.watcher.close()
+            self.watcher = None
+
+    def _stamp(self, *names: str) -> tuple | None:
+        if self.git_dir is None:
+            return None
+        stamp = []
+        for name in names:
+            try:
+                stamp.append(os.stat(os.path.join(self.git_dir, name)).st_mtime_ns)
+            except OSError:
+                stamp.append(None)
+        return tuple(stamp)
+
+    def _refresh_git_info(self) -> dict[str, str]:
+        if self.git_dir is None:
+            return {}
+        stamp = self._stamp("HEAD", os.path.join("logs", "HEAD"), "packed-refs")
+        if stamp != self._git_stamp:
+            self._git_stamp = stamp
+            self._git_info = git.pull_git_info(self.absolute_path) or {}
+        return self._git_info
+
+    def close(self) -> None:
+        with self.lock:
+            if self.watcher is not None:
+                self.watcher.close()
+                self.watcher = None
+
+
+class PackageService:
+    """
+    Answers package requests from warm state: an LRU of `WarmRepo` indexes and a
+    `MemoryCache` of file content shared by all of them.
+    """
+
+    def __init__(self, cache_bytes: int = cache.DEFAULT_CACHE_MAX_BYTES, max_repos: int = MAX_WARM_REPOS):
+        self.memory = MemoryCache(cache_bytes)
+        self.max_repos = max_repos
+        self.repos = OrderedDict()
+        self._lock = threading.Lock()
+
+    def repo(self, absolute_path: str, tracked_only: bool, excludes, includes) -> WarmRepo:
+        """Return the warm state of a repository and listing options, creating it if needed."""
+        key = (absolute_path, tracked_only, tuple(excludes), tuple(includes))
+        with self._lock:
+            repo = self.repos.get(key)
+            if repo is not None:
+                self.repos.move_to_end(key)
+                return repo
+            repo = self.repos[key] = WarmRepo(absolute_path, tracked_only, tuple(excludes), tuple(includes))
+            while len(self.repos) > self.max_repos:
+                _, evicted = self.repos.popitem(last=False)
+                evicted.close()
+            return repo
+
+    def package(self, out, options: dict) -> tuple[int, int]:
+        """
+        Write the package described by validated request options (see `parse_request`).
+
+        Returns:
+            The number of files and lines included.
+
+        Raises:
+            ValueError: If a requested file doesn't exist, is ambiguous or is outside `path`.
+        """
+        root = options["path"]
+        repo = self.repo(root, options["tracked"], options["exclude"], options["include"])
+        entries, git_info = repo.snapshot()
+
+        names = None
+        if options["files"]:
+            # Don't look outside the root at all, not even to report a missing file
+            outside = [f for f in options["files"] if os.path.isabs(f) and not is_within(f, root)]
+            if outside:
+                raise ValueError(f"{outside[0]} is outside {root}")
+            names = paths.resolve_filenames(options["files"], index.NameIndex(root, entries), root)
+            outside = [n for n in names if not is_within(n, root)]
+            if outside:
+                raise ValueError(f"{outside[0]} is outside {root}")
+
+        file_cache = CacheView(self.memory, index.size_lookup(entries), index.mtime_lookup(entries))
+        recency = history.Recency(options["recent_days"], options["recent_commits"], options["recent_since"]) or None
+        recent_paths = output.select_recent(root, recency) if recency else None
+        structure_options = structure.StructureOptions(
+            options["structure_depth"], options["structure_max_entries"], options["structure_annotate"]
+        )
+        return output.write_package(
+            out,
+            root,
+            options["recent"],
+            names,
+            options["max_file_size"],
+            options["remove_comments"],
+            options["jobs"],
+            file_cache,
+            options["tracked"],
+            options["exclude"],
+            options["include"],
+            entries=entries,
+            recency=recency,
+            deduplicate=options["dedupe"],
+            output_format=options["format"],
+            structure_options=structure_options if structure_options != structure.StructureOptions() else None,
+            max_total_bytes=options["max_total_bytes"],
+            token_budget=options["token_budget"],
+            priority=options["priority"],
+            git_info=git_info,
+            since=options["since"],
+            show_diffs=options["diff"],
+            record_hashes=options["record_hashes"],
+            outline=options["outline"],
+            recent_paths=recent_paths
+        )
+
+    def status(self) -> dict:
+        """Describe the warm repositories and the content cache."""
+        with self._lock:
+            repos = [
+                {"path": r.absolute_path, "entries": len(r.entries or ()), "watching": r.watcher is not None}
+                for r in self.repos.values()
+            ]
+        return {"repositories": repos, "cache": self.memory.stats()}
+
+    def close(self) -> None:
+        with self._lock:
+            for repo in self.repos.values():
+                repo.close()
+            self.repos.clear()
+
+
+def parse_request(body: bytes, root: str = "/") -> dict:
+    """
+    Validate a JSON package request and fill in defaults.
+
+    Args:
+        body: Request body: a JSON object with `path` and any of `REQUEST_OPTIONS`.
+        root: Directory requests are confined to; `path` must be inside it.
+
+    Returns:
+        The options, with `path` made absolute and `jobs` capped at the number of CPU cores.
+
+    Raises:
+        ValueError: If the body isn't a JSON object, an option is unknown or has
+            the wrong type, `path` isn't a directory inside `root`, or a ref could
+            be read as a git option.
+    """
+    try:
+        request = json.loads(body or b"{}")
+    except json.JSONDecodeError as e:
+        raise ValueError(f"invalid JSON: {e}") from None
+    if not isinstance(request, dict):
+        raise ValueError("the request must be a JSON object")
+
+    unknown = sorted(set(request) - set(REQUEST_OPTIONS))
+    if unknown:
+        raise ValueError(f"unknown option(s): {', '.join(unknown)}")
+
+    options = {}
+    for name, (kind, default) in REQUEST_OPTIONS.items():
+        value = request.get(name, default)
+        # bool is a subclass of int, so check it explicitly
+        if value is not None and (not isinstance(value, kind) or (kind is int and isinstance(value, bool))):
+            raise ValueError(f"{name} must be of type {kind.__name__}")
+        if kind is list and not all(isinstance(v, str) for v in value):
+            raise ValueError(f"{name} must be a list of strings")
+        options[name] = value
+
+    if not options["path"]:
+        raise ValueError("path is required")
+    options["path"] = paths.normalize_path(options["path"])
+    if not os.path.isdir(options["path"]):
+        raise ValueError(f"{options['path']} is not a directory")
+    if not is_within(options["path"], root):
+        raise ValueError(f"{options['path']} is outside the served root {root}")
+    for name in ("since", "recent_since"):
+        if options[name] is not None:
+            git.check_ref(options[name])
+    if options["jobs"] < 0:
+        raise ValueError("jobs must be 0 (one per CPU core) or more")
+    options["jobs"] = min(parallel.resolve_jobs(options["jobs"]), os.cpu_count() or 1)
+    if options["format"] not in output.FORMATS:
+        raise ValueError(f"format must be one of {', '.join(output.FORMATS)}")
+    if options["outline"] is not None and options["outline"] not in outline.MODES:
+        raise ValueError(f"outline must be one of {', '.join(outline.MODES)}")
+    return options
+
+
+def is_within(path: str, root: str) -> bool:
+    """Whether `path` is `root` or inside it, once symbolic links are resolved."""
+    path, root = os.path.realpath(path), os.path.realpath(root)
+    return os.path.commonpath([path, root]) == root
+
+
+def host_name(header: str | None) -> str | None:
+    """The name part of a Host header, without the port (`[::1]:8765` -> `::1`)."""
+    if not header:
+        return None
+    header = header.strip().lower()
+    if header.startswith("["):
+        return header[1:].partition("]")[0]
+    return header.rpartition(":")[0] if ":" in header else header
+
+
+class RequestHandler(BaseHTTPRequestHandler):
+    """
+    HTTP front end of a `PackageService`:
+
+    - `POST /package` with a JSON body (see `parse_request`) streams the package back.
+    - `GET /status` returns the warm repositories and cache statistics as JSON.
+
+    On TCP, requests whose Host header isn't a loopback name or the bound host are
+    refused, so a web page can't reach the server by rebinding its DNS name.
+    """
+
+    server_version = "scan-repo"
+    # Buffer the socket so the package goes out in large writes
+    wbufsize = output.WRITE_BUFFER_BYTES
+
+    def check_host(self) -> bool:
+        """Refuse the request (and return False) unless its Host header is allowed."""
+        allowed = self.server.allowed_hosts
+        if allowed is None or host_name(self.headers.get("Host")) in allowed:
+            return True
+        self.send_error(403, explain="unexpected Host header")
+        return False
+
+    def do_GET(self) -> None:
+        if not self.check_host():
+            return
+        if self.path.rstrip("/") != "/status":
+            self.send_error(404)
+            return
+        body = json.dumps(self.server.service.status()).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self) -> None:
+        if not self.check_host():
+            return
+        if self.path.rstrip("/") != "/package":
+            self.send_error(404)
+            return
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_REQUEST_BYTES:
+            self.send_error(413)
+            return
+        try:
+            options = parse_request(self.rfile.read(length), self.server.root)
+        except ValueError as e:
+            self.send_error(400, explain=str(e))
+            return
+
+        # The package is streamed, so its end is marked by closing the connection
+        self.close_connection = True
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPES[options["format"]])
+        self.end_headers()
+        out = io.TextIOWrapper(self.wfile, encoding="utf-8", errors="surrogateescape")
+        try:
+            self.server.service.package(out, options)
+        except (ValueError, delta.DeltaError, history.HistoryError) as e:
+            # Unknown file arguments are only found once the index is warm, unknown refs by git
+            out.write(f"\nERROR: {e}\n")
+            logging.warning("Request for %s failed: %s", options["path"], e)
+        except Exception:
+            logging.exception("Request for %s failed", options["path"])
+        finally:
+            out.flush()
+            out.detach()
+
+    def address_string(self) -> str:
+        # Unix socket peers have no address
+        return self.client_address[0] if self.client_address else "local"
+
+    def log_message(self, format, *args) -> None:
+        logging.info("%s %s", self.address_string(), format % args)
+
+
+class ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """HTTP over a Unix socket, one thread per connection."""
+
+    daemon_threads = True
+
+
+class ThreadingHTTPServerV6(ThreadingHTTPServer):
+    """`ThreadingHTTPServer` on an IPv6 address."""
+
+    address_family = socket.AF_INET6
+
+
+def make_server(address: str, service: PackageService, root: str = "/"):
+    """
+    Bind an HTTP server for `service`.
+
+    Args:
+        address: `HOST:PORT` (or `:PORT` for localhost) for TCP, or the path of a Unix socket
+            (anything containing a `/`).
+        service: The service answering requests.
+        root: Directory requests are confined to (see `parse_request`).
+
+    Returns:
+        A threading server, not yet serving.
+    """
+    if "/" in address:
+        # Replace a socket left behind by a previous server, but never a regular file
+        if os.path.exists(address) and stat.S_ISSOCK(os.stat(address).st_mode):
+            os.unlink(address)
+        server = ThreadingUnixHTTPServer(address, RequestHandler)
+        # Browsers can't reach a Unix socket, so any Host header is fine
+        server.allowed_hosts = None
+    else:
+        host, _, port = address.rpartition(":")
+        host = host.strip("[]") or "127.0.0.1"
+        if host not in ("127.0.0.1", "::1", "localhost"):
+            logging.warning("Serving on %s: anyone who can reach it can read any file this user can.", host)
+        server_class = ThreadingHTTPServerV6 if ":" in host else ThreadingHTTPServer
+        server = server_class((host, int(port)), RequestHandler)
+        server.allowed_hosts = {*LOOPBACK_HOSTS, host.lower()}
+    server.service = service
+    server.root = root
+    return server
+
+
+def serve(address: str = DEFAULT_ADDRESS, cache_bytes: int = cache.DEFAULT_CACHE_MAX_BYTES,
+          root: str | None = None) -> None:
+    """
+    Run the package server until interrupted.
+
+    Every request is answered from warm state: the index, Git metadata and file
+    content of recently used repositories stay in memory, so repeated requests
+    skip interpreter startup, the tree walk and the file reads.
+
+    Args:
+        address: Where to listen (see `make_server`).
+        cache_bytes: Size limit of the in-memory file content cache.
+        root: Directory requests are confined to (default: the current directory).
+    """
+    root = paths.normalize_path(root or os.getcwd())
+    if not os.path.isdir(root):
+        logging.error("Cannot serve %s: not a directory.", root)
+        raise SystemExit(1)
+
+    service = PackageService(cache_bytes)
+    try:
+        server = make_server(address, service, root)
+    except (OSError, ValueError) as e:
+        logging.error("Could not listen on %s: %s", address, e)
+        raise SystemExit(1)
+
+    logging.warning("Serving packages of %s on %s (POST /package, GET /status); press Ctrl+C to stop.", root, address)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+        if "/" in address and os.path.exists(address):
+            os.unlink(address)
@@ -0,0 +1,180 @@
+import os
+import re
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from analyzer import budget, output
+
+# "--shard-size" values: a number of bytes (optionally in KB/MB/GB) or of estimated tokens
+SIZE_PATTERN = re.compile(r"^\s*(\d+)\s*(b|k|kb|m|mb|g|gb|t|tokens?)?\s*$", re.IGNORECASE)
+SIZE_MULTIPLIERS = {"": 1, "b": 1, "k": 1024, "kb": 1024, "m": 1024 ** 2, "mb": 1024 ** 2, "g": 1024 ** 3,
+                    "gb": 1024 ** 3}
+
+# Shard numbers are zero-padded so the files sort in package order
+SHARD_NUMBER_DIGITS = 3
+
+
+def parse_size(text: str) -> tuple[int, str]:
+    """
+    Parse a shard size such as `4MB`, `500000` (bytes) or `32000t` (estimated tokens).
+
+    Args:
+        text: The `--shard-size` value.
+
+    Returns:
+        A tuple containing:
+            - The limit of each shard.
+            - Its unit, "bytes" or "tokens".
+
+    Raises:
+        ValueError: If the value isn't a positive size.
+    """
+    match = SIZE_PATTERN.match(str(text))
+    if not match or int(match.group(1)) <= 0:
+        raise ValueError(f"invalid shard size {text!r}; use bytes (e.g. 4MB) or tokens (e.g. 32000t)")
+    number, suffix = int(match.group(1)), (match.group(2) or "").lower()
+    if suffix.startswith("t"):
+        return number, "tokens"
+    return number * SIZE_MULTIPLIERS[suffix], "bytes"
+
+
+def shard_path(path: str, number: int) -> str:
+    """Name of a shard: the shard number goes before the extensions (`context.002.md.gz`)."""
+    root, compression_ext = os.path.splitext(path)
+    if output.compression_for(path) is None:
+        root, compression_ext = path, ""
+    stem, ext = os.path.splitext(root)
+    return f"{stem}.{number:0{SHARD_NUMBER_DIGITS}d}{ext}{compression_ext}"
+
+
+def index_path(path: str) -> str:
+    """Name of the index listing the shards of a package (`context.index.json`)."""
+    root = os.path.splitext(path)[0] if output.compression_for(path) is not None else path
+    return f"{os.path.splitext(root)[0]}.index.json"
+
+
+class Shard:
+    """One output file of a sharded package, buffered until it's full."""
+
+    def __init__(self, path: str, limit: budget.Budget):
+        self.path = path
+        self.budget = limit
+        self.files = []
+        self.pieces = []
+
+
+class ShardedOutput:
+    """
+    Text stream splitting a package across numbered files of bounded size.
+
+    It's written like any output stream; `write_package` calls `begin_file`
+    before each file section, and the section starts a new shard when it doesn't
+    fit in the current one, so a file is never split across shards. A file
+    larger than a whole shard gets a shard of its own. The header and Structure
+    open the first shard and the Summary closes the last one.
+
+    Each shard is kept in memory until it's full, then written (and compressed)
+    on a background thread while the next one fills up. At most `workers` shards
+    are waiting to be written, which bounds memory use. Closing the stream writes
+    an index (see `index_path`) listing the files of every shard.
+
+    Attributes:
+        preamble: Optional callable returning the text that opens shard `number` (2 and later).
+    """
+
+    def __init__(self, path: str, limit: int, unit: str = "bytes", workers: int = 2):
+        self.path = path
+        self.limit = limit
+        self.unit = unit
+        self.preamble = None
+        self.shards = []
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="shard-writer")
+        self._workers = workers
+        self._pending = []
+        self._new_shard()
+
+    def _new_shard(self) -> Shard:
+        limit = budget.TokenBudget(self.limit) if self.unit == "tokens" else budget.ByteBudget(self.limit)
+        shard = Shard(shard_path(self.path, len(self.shards) + 1), limit)
+        self.shards.append(shard)
+        return shard
+
+    @property
+    def count(self) -> int:
+        """Number of shards started so far."""
+        return len(self.shards)
+
+    def write(self, text: str) -> int:
+        shard = self.shards[-1]
+        shard.budget.used += shard.budget.cost(text)
+        shard.pieces.append(text)
+        return len(text)
+
+    def flush(self) -> None:
+        """Shards are written whole, once they're full."""
+
+    def begin_file(self, section: str, rel_path: str) -> None:
+        """
+        Make room for a file section about to be written, starting a new shard if needed.
+
+        Args:
+            section: The rendered section.
+            rel_path: Path of the file relative to the root, listed in the index.
+        """
+        shard = self.shards[-1]
+        # The first shard holds the header, so it may be full before its first file
+        if not shard.budget.fits(section) and (shard.files or len(self.shards) == 1):
+            self._submit(shard)
+            shard = self._new_shard()
+            if self.preamble is not None:
+                self.write(self.preamble(len(self.shards)))
+            if not shard.budget.fits(section):
+                logging.warning("%s is larger than the shard size; it gets a shard of its own.", rel_path)
+        shard.files.append(rel_path)
+
+    def _submit(self, shard: Shard) -> None:
+        # Wait for the oldest shard first, so only `workers` full shards are held in memory
+        while len(self._pending) >= self._workers:
+            self._pending.pop(0).result()
+        pieces, shard.pieces = shard.pieces, None
+        self._pending.append(self._executor.submit(write_shard, shard.path, pieces))
+
+    def close(self) -> None:
+        """Write the last shard, wait for all of them, then write the index."""
+        try:
+            self._submit(self.shards[-1])
+            for future in self._pending:
+                future.result()
+        finally:
+            self._executor.shutdown(wait=True)
+
+        index = {
+            "shard_size": self.limit,
+            "unit": self.unit,
+            "files": sum(len(s.files) for s in self.shards),
+            "shards": [
+                {"path": os.path.basename(s.path), "size": s.budget.used, "files": s.files} for s in self.shards
+            ],
+        }
+        with open(index_path(self.path), "w", encoding="utf-8") as f:
+            json.dump(index, f, ensure_ascii=False, indent=2)
+            f.write("\n")
+        logging.info("Wrote %d shard(s) of %s; index in %s", len(self.shards), self.path, index_path(self.path))
+
+    def __enter__(self) -> "ShardedOutput":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            # Let the shards already submitted finish, but don't describe an incomplete package
+            self._executor.shutdown(wait=True)
+
+
+def write_shard(path: str, pieces: list[str]) -> None:
+    """Write one shard to disk (compressed according to its name, see `output.open_file`)."""
+    with output.open_file(path) as f:
+        for piece in pieces:
+            f.write(piece)
@@ -1,41 +1,175 @@
 import os
 import logging
+from typing import NamedTuple
 
-def analyze_structure(absolute_path: str) -> str:
+from analyzer import index
+
+
+class StructureOptions(NamedTuple):
+    """
+    Limits and annotations of the Structure section.
+
+    Attributes:
+        max_depth: Directories at this depth are collapsed (None for no limit; the root is depth 0).
+        max_entries: Directories (other than the root) with more direct entries than this
+            are collapsed (None for no limit).
+        annotate: Whether to append file counts and total sizes to directory lines.
+    """
+    max_depth: int | None = None
+    max_entries: int | None = None
+    annotate: bool = False
+
+
+def analyze_structure(absolute_path: str, entries: list[index.IndexEntry] | None = None,
+                      options: StructureOptions | None = None) -> str:
     """
     Generate a formatted string representing the directory structure rooted at `absolute_path`.
 
     - Traverses all subdirectories and files recursively.
-    - Skips `.git` directories.
+    - Skips `.git` directories and anything excluded by `.gitignore` or exclude patterns.
     - Uses indentation to reflect folder depth.
     - Appends a trailing slash for directories.
 
     Args:
         absolute_path: The root directory to analyze.
+        entries: Optional pre-built index from `index.build_index`; scanned if omitted.
+        options: Optional depth/size limits and annotations (see `iter_structure`).
 
     Returns:
         A string showing the nested layout of directories and files.
     """
 
-    output = []
+    # Reuse the shared index when available instead of walking the tree again
+    if entries is None:
+        entries = index.build_index(absolute_path)
 
-    # Walkthrough the directory tree
-    for dirpath, dirnames, filenames in os.walk(absolute_path):
-        # Skip .git directories
-        if ".git" in dirnames:
-            dirnames.remove(".git")
+    logging.debug("Building structure from %d index entries", len(entries))
 
-        # Calculate indentation based on directory depth
-        depth = dirpath.replace(absolute_path, "").count(os.sep)
-        indent = "  " * depth
+    # Join all lines into a single string
+    return "\n".join(iter_structure(absolute_path, entries, options))
 
-        # Get the current directory name (or root if empty)
-        dirname = os.path.basename(dirpath) or absolute_path
-        output.append(f"{indent}{dirname}/")
 
-        # Append each file in the current directory with indentation
-        for filename in filenames:
-            output.append(f"{indent}  {filename}")
+def iter_structure(absolute_path: str, entries: list[index.IndexEntry], options: StructureOptions | None = None):
+    """
+    Yield the lines of the structure listing one at a time.
+
+    With `options`, directories beyond the depth limit or with too many entries
+    are collapsed into a single `… (k files, X MB)` line, and directory lines can
+    be annotated with the totals of everything below them. Totals come from the
+    sizes already in the index, so no file is read or stat-ed again.
 
-    # Join all lines into a single string
-    return "\n".join(output)
\ No newline at end of file
+    Args:
+        absolute_path: The root directory being analyzed.
+        entries: Index from `index.build_index`.
+        options: Optional `StructureOptions`.
+
+    Yields:
+        One line per directory (with a trailing slash) or file, indented by depth.
+    """
+    if options is None or options == StructureOptions():
+        # Plain listing: no totals needed
+        for entry in entries:
+            yield _entry_line(absolute_path, entry)
+        return
+
+    files, sizes, children, ends = subtree_totals(entries)
+    max_depth = options.max_depth
+    max_entries = options.max_entries
+
+    i = 0
+    while i < len(entries):
+        entry = entries[i]
+        line = _entry_line(absolute_path, entry)
+        if not entry.is_dir:
+            yield line
+            i += 1
+            continue
+
+        collapsed = children[i] > 0 and (
+            (max_depth is not None and entry.depth >= max_depth)
+            or (max_entries is not None and entry.depth > 0 and children[i] > max_entries)
+        )
+        if collapsed:
+            # Summarize the whole subtree and skip past it
+            yield line
+            yield f"{'  ' * (entry.depth + 1)}… ({_totals(files[i], sizes[i])})"
+            i = ends[i]
+            continue
+
+        yield f"{line} ({_totals(files[i], sizes[i])})" if options.annotate else line
+        i += 1
+
+
+def subtree_totals(entries: list[index.IndexEntry]) -> tuple[list[int], list[int], list[int], list[int]]:
+    """
+    Aggregate the index per directory in a single pass.
+
+    Relies on the walk order of the index: every directory is followed by its
+    whole subtree, and children are one level deeper than their parent.
+
+    Args:
+        entries: Index from `index.build_index`.
+
+    Returns:
+        Four lists indexed like `entries` (only meaningful for directories):
+            - Number of files below the directory.
+            - Total size of those files in bytes.
+            - Number of direct children (files and directories).
+            - Index of the first entry after the directory's subtree.
+    """
+    count = len(entries)
+    files = [0] * count
+    sizes = [0] * count
+    children = [0] * count
+    ends = [count] * count
+    stack = []
+
+    def close(j: int, end: int) -> None:
+        # Fold a finished directory into its parent
+        ends[j] = end
+        if stack:
+            parent = stack[-1]
+            files[parent] += files[j]
+            sizes[parent] += sizes[j]
+
+    for i, entry in enumerate(entries):
+        while stack and entries[stack[-1]].depth >= entry.depth:
+            close(stack.pop(), i)
+        if stack:
+            children[stack[-1]] += 1
+        if entry.is_dir:
+            stack.append(i)
+        elif stack:
+            files[stack[-1]] += 1
+            sizes[stack[-1]] += entry.size
+
+    while stack:
+        close(stack.pop(), count)
+    return files, sizes, children, ends
+
+
+def format_size(size: int) -> str:
+    """Format a byte count for humans: `512 B`, `3.4 KB`, `12.0 MB`."""
+    if size < 1024:
+        return f"{size} B"
+    value = size / 1024
+    for unit in ("KB", "MB", "GB"):
+        if value < 1024 or unit == "GB":
+            break
+        value /= 1024
+    return f"{value:.1f} {unit}"
+
+
+def _totals(file_count: int, size: int) -> str:
+    return f"{file_count} file{'' if file_count == 1 else 's'}, {format_size(size)}"
+
+
+def _entry_line(absolute_path: str, entry: index.IndexEntry) -> str:
+    # Indentation comes straight from the depth recorded during the scan
+    indent = "  " * entry.depth
+
+    if entry.is_dir:
+        # Get the current directory name (or root if empty)
+        dirname = os.path.basename(entry.path) or absolute_path
+        return f"{indent}{dirname}/"
+    return f"{indent}{os.path.basename(entry.path)}"
@@ -0,0 +1 @@
+VERSION_NUM = "0.2.1"
@@ -0,0 +1,518 @@
+import os
+import re
+import time
+import errno
+import select
+import struct
+import logging
+
+from analyzer import budget, cache, files, git, output
+
+# How long the tree must stay quiet before re-rendering, so a burst of events from one save is handled once
+DEBOUNCE_SECONDS = 0.03
+
+# Interval between rescans when inotify isn't available
+DEFAULT_POLL_INTERVAL = 0.5
+
+# inotify event masks (see <sys/inotify.h>)
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+_WATCH_MASK = (
+    IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO
+    | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR
+)
+
+# Events that add, remove or rename entries and so change the structure
+_STRUCTURAL = IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF | IN_Q_OVERFLOW
+
+# struct inotify_event header: wd, mask, cookie, len
+_EVENT_HEAD = struct.Struct("iIII")
+
+
+class InotifyWatcher:
+    """
+    Reports changes below a set of directories through Linux inotify (via ctypes).
+
+    One watch is added per directory of the index; directories created later are
+    added on the next `sync`, and watches of deleted directories go away on their own.
+    """
+
+    def __init__(self):
+        # Imported lazily: ctypes is only needed when watching
+        import ctypes
+        import ctypes.util
+
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = (ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32)
+        self._get_errno = ctypes.get_errno
+
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, f"inotify_init1 failed: {os.strerror(err)}")
+        self.watched = {}
+        self._wd_paths = {}
+
+    def sync(self, directories) -> None:
+        """
+        Watch every directory in `directories` that isn't watched yet.
+
+        Args:
+            directories: Absolute directory paths.
+
+        Raises:
+            OSError: If the kernel refuses a watch (e.g. `max_user_watches` reached).
+        """
+        for path in directories:
+            if path in self.watched:
+                continue
+            wd = self._add_watch(self.fd, os.fsencode(path), _WATCH_MASK)
+            if wd < 0:
+                err = self._get_errno()
+                if err in (errno.ENOENT, errno.ENOTDIR):
+                    continue  # Removed since the scan; the next rescan catches up
+                raise OSError(err, f"inotify_add_watch failed for {path}: {os.strerror(err)}")
+            self.watched[path] = wd
+            self._wd_paths[wd] = path
+
+    def wait(self, timeout: float | None = None) -> dict[str, bool] | None:
+        """
+        Block until something changes, then collect events until the tree is quiet.
+
+        Args:
+            timeout: Maximum seconds to wait for the first event; None waits forever.
+
+        Returns:
+            None on timeout, otherwise a dictionary mapping each affected absolute
+            path to whether it was created, deleted or renamed (True) or only
+            modified (False). Lost events are reported under the path "".
+        """
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return None
+
+        changes = {}
+        while True:
+            for path, mask in self._read_events():
+                if mask & (IN_IGNORED | IN_MOVE_SELF):
+                    # The directory is gone or has moved; `sync` re-adds it under its new path
+                    wd = self.watched.pop(path, None)
+                    if wd is not None:
+                        self._wd_paths.pop(wd, None)
+                if mask & IN_IGNORED:
+                    continue
+                changes[path] = changes.get(path, False) or bool(mask & _STRUCTURAL)
+
+            # Keep collecting while events are still arriving
+            ready, _, _ = select.select([self.fd], [], [], DEBOUNCE_SECONDS)
+            if not ready:
+                return changes
+
+    def _read_events(self):
+        """Yield (absolute_path, mask) for every queued event."""
+        try:
+            data = os.read(self.fd, 1 << 16)
+        except BlockingIOError:
+            return
+
+        offset = 0
+        while offset + _EVENT_HEAD.size <= len(data):
+            wd, mask, _, length = _EVENT_HEAD.unpack_from(data, offset)
+            offset += _EVENT_HEAD.size
+            name = data[offset:offset + length].rstrip(b"\0")
+            offset += length
+
+            if mask & IN_Q_OVERFLOW:
+                yield "", mask
+                continue
+            directory = self._wd_paths.get(wd)
+            if directory is None:
+                continue
+            if mask & IN_IGNORED:
+                yield directory, mask
+                continue
+            yield (os.path.join(directory, os.fsdecode(name)) if name else directory), mask
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+class PollingWatcher:
+    """
+    Fallback for systems without inotify: asks for a rescan every `interval` seconds.
+
+    The rescan only stats the tree (see `PackageState.rebuild`), and files are
+    re-read only when their size or mtime changed.
+    """
+
+    def __init__(self, interval: float = DEFAULT_POLL_INTERVAL):
+        self.interval = interval
+
+    def sync(self, directories) -> None:
+        pass
+
+    def wait(self, timeout: float | None = None) -> dict[str, bool]:
+        time.sleep(self.interval)
+        return {"": True}
+
+    def close(self) -> None:
+        pass
+
+
+def make_watcher(poll_interval: float = DEFAULT_POLL_INTERVAL):
+    """
+    Create the best available watcher: inotify on Linux, polling elsewhere.
+
+    Args:
+        poll_interval: Rescan interval used by the polling fallback.
+
+    Returns:
+        An `InotifyWatcher` or `PollingWatcher`.
+    """
+    try:
+        return InotifyWatcher()
+    except (OSError, AttributeError, TypeError) as e:
+        logging.info("inotify unavailable (%s); polling every %.2fs", e, poll_interval)
+        return PollingWatcher(poll_interval)
+
+
+def _literal_pattern(rel_path: str) -> str:
+    """Turn a relative path into an anchored gitignore pattern matching only that path."""
+    return "/" + re.sub(r"([*?\[\\!# ])", r"\\\1", rel_path.replace(os.sep, "/"))
+
+
+class PackageState:
+    """
+    In-memory copy of a package: the index, the selected files and their rendered sections.
+
+    `rebuild` rescans the tree and re-renders only files whose size or mtime
+    changed; `refresh` handles plain content edits without rescanning. Totals
+    for the Summary are kept up to date as sections are replaced.
+    """
+
+    def __init__(self, absolute_path, recent, filenames, max_file_size, remove_comments,
+                 jobs, file_cache, tracked_only, excludes, includes, recency=None, writer=None,
+                 max_total_bytes=None):
+        self.absolute_path = absolute_path
+        self.recent = recent
+        self.filenames = filenames
+        self.max_file_size = max_file_size
+        self.remove_comments = remove_comments
+        self.jobs = jobs
+        self.file_cache = file_cache
+        self.tracked_only = tracked_only
+        self.excludes = list(excludes)
+        self.includes = includes
+        self.recency = recency
+        self.writer = writer or output.MarkdownWriter()
+        self.max_total_bytes = max_total_bytes
+
+        self.entries = []
+        self.known = {}
+        self.file_paths = []
+        self.sections = {}
+        self.stamps = {}
+        self.line_count = 0
+
+        # Checked once, so a missing repository isn't reported on every update
+        self.is_git_repo = git.pull_git_info(absolute_path) is not None
+
+    def exclude(self, path: str, suffix_glob: str = "") -> None:
+        """
+        Keep a file (like the output file itself) out of the package if it lies inside the root.
+
+        Args:
+            path: File path, matched literally.
+            suffix_glob: Optional glob appended to the literal path.
+        """
+        rel_path = os.path.relpath(os.path.abspath(path), self.absolute_path)
+        if not rel_path.startswith(os.pardir):
+            self.excludes.append(_literal_pattern(rel_path) + suffix_glob)
+
+    def directories(self) -> list[str]:
+        """Absolute paths of every directory in the index."""
+        return [e.path for e in self.entries if e.is_dir]
+
+    def rebuild(self) -> bool:
+        """
+        Rescan the tree and bring the sections up to date.
+
+        Returns:
+            True if the package content changed.
+        """
+        entries = output.build_entries(self.absolute_path, self.tracked_only, self.excludes, self.includes)
+        known = {e.path: (e.size, e.mtime) for e in entries if not e.is_dir}
+        recent_paths = output.select_recent(self.absolute_path, self.recency) if self.recency else None
+        file_paths = files.get_file_paths(
+            self.absolute_path, self.filenames, self.recent, entries, recent_paths,
+            self.recency.days if self.recency and self.recency.days is not None else 7
+        )
+
+        # Sizes count too: the Structure can annotate directories with their total size
+        structure_changed = [e[:2] + e[3:] for e in entries] != [e[:2] + e[3:] for e in self.entries]
+        selection_changed = file_paths != self.file_paths
+        self.entries, self.known = entries, known
+
+        # Drop sections of files that are no longer selected
+        selected = set(file_paths)
+        for file_path in [p for p in self.sections if p not in selected]:
+            self._drop(file_path)
+
+        stale = [p for p in file_paths if p not in self.sections or self._stamp(p) != self.stamps.get(p)]
+        self.file_paths = file_paths
+        self._render(stale)
+        return structure_changed or selection_changed or bool(stale)
+
+    def refresh(self, changed_paths: set[str]) -> bool | None:
+        """
+        Re-render selected files that were modified in place.
+
+        Args:
+            changed_paths: Absolute paths reported by the watcher.
+
+        Returns:
+            True if the package changed, False if not, or None if a rescan is
+            needed instead (a `.gitignore` was edited, or a known but unselected
+            file changed, e.g. became recent).
+        """
+        # Ignore rules may now select different files
+        if any(os.path.basename(p) == ".gitignore" for p in changed_paths):
+            return None
+
+        by_abspath = {os.path.abspath(p): p for p in self.file_paths}
+        stale = []
+        for path in changed_paths:
+            file_path = by_abspath.get(path)
+            if file_path is None:
+                if path in self.known and self.recent:
+                    return None
+                continue
+            if self._stamp(file_path) != self.stamps.get(file_path):
+                stale.append(file_path)
+
+        resized = self._update_entries(changed_paths)
+        self._render(stale)
+        return bool(stale) or resized
+
+    def _update_entries(self, changed_paths: set[str]) -> bool:
+        """
+        Bring the index entries of modified files up to date, so the Structure shows current sizes.
+
+        Returns:
+            True if any size changed.
+        """
+        updated = {}
+        resized = False
+        for path in changed_paths:
+            if path not in self.known:
+                continue
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue  # Removed; the watcher reports that as structural
+            if (st.st_size, st.st_mtime) != self.known[path]:
+                resized = resized or st.st_size != self.known[path][0]
+                self.known[path] = (st.st_size, st.st_mtime)
+                updated[path] = self.known[path]
+        if updated:
+            for i, entry in enumerate(self.entries):
+                stamp = updated.get(entry.path)
+                if stamp is not None:
+                    self.entries[i] = entry._replace(size=stamp[0], mtime=stamp[1])
+        return resized
+
+    def _stamp(self, file_path: str) -> tuple[int, int] | None:
+        try:
+            st = os.stat(file_path)
+        except OSError:
+            return None
+        return st.st_size, st.st_mtime_ns
+
+    def _drop(self, file_path: str) -> None:
+        _, lines = self.sections.pop(file_path)
+        self.stamps.pop(file_path, None)
+        self.line_count -= lines
+
+    def _render(self, file_paths: list[str]) -> None:
+        """Read and render `file_paths`, replacing their previous sections."""
+        if not file_paths:
+            return
+        sizes = {}
+        mtimes = {}
+        for file_path in file_paths:
+            stamp = self._stamp(file_path)
+            self.stamps[file_path] = stamp
+            if stamp is not None:
+                sizes[os.path.abspath(file_path)] = stamp[0]
+                mtimes[os.path.abspath(file_path)] = stamp[1] / 1e9
+
+        sections = output.iter_file_sections(
+            self.absolute_path, file_paths, self.recent, self.max_file_size, self.remove_comments, sizes, mtimes,
+            self.jobs, self.file_cache, writer=self.writer, fresh_stats=True
+        )
+        for file_path, (section, lines) in zip(file_paths, sections):
+            previous = self.sections.get(file_path)
+            if previous is not None:
+                self.line_count -= previous[1]
+            self.sections[file_path] = (section, lines)
+            self.line_count += lines
+        logging.info("Re-rendered %d file(s)", len(file_paths))
+
+    def write(self, out) -> None:
+        """Write the whole package from memory, in the same layout as `output.write_package`."""
+        git_info = git.pull_git_info(self.absolute_path) if self.is_git_repo else None
+        byte_budget = budget.ByteBudget(self.max_total_bytes) if self.max_total_bytes else None
+        if byte_budget is not None:
+            out = byte_budget.wrap(out)
+
+        self.writer.write_header(out, self.absolute_path, git_info)
+        self.writer.write_structure(out, self.absolute_path, self.entries)
+        self.writer.write_contents_intro(out, self.recent)
+        file_count, line_count = len(self.file_paths), self.line_count
+        if not self.file_paths:
+            self.writer.write_no_content(out)
+        elif byte_budget is None:
+            for file_path in self.file_paths:
+                out.write(self.sections[file_path][0])
+        else:
+            # Sections are already in memory; the budget only decides how many are written
+            line_count = 0
+            for i, file_path in enumerate(self.file_paths):
+                section, lines = self.sections[file_path]
+                if not byte_budget.fits(section):
+                    byte_budget.omitted = self.file_paths[i:]
+                    break
+                out.write(section)
+                line_count += lines
+            file_count -= len(byte_budget.omitted)
+
+        if byte_budget is not None and byte_budget.omitted:
+            self.writer.write_omitted(out, self.absolute_path, byte_budget)
+        self.writer.write_summary(out, self.recent, file_count, line_count, None, byte_budget)
+
+
+def write_atomic(state: PackageState, path: str) -> None:
+    """
+    Write the package to a temporary file next to `path`, then rename it into place.
+
+    Readers of `path` always see either the previous or the new package, never a partial one.
+    The temporary file is compressed the same way as `path` (see `output.open_file`).
+    """
+    directory, name = os.path.split(os.path.abspath(path))
+    tmp_path = os.path.join(directory, f".{name}.{os.getpid()}.tmp")
+    try:
+        with output.open_file(tmp_path, output.compression_for(path)) as f:
+            state.write(f)
+        os.replace(tmp_path, path)
+    except OSError:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def watch_package(absolute_path, contain_recent_files_only, filenames=None, output_path="context-package.md",
+                  max_file_size=16*1024, remove_comments=False, jobs=1, use_cache=True, tracked_only=False,
+                  excludes=(), includes=(), poll_interval=DEFAULT_POLL_INTERVAL, recency=None,
+                  output_format="markdown", structure_options=None, max_total_bytes=None) -> None:
+    """
+    Write the package, then keep it up to date until interrupted (Ctrl+C).
+
+    - Changes are picked up through inotify where available, otherwise by
+      polling the tree's sizes and mtimes every `poll_interval` seconds.
+    - Only changed, added or removed files are re-read; Structure and Summary
+      are regenerated from the in-memory index and running totals.
+    - The output file is replaced atomically on every update.
+
+    Args:
+        absolute_path: Root directory being analyzed.
+        contain_recent_files_only: Whether to include only recently modified files.
+        filenames: Optional list of specific files to include.
+        output_path: File the package is written to.
+        max_file_size: Maximum number of bytes to read per file.
+        remove_comments: Whether to strip comments from code files.
+        jobs: Number of parallel workers for reading files.
+        use_cache: Whether to use the persistent file cache for the initial render.
+        tracked_only: List files from the git index instead of walking the directory.
+        excludes: Extra gitignore-style patterns to exclude.
+        includes: Glob patterns a file must match to be included (all files if empty).
+        poll_interval: Rescan interval when inotify isn't available.
+        recency: Optional `history.Recency`; implies recent-only mode, judged from git history.
+        output_format: "markdown" or "jsonl" (see `output.make_writer`).
+        structure_options: Optional `structure.StructureOptions` for the Structure section.
+        max_total_bytes: Optional size limit of the package (see `budget.ByteBudget`).
+
+    Returns:
+        None
+    """
+    file_cache = cache.open_cache(absolute_path) if use_cache else None
+    state = PackageState(
+        absolute_path, contain_recent_files_only or bool(recency), filenames, max_file_size, remove_comments,
+        jobs, file_cache, tracked_only, excludes, includes, recency,
+        output.make_writer(output_format, absolute_path, structure_options), max_total_bytes
+    )
+
+    # The package must not include itself (or its temporary files)
+    output_abspath = os.path.abspath(output_path)
+    state.exclude(output_abspath)
+    tmp_prefix = os.path.join(os.path.dirname(output_abspath), f".{os.path.basename(output_abspath)}.")
+    state.exclude(tmp_prefix, "*.tmp")
+
+    watcher = make_watcher(poll_interval)
+    try:
+        state.rebuild()
+        write_atomic(state, output_path)
+        logging.warning("Wrote %s; watching %s for changes (Ctrl+C to stop)", output_path, absolute_path)
+
+        rescanned = True
+        while True:
+            # New directories only appear after a rescan
+            if rescanned:
+                try:
+                    watcher.sync(state.directories())
+                except OSError as e:
+                    logging.warning("%s; falling back to polling", e)
+                    watcher.close()
+                    watcher = PollingWatcher(poll_interval)
+
+            changes = watcher.wait()
+            if not changes:
+                continue
+
+            # Ignore our own writes
+            for path in [p for p in changes if p == output_abspath or p.startswith(tmp_prefix)]:
+                del changes[path]
+            if not changes:
+                continue
+
+            start = time.perf_counter()
+            rescanned = any(changes.values())
+            changed = None if rescanned else state.refresh(set(changes))
+            if changed is None:
+                rescanned = True
+                changed = state.rebuild()
+            if changed:
+                write_atomic(state, output_path)
+                logging.info("Updated %s in %.1f ms", output_path, (time.perf_counter() - start) * 1000)
+
+    except KeyboardInterrupt:
+        logging.warning("Stopped watching %s", absolute_path)
+    finally:
+        watcher.close()
+        if file_cache is not None:
+            file_cache.close()
@@ -0,0 +1,264 @@
+"""
+Per-stage benchmark of the scan-repo pipeline on a synthetic repository.
+
+Generates (or reuses) a deterministic tree with `synthrepo.py`, then measures
+each stage on it:
+
+    structure     structure.analyze_structure (includes its own scan)
+    list_files    files.list_all_files
+    read          files.analyze_file_content on every listed file
+    strip         removelines.remove_comments_from_code on every text file (pre-read)
+    end_to_end    output.content_output to a file, cache disabled
+
+For every stage it records the best wall time over `--repeat` runs, read/write
+syscalls and bytes from /proc/self/io (Linux only), and peak Python memory from
+tracemalloc (in a separate run, so tracing doesn't skew the timings). The page
+cache is warm: the tree is read once before timing starts.
+
+Usage:
+    python benchmarks/bench_pipeline.py [--files N] [--depth D] [--file-size BYTES]
+        [--binary-ratio R] [--languages MIX] [--seed S] [--workdir DIR]
+        [--stages a,b] [--repeat N] [--jobs N] [--remove-comments] [--no-memory]
+        [--json FILE] [--compare BASELINE.json] [--threshold RATIO]
+
+With --compare, stages slower than the baseline by more than --threshold
+(default 1.10, i.e. 10%) are reported and the exit status is 1.
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+import synthrepo  # noqa: E402
+from analyzer import files, git, output, removelines, structure  # noqa: E402
+from analyzer.cli import DEFAULT_MAX_FILE_BYTES  # noqa: E402
+
+STAGES = ("structure", "list_files", "read", "strip", "end_to_end")
+
+# Fields of /proc/self/io reported per stage
+IO_FIELDS = ("syscr", "syscw", "rchar", "wchar")
+
+
+def read_proc_io() -> dict[str, int] | None:
+    """Return the I/O counters of this process, or None where /proc isn't available."""
+    try:
+        with open("/proc/self/io", "r", encoding="ascii") as f:
+            pairs = (line.split(":") for line in f)
+            return {k: int(v) for k, v in pairs if k in IO_FIELDS}
+    except OSError:
+        return None
+
+
+class Context:
+    """State shared by the stage functions: the tree, its file list and options."""
+
+    def __init__(self, root: str, jobs: int, remove_comments: bool, scratch: str):
+        self.root = root
+        self.jobs = jobs
+        self.remove_comments = remove_comments
+        self.output_path = os.path.join(scratch, "package.md")
+        self.file_paths = [e.path for e in files.list_all_files(root)]
+        self.texts = []
+        for path in self.file_paths:
+            raw = files.read_file_bytes(path, 1 << 30)
+            if not raw.binary:
+                self.texts.append((raw.data.decode("utf-8", "replace"), os.path.splitext(path)[1]))
+
+
+def stage_structure(ctx: Context) -> int:
+    return structure.analyze_structure(ctx.root).count("\n") + 1
+
+
+def stage_list_files(ctx: Context) -> int:
+    return len(files.list_all_files(ctx.root))
+
+
+def stage_read(ctx: Context) -> int:
+    for path in ctx.file_paths:
+        files.analyze_file_content(path, DEFAULT_MAX_FILE_BYTES, ctx.remove_comments)
+    return len(ctx.file_paths)
+
+
+def stage_strip(ctx: Context) -> int:
+    for code, ext in ctx.texts:
+        removelines.remove_comments_from_code(code, ext)
+    return len(ctx.texts)
+
+
+def stage_end_to_end(ctx: Context) -> int:
+    output.content_output(
+        ctx.root, False, output=ctx.output_path, max_file_size=DEFAULT_MAX_FILE_BYTES,
+        remove_comments=ctx.remove_comments, jobs=ctx.jobs, use_cache=False
+    )
+    return len(ctx.file_paths)
+
+
+STAGE_FUNCTIONS = {
+    "structure": stage_structure,
+    "list_files": stage_list_files,
+    "read": stage_read,
+    "strip": stage_strip,
+    "end_to_end": stage_end_to_end,
+}
+
+
+def measure(fn, ctx: Context, repeat: int, memory: bool) -> dict:
+    """
+    Run one stage `repeat` times and collect its metrics.
+
+    Args:
+        fn: Stage function; returns the number of items it processed.
+        ctx: Shared benchmark state.
+        repeat: Number of timed runs; the fastest is reported.
+        memory: Whether to do an extra run under tracemalloc for peak memory.
+
+    Returns:
+        A dictionary of metrics for the stage.
+    """
+    best = float("inf")
+    io_delta = None
+    items = 0
+
+    for _ in range(repeat):
+        io_before = read_proc_io()
+        start = time.perf_counter()
+        items = fn(ctx)
+        elapsed = time.perf_counter() - start
+        io_after = read_proc_io()
+        if elapsed < best:
+            best = elapsed
+            if io_before is not None and io_after is not None:
+                io_delta = {k: io_after[k] - io_before[k] for k in IO_FIELDS}
+
+    result = {"seconds": round(best, 6), "items": items}
+    if best > 0:
+        result["items_per_s"] = round(items / best, 1)
+    if io_delta is not None:
+        result.update(io_delta)
+
+    if memory:
+        tracemalloc.start()
+        fn(ctx)
+        result["peak_bytes"] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    return result
+
+
+def compare(results: dict, baseline_path: str, threshold: float) -> list[str]:
+    """
+    Compare stage timings against a previous results file.
+
+    Args:
+        results: Results of this run.
+        baseline_path: JSON file written by an earlier run with --json.
+        threshold: Slowdown ratio above which a stage counts as a regression.
+
+    Returns:
+        Descriptions of the regressed stages.
+    """
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+
+    if baseline["meta"]["spec"] != results["meta"]["spec"]:
+        print("warning: baseline was measured on a different synthetic repository", file=sys.stderr)
+
+    regressions = []
+    print(f"\n{'stage':12} {'baseline':>10} {'current':>10} {'ratio':>7}")
+    for stage, current in results["stages"].items():
+        old = baseline["stages"].get(stage)
+        if not old or not old["seconds"]:
+            continue
+        ratio = current["seconds"] / old["seconds"]
+        flag = "  REGRESSION" if ratio > threshold else ""
+        print(f"{stage:12} {old['seconds'] * 1000:8.1f}ms {current['seconds'] * 1000:8.1f}ms {ratio:6.2f}x{flag}")
+        if flag:
+            regressions.append(f"{stage}: {ratio:.2f}x slower")
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Per-stage pipeline benchmark on a synthetic repository")
+    synthrepo.add_spec_arguments(parser)
+    parser.add_argument("--workdir", default=os.path.join(tempfile.gettempdir(), "scan-repo-bench"),
+                        help="Where synthetic repositories are generated and kept between runs")
+    parser.add_argument("--stages", default=",".join(STAGES), help=f"Stages to run (default {','.join(STAGES)})")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per stage; the best is reported (default 3)")
+    parser.add_argument("--jobs", type=int, default=1, help="Workers for the end-to-end stage (default 1)")
+    parser.add_argument("--remove-comments", action="store_true", help="Strip comments in the read and end-to-end stages")
+    parser.add_argument("--no-memory", action="store_true", help="Skip the tracemalloc run of each stage")
+    parser.add_argument("--json", default=None, help="Write results to this JSON file")
+    parser.add_argument("--compare", default=None, help="Baseline JSON file to compare against")
+    parser.add_argument("--threshold", type=float, default=1.10, help="Slowdown ratio flagged as a regression (default 1.10)")
+    args = parser.parse_args()
+
+    stages = [s.strip() for s in args.stages.split(",") if s.strip()]
+    unknown = [s for s in stages if s not in STAGE_FUNCTIONS]
+    if unknown:
+        parser.error(f"unknown stage(s): {', '.join(unknown)}")
+
+    # Keep library logging from drowning the report
+    logging.basicConfig(level=logging.ERROR)
+
+    spec = synthrepo.spec_from_args(args)
+    name = f"repo-{spec.files}-{spec.depth}-{spec.file_size}-{spec.seed}"
+    start = time.perf_counter()
+    root = synthrepo.generate(os.path.join(args.workdir, name), spec)
+    print(f"Repository: {root} ({spec.files} files, ready in {time.perf_counter() - start:.1f}s)")
+
+    commit = None
+    head = git.read_head_info(REPO_ROOT) if os.path.exists(os.path.join(REPO_ROOT, ".git")) else None
+    if head:
+        commit = head["commit"]
+
+    results = {
+        "meta": {
+            "commit": commit,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "spec": spec._asdict(),
+            "repeat": args.repeat,
+            "jobs": args.jobs,
+            "remove_comments": args.remove_comments,
+        },
+        "stages": {},
+    }
+
+    with tempfile.TemporaryDirectory() as scratch:
+        # Building the context also warms the page cache for every stage
+        ctx = Context(root, args.jobs, args.remove_comments, scratch)
+
+        print(f"\n{'stage':12} {'time':>10} {'items/s':>10} {'syscr':>8} {'syscw':>8} {'peak MB':>8}")
+        for stage in stages:
+            metrics = measure(STAGE_FUNCTIONS[stage], ctx, args.repeat, not args.no_memory)
+            results["stages"][stage] = metrics
+            peak = metrics.get("peak_bytes")
+            print(f"{stage:12} {metrics['seconds'] * 1000:8.1f}ms {metrics.get('items_per_s', 0):10.0f} "
+                  f"{metrics.get('syscr', '-'):>8} {metrics.get('syscw', '-'):>8} "
+                  f"{f'{peak / 1048576:.1f}' if peak is not None else '-':>8}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    if args.compare:
+        regressions = compare(results, args.compare, args.threshold)
+        if regressions:
+            print("\nRegressions: " + "; ".join(regressions), file=sys.stderr)
+            return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,120 @@
+"""
+Throughput benchmark for the comment stripper in analyzer/removelines.py.
+
+Generates a multi-megabyte synthetic source file per language (code, trailing
+comments, block comments, strings containing comment markers) and reports how
+fast `remove_comments_from_code` processes it.
+
+Usage:
+    python benchmarks/bench_removelines.py [--mb SIZE] [--repeat N] [--json FILE]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analyzer import removelines  # noqa: E402
+
+# One representative chunk per language; repeated until the target size is reached
+CHUNKS = {
+    ".py": (
+        '# comment line\n'
+        'def f(x):  # trailing\n'
+        '    """Docstring."""\n'
+        '    s = "not # a comment"\n'
+        '    return x + 1\n'
+    ),
+    ".c": (
+        '// comment line\n'
+        'int f(int x) { /* inline */ return x + 1; } // trailing\n'
+        '/* block\n   comment */\n'
+        'const char *s = "not // a comment";\n'
+    ),
+    ".ts": (
+        '// comment line\n'
+        'export const f = (x: number): number => x + 1; // trailing\n'
+        'const t = `template // not a comment ${x}`;\n'
+        '/** doc */\n'
+    ),
+    ".go": (
+        '// comment line\n'
+        'func f(x int) int { return x + 1 } // trailing\n'
+        's := `raw // not a comment`\n'
+    ),
+    ".rs": (
+        '// comment line\n'
+        "fn f<'a>(x: &'a str) -> &'a str { x } // trailing\n"
+        'let s = r#"raw // not a comment"#;\n'
+    ),
+    ".sh": (
+        '# comment line\n'
+        'echo "$# args" # trailing\n'
+        "x='# not a comment'\n"
+    ),
+    ".yaml": (
+        '# comment line\n'
+        'key: value # trailing\n'
+        'url: "http://example.com/#anchor"\n'
+    ),
+    ".sql": (
+        '-- comment line\n'
+        "SELECT '--not a comment' FROM t; -- trailing\n"
+        '/* block */\n'
+    ),
+    ".css": (
+        '/* comment */\n'
+        'a { content: "/* not a comment */"; color: red; }\n'
+    ),
+    ".html": (
+        '<!-- comment -->\n'
+        '<p class="x">text</p>\n'
+    ),
+}
+
+
+def make_source(chunk: str, size_bytes: int) -> str:
+    """Repeat `chunk` until the result is at least `size_bytes` long."""
+    return chunk * (size_bytes // len(chunk) + 1)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Comment stripper throughput benchmark")
+    parser.add_argument("--mb", type=float, default=4.0, help="Size of each generated source in MB (default 4)")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per language; the best is reported (default 3)")
+    parser.add_argument("--json", default=None, help="Also write results to this JSON file")
+    args = parser.parse_args()
+
+    size = int(args.mb * 1024 * 1024)
+    results = []
+
+    for ext, chunk in CHUNKS.items():
+        code = make_source(chunk, size)
+        best = float("inf")
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            stripped = removelines.remove_comments_from_code(code, ext)
+            best = min(best, time.perf_counter() - start)
+
+        mb_per_s = len(code) / best / (1024 * 1024)
+        results.append({
+            "extension": ext,
+            "input_bytes": len(code),
+            "output_bytes": len(stripped),
+            "seconds": round(best, 4),
+            "mb_per_s": round(mb_per_s, 1),
+        })
+        print(f"{ext:6} {len(code) / 1048576:6.1f} MB -> {len(stripped) / 1048576:6.1f} MB  "
+              f"{best * 1000:8.1f} ms  {mb_per_s:7.1f} MB/s")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
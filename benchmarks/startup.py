@@ -0,0 +1,100 @@
+"""
+Startup-time regression check for scan-repo.py.
+
+Verifies that `--version` and `--help` don't import heavy modules (GitPython,
+TOML parsers, SQLite, the analysis pipeline) and that their start-up overhead
+over a bare interpreter stays within a budget.
+
+Usage:
+    python benchmarks/startup.py [--runs N] [--budget-ms MS]
+
+Exits with status 1 if a check fails.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPT = os.path.join(REPO_ROOT, "scan-repo.py")
+
+# Modules that must stay unimported on the --version/--help fast path
+FORBIDDEN_MODULES = (
+    "git",
+    "toml",
+    "tomllib",
+    "sqlite3",
+    "concurrent.futures",
+    "analyzer.output",
+    "analyzer.paths",
+    "analyzer.cache",
+)
+
+_PROBE = """
+import json, sys
+sys.path.insert(0, {root!r})
+from analyzer import cli
+try:
+    cli.main([{flag!r}])
+except SystemExit:
+    pass
+sys.stderr.write(json.dumps(sorted(sys.modules)))
+"""
+
+
+def loaded_modules(flag: str) -> set[str]:
+    """Run the CLI with `flag` in a fresh interpreter and return the modules it imported."""
+    probe = _PROBE.format(root=REPO_ROOT, flag=flag)
+    result = subprocess.run(
+        [sys.executable, "-c", probe], capture_output=True, text=True, cwd=REPO_ROOT, check=True
+    )
+    return set(json.loads(result.stderr))
+
+
+def median_runtime(cmd: list[str], runs: int) -> float:
+    """Return the median wall time of `cmd` in milliseconds."""
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, cwd=REPO_ROOT, check=True)
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Startup-time regression check for scan-repo.py")
+    parser.add_argument("--runs", type=int, default=15, help="Timed runs per command (default 15)")
+    parser.add_argument(
+        "--budget-ms", type=float, default=75.0,
+        help="Maximum allowed overhead of `--version` over a bare interpreter (default 75ms)"
+    )
+    args = parser.parse_args()
+
+    failed = False
+
+    for flag in ("--version", "--help"):
+        heavy = sorted(m for m in FORBIDDEN_MODULES if m in loaded_modules(flag))
+        if heavy:
+            print(f"FAIL {flag} imports heavy modules: {', '.join(heavy)}")
+            failed = True
+        else:
+            print(f"ok   {flag} imports no heavy modules")
+
+    baseline = median_runtime([sys.executable, "-c", "pass"], args.runs)
+    version = median_runtime([sys.executable, SCRIPT, "--version"], args.runs)
+    overhead = version - baseline
+    status = "ok  " if overhead <= args.budget_ms else "FAIL"
+    print(
+        f"{status} --version: {version:.1f}ms (interpreter {baseline:.1f}ms, "
+        f"overhead {overhead:.1f}ms, budget {args.budget_ms:.0f}ms)"
+    )
+    failed = failed or overhead > args.budget_ms
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
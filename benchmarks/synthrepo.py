@@ -0,0 +1,204 @@
+"""
+Deterministic generator of synthetic repositories for benchmarking.
+
+The same parameters and seed always produce the same tree, byte for byte, so
+results from different commits are comparable. A generated tree records its
+parameters in a marker file and is reused instead of being regenerated.
+
+Usage:
+    python benchmarks/synthrepo.py DEST [--files N] [--depth D] [--file-size BYTES]
+                                        [--binary-ratio R] [--languages MIX] [--seed S]
+"""
+import argparse
+import json
+import math
+import os
+import random
+import shutil
+import sys
+from typing import NamedTuple
+
+from bench_removelines import CHUNKS
+
+MARKER_FILE = ".synthrepo.json"
+
+# Default language mix: extension -> relative weight
+DEFAULT_LANGUAGES = "py:40,ts:15,c:10,go:10,rs:5,sh:5,yaml:5,md:5,txt:5"
+
+# Files per directory the layout aims for
+FILES_PER_DIR = 24
+
+# Content for extensions without a comment-syntax chunk in bench_removelines
+PLAIN_CHUNKS = {
+    ".md": "## Heading\n\nSome *prose* with `code` and a [link](http://example.com).\n\n",
+    ".txt": "Lorem ipsum dolor sit amet, consectetur adipiscing elit, sed do eiusmod.\n",
+}
+
+# Header line identifying each file, in the extension's comment syntax ("// {}" otherwise)
+_HEADERS = {
+    ".py": "# {}", ".sh": "# {}", ".yaml": "# {}", ".sql": "-- {}",
+    ".css": "/* {} */", ".html": "<!-- {} -->", ".md": "{}", ".txt": "{}",
+}
+
+
+class RepoSpec(NamedTuple):
+    """
+    Parameters of a synthetic repository.
+
+    Attributes:
+        files: Number of files to generate.
+        depth: Maximum directory nesting below the root.
+        file_size: Median file size in bytes; actual sizes follow a log-normal spread.
+        binary_ratio: Fraction of files (0-1) filled with binary data.
+        languages: Language mix as "ext:weight,..." (e.g. "py:3,md:1").
+        seed: Random seed.
+    """
+    files: int = 1000
+    depth: int = 4
+    file_size: int = 4096
+    binary_ratio: float = 0.02
+    languages: str = DEFAULT_LANGUAGES
+    seed: int = 0
+
+
+def parse_languages(mix: str) -> tuple[list[str], list[float]]:
+    """
+    Parse a language mix string.
+
+    Args:
+        mix: Comma-separated "ext:weight" pairs; the weight defaults to 1.
+
+    Returns:
+        A (extensions, weights) tuple, extensions including the dot.
+
+    Raises:
+        ValueError: If an extension has no content template.
+    """
+    extensions, weights = [], []
+    for item in mix.split(","):
+        ext, _, weight = item.strip().partition(":")
+        ext = "." + ext.lstrip(".")
+        if ext not in CHUNKS and ext not in PLAIN_CHUNKS:
+            raise ValueError(f"No content template for {ext}")
+        extensions.append(ext)
+        weights.append(float(weight or 1))
+    return extensions, weights
+
+
+def _layout(spec: RepoSpec, rng: random.Random) -> list[str]:
+    """
+    Build the list of directories (relative paths, "" for the root).
+
+    Each new directory is attached to a random existing one that isn't at the
+    maximum depth yet, which gives a bushy tree with occasional deep chains.
+    """
+    dir_count = max(1, math.ceil(spec.files / FILES_PER_DIR))
+    dirs = [("", 0)]
+    open_dirs = [0] if spec.depth > 0 else []
+
+    while len(dirs) < dir_count and open_dirs:
+        parent, parent_depth = dirs[rng.choice(open_dirs)]
+        name = f"d{len(dirs):06d}"
+        path = f"{parent}/{name}" if parent else name
+        dirs.append((path, parent_depth + 1))
+        if parent_depth + 1 < spec.depth:
+            open_dirs.append(len(dirs) - 1)
+
+    return [path for path, _ in dirs]
+
+
+def _text_content(ext: str, size: int, number: int) -> bytes:
+    """Repeat the extension's template until `size` bytes, after an identifying header."""
+    chunk = CHUNKS.get(ext) or PLAIN_CHUNKS[ext]
+    header = _HEADERS.get(ext, "// {}").format(f"synthetic file {number}") + "\n"
+    body = chunk * (max(0, size - len(header)) // len(chunk) + 1)
+    return (header + body)[:max(size, len(header))].encode("utf-8")
+
+
+def generate(dest: str, spec: RepoSpec = RepoSpec(), force: bool = False) -> str:
+    """
+    Create (or reuse) a synthetic repository.
+
+    Args:
+        dest: Directory to create the repository in.
+        spec: Repository parameters.
+        force: Regenerate even if `dest` already holds a repository with the same parameters.
+
+    Returns:
+        The absolute path of the repository.
+    """
+    dest = os.path.abspath(dest)
+    marker = os.path.join(dest, MARKER_FILE)
+
+    # Skip generation when the tree is already there with the same parameters
+    if not force and os.path.isfile(marker):
+        with open(marker, "r", encoding="utf-8") as f:
+            if json.load(f) == spec._asdict():
+                return dest
+
+    if os.path.exists(dest):
+        shutil.rmtree(dest)
+    os.makedirs(dest)
+
+    rng = random.Random(spec.seed)
+    extensions, weights = parse_languages(spec.languages)
+    dirs = _layout(spec, rng)
+    for rel_dir in dirs[1:]:
+        os.makedirs(os.path.join(dest, rel_dir), exist_ok=True)
+
+    # Log-normal sizes around the median, like real source trees (many small, a few huge)
+    sigma = 1.0
+    for number in range(spec.files):
+        rel_dir = dirs[rng.randrange(len(dirs))]
+        size = min(int(rng.lognormvariate(math.log(max(1, spec.file_size)), sigma)), 64 * spec.file_size)
+
+        if rng.random() < spec.binary_ratio:
+            name = f"f{number:07d}.bin"
+            data = b"\0\1\2\3" + rng.randbytes(max(0, size - 4))
+        else:
+            ext = rng.choices(extensions, weights)[0]
+            name = f"f{number:07d}{ext}"
+            data = _text_content(ext, size, number)
+
+        with open(os.path.join(dest, rel_dir, name), "wb") as f:
+            f.write(data)
+
+    # Written last, so an interrupted generation is never reused
+    with open(marker, "w", encoding="utf-8") as f:
+        json.dump(spec._asdict(), f)
+    return dest
+
+
+def add_spec_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add the `RepoSpec` options to an argument parser."""
+    defaults = RepoSpec()
+    parser.add_argument("--files", type=int, default=defaults.files, help=f"Number of files (default {defaults.files})")
+    parser.add_argument("--depth", type=int, default=defaults.depth, help=f"Maximum directory depth (default {defaults.depth})")
+    parser.add_argument("--file-size", type=int, default=defaults.file_size,
+                        help=f"Median file size in bytes (default {defaults.file_size})")
+    parser.add_argument("--binary-ratio", type=float, default=defaults.binary_ratio,
+                        help=f"Fraction of binary files (default {defaults.binary_ratio})")
+    parser.add_argument("--languages", default=defaults.languages,
+                        help=f"Language mix as ext:weight pairs (default {defaults.languages})")
+    parser.add_argument("--seed", type=int, default=defaults.seed, help="Random seed (default 0)")
+
+
+def spec_from_args(args: argparse.Namespace) -> RepoSpec:
+    """Build a `RepoSpec` from options added by `add_spec_arguments`."""
+    return RepoSpec(args.files, args.depth, args.file_size, args.binary_ratio, args.languages, args.seed)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Generate a synthetic repository")
+    parser.add_argument("dest", help="Directory to create")
+    add_spec_arguments(parser)
+    parser.add_argument("--force", action="store_true", help="Regenerate even if the tree is up to date")
+    args = parser.parse_args()
+
+    path = generate(args.dest, spec_from_args(args), args.force)
+    print(path)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
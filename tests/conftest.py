@@ -0,0 +1,23 @@
+import subprocess
+
+import pytest
+
+
+def git(repo, *args: str) -> str:
+    """Run git in a test repository and return its output."""
+    result = subprocess.run(["git", "-C", str(repo), *args], capture_output=True, text=True, check=True)
+    return result.stdout
+
+
+@pytest.fixture
+def repo(tmp_path):
+    """A git repository with one commit holding `a.py`."""
+    root = tmp_path / "repo"
+    root.mkdir()
+    git(root, "init", "-q")
+    git(root, "config", "user.email", "test@example.com")
+    git(root, "config", "user.name", "Test")
+    (root / "a.py").write_text("print('a')\n")
+    git(root, "add", "a.py")
+    git(root, "commit", "-q", "-m", "first")
+    return root
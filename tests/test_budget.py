@@ -0,0 +1,18 @@
+import io
+
+from analyzer import output
+
+
+def test_small_token_budget_still_takes_files(tmp_path):
+    (tmp_path / "a.py").write_text("x = 1\n")
+    for i in range(20):
+        (tmp_path / f"module_{i}.txt").write_text("word " * 200)
+    out = io.StringIO()
+
+    file_count, _ = output.write_package(out, str(tmp_path), False, token_budget=50, git_info={})
+
+    text = out.getvalue()
+    assert file_count == 1
+    assert "x = 1" in text
+    assert "of 50 in files, plus" in text
+    assert "Omitted files: 20" in text
@@ -0,0 +1,24 @@
+import os
+
+from analyzer import cache
+
+
+def test_put_counts_encoded_bytes(tmp_path):
+    file_cache = cache.FileCache(str(tmp_path / "cache.sqlite"))
+    file_cache.put("key", ("é€", 1))
+    file_cache.close()
+    file_cache = cache.FileCache(str(tmp_path / "cache.sqlite"))
+    assert file_cache._conn.execute("SELECT bytes FROM sections").fetchone()[0] == 5
+    file_cache.close()
+
+
+def test_make_key_uses_index_stats(tmp_path, monkeypatch):
+    path = tmp_path / "a.py"
+    path.write_text("x = 1\n")
+    st = os.stat(path)
+    expected = cache.FileCache.make_key(str(path), 1024, False)
+
+    def fail(*args):
+        raise AssertionError("file stat-ed again")
+    monkeypatch.setattr(cache.os, "stat", fail)
+    assert cache.FileCache.make_key(str(path), 1024, False, size=st.st_size, mtime=st.st_mtime) == expected
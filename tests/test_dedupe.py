@@ -0,0 +1,44 @@
+import io
+
+from analyzer import dedupe, files, output
+
+
+def package(root, **options) -> str:
+    out = io.StringIO()
+    output.write_package(out, str(root), False, deduplicate=True, git_info={}, **options)
+    return out.getvalue()
+
+
+def test_short_duplicate_is_written_in_full(tmp_path):
+    (tmp_path / "a.txt").write_text("x\n")
+    (tmp_path / "b.txt").write_text("x\n")
+
+    text = package(tmp_path)
+
+    assert "Duplicate files: 0 (0 bytes saved)" in text
+    assert "identical to" not in text.lower()
+
+
+def test_long_duplicate_is_a_reference(tmp_path):
+    (tmp_path / "a.txt").write_text("line of text\n" * 50)
+    (tmp_path / "b.txt").write_text("line of text\n" * 50)
+
+    text = package(tmp_path)
+
+    assert text.count("line of text") == 50
+    assert "Duplicate files: 1 (" in text
+
+
+def test_discarded_original_is_not_referenced(tmp_path):
+    for name in ("a.txt", "b.txt", "c.txt"):
+        (tmp_path / name).write_text("same\n")
+    deduper = dedupe.Deduplicator(str(tmp_path))
+
+    def key(name):
+        path = str(tmp_path / name)
+        return path, dedupe.content_key(files.read_file_bytes(path, 1024), path, False)
+
+    assert deduper.original_of(*key("a.txt")) is None
+    deduper.discard(str(tmp_path / "a.txt"))
+    assert deduper.original_of(*key("b.txt")) is None
+    assert deduper.original_of(*key("c.txt")) == str(tmp_path / "b.txt")
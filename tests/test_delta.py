@@ -0,0 +1,59 @@
+import io
+
+import pytest
+
+from analyzer import delta, output
+from conftest import git
+
+
+def test_since_ref_lists_changes(repo):
+    (repo / "a.py").write_text("print('changed')\n")
+    (repo / "b.py").write_text("print('b')\n")
+
+    changes = delta.since_ref(str(repo), "HEAD")
+
+    assert changes.status == {"a.py": "modified", "b.py": "added"}
+    assert changes.base == "HEAD"
+
+
+def test_since_ref_rejects_option_like_ref(repo, tmp_path):
+    target = tmp_path / "INJECTED"
+
+    with pytest.raises(delta.DeltaError):
+        delta.since_ref(str(repo), f"--output={target}")
+
+    assert not target.exists()
+
+
+def test_since_ref_rejects_unknown_ref(repo):
+    with pytest.raises(delta.DeltaError):
+        delta.since_ref(str(repo), "no-such-branch")
+
+
+def test_since_ref_resolves_ref_to_commit(repo):
+    git(repo, "tag", "v1")
+    (repo / "a.py").write_text("print('changed')\n")
+
+    assert delta.since_ref(str(repo), "v1", with_diffs=True).diffs["a.py"].startswith("--- a/a.py")
+
+
+def test_bad_since_keeps_existing_package(repo, tmp_path):
+    package = tmp_path / "context.md"
+    package.write_text("previous package\n")
+
+    with pytest.raises(delta.DeltaError):
+        output.content_output(str(repo), False, output=str(package), use_cache=False, since="no-such-ref")
+
+    assert package.read_text() == "previous package\n"
+
+
+def test_summary_counts_only_selected_changes(repo):
+    (repo / "src").mkdir()
+    (repo / "src" / "b.py").write_text("print('b')\n")
+    (repo / "new.txt").write_text("new\n")
+    (repo / "a.py").write_text("print('changed')\n")
+    out = io.StringIO()
+
+    output.write_package(out, str(repo), False, includes=["src"], since="HEAD", git_info={})
+
+    assert "Changed since HEAD: 1 added, 0 modified, 0 removed" in out.getvalue()
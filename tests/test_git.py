@@ -0,0 +1,64 @@
+import os
+
+from analyzer import git as gitinfo
+from conftest import git
+
+
+def expected_info(repo) -> dict:
+    """HEAD metadata as git itself reports it."""
+    log = git(repo, "log", "-1", f"--date=format:{gitinfo.DATE_FORMAT}", "--format=%H%n%an <%ae>%n%cd")
+    commit, author, date = log.splitlines()
+    return {"commit": commit, "author": author, "date": date}
+
+
+def head_info(repo) -> dict:
+    info = gitinfo.read_head_info(str(repo))
+    assert info is not None
+    return info
+
+
+def test_branch_head(repo):
+    info = head_info(repo)
+
+    assert {k: info[k] for k in ("commit", "author", "date")} == expected_info(repo)
+    assert info["branch"] == git(repo, "rev-parse", "--abbrev-ref", "HEAD").strip()
+
+
+def test_detached_head(repo):
+    (repo / "a.py").write_text("print('second')\n")
+    git(repo, "commit", "-q", "-am", "second")
+    git(repo, "checkout", "-q", "--detach", "HEAD~1")
+
+    info = head_info(repo)
+
+    assert info["commit"] == git(repo, "rev-parse", "HEAD").strip()
+    assert info["branch"] == "HEAD (detached)"
+
+
+def test_packed_only_ref(repo):
+    git(repo, "pack-refs", "--all")
+    branch = git(repo, "symbolic-ref", "HEAD").strip()
+    assert not (repo / ".git" / branch).exists()
+
+    assert head_info(repo)["commit"] == git(repo, "rev-parse", "HEAD").strip()
+
+
+def test_symbolic_ref(repo):
+    branch = git(repo, "symbolic-ref", "HEAD").strip()
+    git(repo, "symbolic-ref", "refs/heads/alias", branch)
+    git(repo, "symbolic-ref", "HEAD", "refs/heads/alias")
+
+    info = head_info(repo)
+
+    assert info["commit"] == git(repo, "rev-parse", "HEAD").strip()
+    assert info["branch"] == "alias"
+
+
+def test_packed_object(repo):
+    git(repo, "gc", "-q")
+    sha = git(repo, "rev-parse", "HEAD").strip()
+    assert not os.path.exists(repo / ".git" / "objects" / sha[:2] / sha[2:])
+
+    info = head_info(repo)
+
+    assert {k: info[k] for k in ("commit", "author", "date")} == expected_info(repo)
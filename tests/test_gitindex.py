@@ -0,0 +1,64 @@
+import os
+import subprocess
+
+import pytest
+
+from analyzer import gitindex
+from conftest import git
+
+NAMES = ["b.txt", "dir/b.txt", "dir/sub/c.md", "dir/sub/longer-name-sharing-a-prefix.md", "dir2/x.py", "ü.txt"]
+
+
+def ls_files(repo) -> list[str]:
+    """Tracked paths as `git ls-files` lists them, each conflicted path once."""
+    paths = git(repo, "-c", "core.quotepath=off", "ls-files").splitlines()
+    return list(dict.fromkeys(paths))
+
+
+@pytest.fixture
+def conflicted(repo):
+    """The `repo` fixture with nested files and `a.py` left conflicted by a merge."""
+    for name in NAMES:
+        path = repo / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(f"{name}\n")
+    git(repo, "add", ".")
+    git(repo, "commit", "-q", "-m", "files")
+    git(repo, "checkout", "-q", "-b", "other")
+    (repo / "a.py").write_text("print('other')\n")
+    git(repo, "commit", "-q", "-am", "other")
+    git(repo, "checkout", "-q", "-")
+    (repo / "a.py").write_text("print('main')\n")
+    git(repo, "commit", "-q", "-am", "main")
+    with pytest.raises(subprocess.CalledProcessError):
+        git(repo, "merge", "-q", "other")
+    return repo
+
+
+@pytest.mark.parametrize("version", [2, 3, 4])
+def test_read_index_matches_ls_files(conflicted, version):
+    if version == 3:
+        # Git only writes version 3 when an entry has extended flags, such as intent-to-add
+        (conflicted / "intent.txt").write_text("later\n")
+        git(conflicted, "add", "-N", "intent.txt")
+    git(conflicted, "update-index", "--index-version", str(version))
+    assert (conflicted / ".git" / "index").read_bytes()[4:8] == version.to_bytes(4, "big")
+    assert git(conflicted, "ls-files", "--unmerged")
+
+    entries = gitindex.read_index(str(conflicted / ".git"))
+
+    assert [path for path, _, _ in entries] == ls_files(conflicted)
+    sizes = {path: size for path, size, _ in entries}
+    assert sizes["dir/sub/c.md"] == os.path.getsize(conflicted / "dir" / "sub" / "c.md")
+
+
+@pytest.mark.parametrize("version", [3, 4])
+def test_read_index_leaves_out_skip_worktree(repo, version):
+    (repo / "b.py").write_text("b\n")
+    git(repo, "add", "b.py")
+    git(repo, "update-index", "--skip-worktree", "a.py")
+    git(repo, "update-index", "--index-version", str(version))
+
+    entries = gitindex.read_index(str(repo / ".git"))
+
+    assert [path for path, _, _ in entries] == ["b.py"]
@@ -0,0 +1,35 @@
+import pytest
+
+from analyzer import history, output
+from conftest import git
+
+
+def test_recent_since_lists_files_after_ref(repo):
+    (repo / "b.py").write_text("print('b')\n")
+    git(repo, "add", "b.py")
+    git(repo, "commit", "-q", "-m", "second")
+
+    recent = history.recent_files(str(repo), history.Recency(since="HEAD~1"), use_cache=False)
+
+    assert recent == {str(repo / "b.py")}
+
+
+def test_recent_since_rejects_option_like_ref(repo, tmp_path):
+    target = tmp_path / "INJECTED"
+
+    with pytest.raises(history.HistoryError):
+        history.recent_files(str(repo), history.Recency(since=f"--output={target}"), use_cache=False)
+
+    assert not list(tmp_path.glob("INJECTED*"))
+
+
+def test_bad_recent_since_keeps_existing_package(repo, tmp_path):
+    package = tmp_path / "context.md"
+    package.write_text("previous package\n")
+
+    with pytest.raises(history.HistoryError):
+        output.content_output(
+            str(repo), True, output=str(package), use_cache=False, recency=history.Recency(since="no-such-ref")
+        )
+
+    assert package.read_text() == "previous package\n"
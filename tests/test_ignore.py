@@ -0,0 +1,47 @@
+import os
+
+import pytest
+
+from analyzer import ignore, output
+
+
+@pytest.fixture
+def tree(tmp_path):
+    for rel_path in ("src/a.py", "src/pkg/b.py", "docs/guide.md", "setup.py"):
+        path = tmp_path / rel_path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text("x\n")
+    return tmp_path
+
+
+def selected(root, **options) -> list[str]:
+    entries = output.build_entries(str(root), **options)
+    return sorted(os.path.relpath(e.path, root).replace(os.sep, "/") for e in entries if not e.is_dir)
+
+
+@pytest.mark.parametrize("pattern", ["src", "src/", "/src"])
+def test_include_directory(tree, pattern):
+    assert selected(tree, includes=[pattern]) == ["src/a.py", "src/pkg/b.py"]
+
+
+def test_include_nested_directory(tree):
+    assert selected(tree, includes=["pkg/"]) == ["src/pkg/b.py"]
+
+
+def test_include_directory_with_negated_file(tree):
+    assert selected(tree, includes=["src/", "!b.py"]) == ["src/a.py"]
+
+
+def test_include_glob(tree):
+    assert selected(tree, includes=["*.md"]) == ["docs/guide.md"]
+
+
+def test_exclude_directory(tree):
+    assert selected(tree, excludes=["src"]) == ["docs/guide.md", "setup.py"]
+
+
+def test_keeps_path_applies_directory_includes(tree):
+    matcher = ignore.IgnoreMatcher(str(tree), includes=["docs"], use_gitignore=False)
+
+    assert matcher.keeps_path("docs/guide.md")
+    assert not matcher.keeps_path("setup.py")
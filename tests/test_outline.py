@@ -0,0 +1,9 @@
+from analyzer import outline
+
+
+def test_outline_file_skips_files_over_read_limit(tmp_path):
+    path = tmp_path / "big.py"
+    path.write_text("def f():\n    pass\n" * 100)
+    size = path.stat().st_size
+    assert outline.outline_file(str(path), max_bytes=size) is not None
+    assert outline.outline_file(str(path), max_bytes=size - 1) is None
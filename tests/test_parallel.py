@@ -0,0 +1,20 @@
+from analyzer import cache, dedupe, files, parallel
+
+
+def test_cache_hit_reuses_stored_digest(tmp_path, monkeypatch):
+    path = tmp_path / "a.py"
+    path.write_text("x = 1\n")
+    file_cache = cache.FileCache(str(tmp_path / "cache.sqlite"))
+
+    first = {}
+    result = parallel.analyze_one(str(path), 1024, False, file_cache, digests=first)
+
+    def fail(*args):
+        raise AssertionError("file read again on a cache hit")
+    monkeypatch.setattr(files, "read_file_bytes", fail)
+    monkeypatch.setattr(dedupe, "file_key", fail)
+
+    second = {}
+    assert parallel.analyze_one(str(path), 1024, False, file_cache, digests=second) == result
+    assert second == first
+    file_cache.close()
@@ -0,0 +1,21 @@
+import pytest
+
+from analyzer.removelines import remove_comments_from_code
+
+
+@pytest.mark.parametrize("ext, code, expected", [
+    (".py", 'x = 1  # c\n# whole\ny = "#"  # z\n', 'x = 1\ny = "#"'),
+    (".py", "def f():\n    '''doc'''\n    return 1\n", "def f():\n    return 1"),
+    (".py", 'def f():\n    r"""doc"""\n    s = f"""a""" + x\n', 'def f():\n    s = f"""a""" + x'),
+    (".c", '/* a */ // b\nint x; /* c */ int y; // d\nchar *s = "//";\n', 'int x; int y;\nchar *s = "//";'),
+    (".rs", 'let s = r#"// no"#; // yes\nlet c = \'"\'; // z\n', 'let s = r#"// no"#;\nlet c = \'"\';'),
+    (".sh", "echo $# a#b # c\nx='# no' # yes\n", "echo $# a#b\nx='# no'"),
+    (".lua", "--[[ block ]]\nx = [[ -- no ]] -- yes\n", "x = [[ -- no ]]"),
+    (".sql", "SELECT 'it''s -- no' -- yes\n", "SELECT 'it''s -- no'"),
+    (".html", "<p><!-- c --></p>\n", "<p></p>"),
+    (".js", "const re = /\\/\\//;\n", "const re = /\\/\\//;"),
+    (".ts", "if (/[/]/.test(s)) return /a\\/b/g // c\n", "if (/[/]/.test(s)) return /a\\/b/g"),
+    (".js", "x = a / b // c\ny = f(x) / 2 /* k */ / 3\n", "x = a / b\ny = f(x) / 2 / 3"),
+])
+def test_remove_comments(ext, code, expected):
+    assert remove_comments_from_code(code, ext) == expected
@@ -0,0 +1,66 @@
+import io
+import json
+import os
+
+import pytest
+
+from analyzer import server
+
+
+def request(**options) -> bytes:
+    return json.dumps(options).encode("utf-8")
+
+
+def test_parse_request_confines_path_to_root(tmp_path):
+    inside = tmp_path / "inside"
+    inside.mkdir()
+
+    assert server.parse_request(request(path=str(inside)), str(tmp_path))["path"] == str(inside)
+    with pytest.raises(ValueError):
+        server.parse_request(request(path=str(tmp_path)), str(inside))
+
+
+@pytest.mark.parametrize("name", ["since", "recent_since"])
+def test_parse_request_rejects_option_like_refs(tmp_path, name):
+    with pytest.raises(ValueError):
+        server.parse_request(request(path=str(tmp_path), **{name: "--output=/tmp/x"}), str(tmp_path))
+
+
+def test_parse_request_caps_jobs(tmp_path):
+    options = server.parse_request(request(path=str(tmp_path), jobs=100000), str(tmp_path))
+
+    assert options["jobs"] == (os.cpu_count() or 1)
+
+
+@pytest.mark.parametrize("header, name", [
+    ("localhost:8765", "localhost"),
+    ("[::1]:8765", "::1"),
+    ("Evil.Example.com", "evil.example.com"),
+    (None, None),
+])
+def test_host_name(header, name):
+    assert server.host_name(header) == name
+
+
+def test_package_resolves_relative_files_against_path(tmp_path, monkeypatch):
+    project = tmp_path / "a"
+    project.mkdir()
+    (project / "README.md").write_text("inside\n")
+    (tmp_path / "README.md").write_text("daemon cwd\n")
+    monkeypatch.chdir(tmp_path)
+
+    options = server.parse_request(request(path=str(project), files=["README.md"]), str(tmp_path))
+    out = io.StringIO()
+    server.PackageService().package(out, options)
+
+    assert "inside" in out.getvalue()
+    assert "daemon cwd" not in out.getvalue()
+
+
+def test_package_rejects_absolute_files_outside_path(tmp_path):
+    project = tmp_path / "a"
+    project.mkdir()
+    options = server.parse_request(request(path=str(project), files=[str(tmp_path / "missing")]), str(tmp_path))
+
+    with pytest.raises(ValueError, match="outside"):
+        server.PackageService().package(io.StringIO(), options)
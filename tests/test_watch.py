@@ -0,0 +1,68 @@
+from analyzer import output, watch
+
+
+def make_state(root) -> watch.PackageState:
+    return watch.PackageState(
+        str(root), False, None, 16 * 1024, False, 1, None, False, [], [],
+        writer=output.make_writer("markdown", str(root))
+    )
+
+
+def test_gitignore_edit_triggers_rescan(tmp_path):
+    (tmp_path / "keep").mkdir()
+    (tmp_path / "keep" / "a.txt").write_text("a\n")
+    gitignore = tmp_path / ".gitignore"
+    gitignore.write_text("*.log\n")
+    state = make_state(tmp_path)
+    state.rebuild()
+    assert str(tmp_path / "keep" / "a.txt") in state.file_paths
+
+    with open(gitignore, "a") as f:
+        f.write("keep/\n")
+
+    assert state.refresh({str(gitignore)}) is None
+    assert state.rebuild()
+    assert str(tmp_path / "keep" / "a.txt") not in state.file_paths
+
+
+def test_content_edit_is_refreshed_in_place(tmp_path):
+    source = tmp_path / "a.py"
+    source.write_text("print('a')\n")
+    state = make_state(tmp_path)
+    state.rebuild()
+
+    source.write_text("print('changed')\n")
+
+    assert state.refresh({str(source)}) is True
+    assert "changed" in state.sections[state.file_paths[0]][0]
+
+
+def test_refresh_updates_structure_sizes(tmp_path):
+    source = tmp_path / "a.py"
+    source.write_text("print('a')\n")
+    state = make_state(tmp_path)
+    state.rebuild()
+
+    source.write_text("print('a much longer line')\n")
+
+    assert state.refresh({str(source)}) is True
+    entry = next(e for e in state.entries if e.path == str(source))
+    assert entry.size == source.stat().st_size
+    assert state.known[str(source)] == (entry.size, entry.mtime)
+    # A rescan finds nothing the refresh missed
+    assert not state.rebuild()
+
+
+def test_unselected_file_resize_is_reported(tmp_path):
+    (tmp_path / "a.py").write_text("print('a')\n")
+    data = tmp_path / "data.bin"
+    data.write_bytes(b"\0" * 10)
+    state = make_state(tmp_path)
+    state.filenames = [str(tmp_path / "a.py")]
+    state.rebuild()
+    assert str(data) not in state.file_paths
+
+    data.write_bytes(b"\0" * 100)
+
+    assert state.refresh({str(data)}) is True
+    assert next(e for e in state.entries if e.path == str(data)).size == 100